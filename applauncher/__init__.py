@@ -1,4 +1,21 @@
-"""Basic applauncher objects"""
-from .applauncher import Kernel, ServiceContainer
+"""Basic applauncher objects. They are imported on first access, so importing the package (or any of its modules, like
+`applauncher.event`) does not load the kernel dependencies (rich, pydantic, dependency_injector)"""
+import importlib
+import sys
 
-__all__ = ["Kernel", "ServiceContainer"]
+__all__ = ["Kernel", "ServiceContainer"]  # pylint: disable=undefined-all-variable
+
+
+def __getattr__(name):
+    if name in __all__:
+        return getattr(importlib.import_module(".applauncher", __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
+
+
+if sys.version_info < (3, 7):
+    # The module __getattr__ is Python 3.7+, the older versions import them right away
+    from .applauncher import Kernel, ServiceContainer  # noqa: F401
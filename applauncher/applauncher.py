@@ -1,24 +1,29 @@
 """Applaucher kernel and boot process"""
+import functools
+import os
 import sys
 import signal
-import importlib
 import types
 from multiprocessing import current_process
 from typing import List
-from rich.traceback import install
 from rich.table import Table
 from rich.console import Console
 from pydantic import ValidationError
 from dependency_injector import containers, providers
-from .logging import configure_logger
-from .service_runner import ProcessServiceRunner
-from .event import KernelReadyEvent, KernelShutdownEvent, ConfigurationReadyEvent
+from .logging import HeadlessConsole, configure_headless_logger, configure_logger
+from .service_runner import AsyncServiceRunner, ProcessServiceRunner, ThreadServiceRunner
+from .event import KernelReadyEvent, KernelShutdownEvent, ConfigurationReadyEvent, ConfigurationChangedEvent
 from .event import EventManager
-from .configuration import load_configuration
+from .boot import BootScheduler, bundle_name
+from .configuration import ConfigurationCache, diff_configuration, load_configuration
+from .profiler import PROFILE_ENV_VAR, NullProfiler, StartupProfiler, get_profiler, set_profiler, profiled, span
 
 
-install()
-configure_logger()
+CACHE_DIR_ENV_VAR = "APPLAUNCHER_CACHE_DIR"
+START_METHOD_ENV_VAR = "APPLAUNCHER_START_METHOD"
+METRICS_PORT_ENV_VAR = "APPLAUNCHER_METRICS_PORT"
+METRICS_HOST_ENV_VAR = "APPLAUNCHER_METRICS_HOST"
+HEADLESS_ENV_VAR = "APPLAUNCHER_HEADLESS"
 
 
 class Configuration(providers.Provider):
@@ -38,13 +43,35 @@ class Configuration(providers.Provider):
 
 
 class ServiceContainerMeta(type):
-    """Service container use interface. Here all containers will be gathered"""
+    """Service container use interface. Here all containers will be gathered. A resolved provider is cached as a class
+    attribute, so the next accesses are plain attribute lookups that do not reach `__getattr__`"""
+    def __init__(cls, name, bases, namespace):
+        super().__init__(name, bases, namespace)
+        type.__setattr__(cls, "_cached_providers", set())
+
     def __getattr__(cls, key):
         if cls.container is None:
             raise Exception("Service container not configured yet!")
         if not hasattr(cls.container, key):
             raise Exception(f'Service container does not have any "{key}" service')
-        return getattr(cls.container, key)
+        provider = getattr(cls.container, key)
+        type.__setattr__(cls, key, provider)
+        cls._cached_providers.add(key)
+        return provider
+
+    def __setattr__(cls, key, value):
+        super().__setattr__(key, value)
+        if key == "container":
+            cls.reset_cache()  # pylint: disable=no-value-for-parameter
+
+    def reset_cache(cls):
+        """Forget the cached providers, the next accesses resolve them from the container again"""
+        for key in list(cls._cached_providers):
+            cls._cached_providers.discard(key)
+            try:
+                type.__delattr__(cls, key)
+            except AttributeError:
+                pass
 
 
 class ServiceContainer(metaclass=ServiceContainerMeta):
@@ -52,13 +79,38 @@ class ServiceContainer(metaclass=ServiceContainerMeta):
     container = None
 
 
-class Kernel:
+class KernelContainer(containers.DynamicContainer):
+    """Kernel dynamic container. Replacing or removing a provider (like the tests do) resets the providers cached by the
+    service container"""
+    def __setattr__(self, name, value):
+        super().__setattr__(name, value)
+        ServiceContainer.reset_cache()
+
+    def __delattr__(self, name):
+        super().__delattr__(name)
+        ServiceContainer.reset_cache()
+
+
+def warm_up_process(process_providers, initializers):
+    """Runs in the service processes. The process providers are reset first, the instances created before the fork
+    (pools, sockets...) are dropped instead of shared with the kernel, and then created again"""
+    for provider in process_providers:
+        if hasattr(provider, "reset"):
+            provider.reset()
+    for provider in process_providers:
+        provider()
+    for initializer in initializers:
+        initializer()
+
+
+class Kernel:  # pylint: disable=too-many-instance-attributes,too-many-public-methods
     """The application initializer. It loads all the components and then let the control to the bundles"""
     inject_bindings = {}
     config = None
 
-    container = containers.DynamicContainer()
+    container = KernelContainer()
 
+    @profiled
     def load_configuration(self, configuration_file, parameters_file):
         """Parse the configuration and put it into the kernel and container"""
         self.console.log("Parsing configuration...")
@@ -66,18 +118,57 @@ class Kernel:
             self.config = load_configuration(
                 configuration_file_path=configuration_file,
                 parameters_file_path=parameters_file,
-                bundles=self.bundles
+                bundles=self.bundles,
+                cache=self.configuration_cache
             )
             Kernel.config = self.config
-            self.container.configuration = Configuration()
-            self.console.log("Configuration [bold green]OK[/]")
+            self.container.configuration = Configuration()  # pylint: disable=attribute-defined-outside-init
+            cache_hit = self.configuration_cache is not None and self.configuration_cache.hit
+            self.console.log(f"Configuration [bold green]OK[/]{' (from cache)' if cache_hit else ''}")
         except ValidationError as ex:
-            self.console.rule("[bold red]Configuration error")
-            for error in ex.errors():
-                loc = "[yellow] -> [/]".join([f"[cyan]{i}[/]" for i in error["loc"]])
-                self.console.print(f"{loc}: {error['msg']} (type={error['type']})")
+            self.display_configuration_errors(ex)
             sys.exit()
 
+    def display_configuration_errors(self, validation_error: ValidationError):
+        """Show what is wrong in the configuration"""
+        self.console.rule("[bold red]Configuration error")
+        for error in validation_error.errors():
+            loc = "[yellow] -> [/]".join([f"[cyan]{i}[/]" for i in error["loc"]])
+            self.console.print(f"{loc}: {error['msg']} (type={error['type']})")
+
+    def watch_configuration(self):
+        """Reload the configuration when its files change"""
+        from .watcher import create_watcher  # pylint: disable=import-outside-toplevel
+        self.configuration_watcher = create_watcher(
+            [self.configuration_file, self.parameters_file], self.reload_configuration
+        )
+        self.configuration_watcher.start()
+        self.console.log(f"Watching [bold cyan]{self.configuration_file}[/] for changes")
+
+    def reload_configuration(self):
+        """Load the configuration again and notify the changed values with a ConfigurationChangedEvent. If the new
+        configuration is not valid, the current one is kept"""
+        self.console.log("Reloading configuration...")
+        try:
+            configuration = load_configuration(
+                configuration_file_path=self.configuration_file,
+                parameters_file_path=self.parameters_file,
+                bundles=self.bundles,
+                cache=self.configuration_cache
+            )
+        except ValidationError as ex:
+            self.display_configuration_errors(ex)
+            self.console.log("[bold red]Configuration not reloaded[/], the current one is kept")
+            return
+        changes = diff_configuration(self.config.dict(), configuration.dict())
+        if not changes:
+            self.console.log("Configuration has not changed")
+            return
+        self.config = configuration
+        Kernel.config = configuration
+        self.console.log(f"Configuration changed: [bright_magenta]{', '.join(changes)}[/]")
+        self.event_manager.dispatch(ConfigurationChangedEvent(configuration=configuration, changes=changes))
+
     def kernel_ready_event(self, _event):
         """Seeing this message is the proof that the events are working"""
         table = Table(show_header=False, style="bold green")
@@ -90,13 +181,18 @@ class Kernel:
         table.add_row("Kernel shutdown")
         self.console.print(table)
 
+    @profiled
     def register_event_listeners(self, config_only: bool = False):
         """Add all kernel and bundles listeners"""
         config_text = "for ConfigurationReadyEvent only" if config_only else "for all other events"
         self.console.log(f"Registering event listeners {config_text}")
+        registered = self.boot.run(
+            "config listeners" if config_only else "listeners",
+            lambda bundle: self.register_event_listeners_for_bundle(bundle, config_only=config_only),
+            concurrent=False
+        )
         for bundle in self.bundles:
-            event_list = self.register_event_listeners_for_bundle(bundle, config_only=config_only)
-            self.log_event_listeners_registered_for_bundle(bundle, event_list)
+            self.log_event_listeners_registered_for_bundle(bundle, registered[bundle])
         # Blinker does not duplicate signals so there is probably no reason to worry about adding listeners
         # twice, but anyways checking makes sense to me.
         if not config_only:
@@ -116,6 +212,24 @@ class Kernel:
             registered_listeners.append(event_type)
         return registered_listeners
 
+    @profiled
+    def configure_bundles(self):
+        """Deliver the ConfigurationReadyEvent. The bundles get it following the boot dependencies, a bundle only waits
+        for its boot dependencies, so independent bundles are configured concurrently when there are several boot
+        workers"""
+        event = ConfigurationReadyEvent(configuration=self.config)
+        # The other listeners (and the listeners of the parent events) get it like any other event. The bundle
+        # listeners are registered afterwards, so they only get it here
+        self.event_manager.dispatch(event)
+        self.boot.run("configuration", lambda bundle: self.configure_bundle(bundle, event))
+
+    @staticmethod
+    def configure_bundle(bundle: object, event: ConfigurationReadyEvent):
+        """Call the bundle listeners of the ConfigurationReadyEvent"""
+        for event_type, listener in getattr(bundle, 'event_listeners', []):
+            if event_type is ConfigurationReadyEvent:
+                listener(event)
+
     def log_event_listeners_registered_for_bundle(self, bundle: object, registered_listeners: List[str]):
         """Display in the console the added event listeners"""
         if registered_listeners:
@@ -124,61 +238,257 @@ class Kernel:
             )
             self.console.log(f"Registered events for [bold cyan]{bundle.__class__.__name__}[/]: {event_list}")
 
+    @profiled
     def build_dependency_container(self):
         """Build the kernel and bundles service containers"""
         self.console.log("Building dependency container")
-        wire_modules = []
+        wire_modules = [module for bundle in self.bundles for module in getattr(bundle, 'wire_modules', [])]
+        if wire_modules:
+            # Before the boot workers import the modules to wire
+            from .wiring import Wiring, WiringPlan  # pylint: disable=import-outside-toplevel
+            self.wiring = Wiring(self.container, WiringPlan(self.cache_dir))
+        imported_modules = self.boot.run("container", self.build_bundle_container)
+        modules = []
         for bundle in self.bundles:
-            if hasattr(bundle, 'injection_bindings'):
-                for class_type, provider in bundle.injection_bindings.items():
-                    # A container provider is useful when a container has dependencies on other containers. Just provide
-                    # the container class as an easy way to use the defaults
-                    if isinstance(provider, types.FunctionType):
-                        # We use a function instead of directly the Provider to ensure that the dependencies are using
-                        # exactly the same container (and not other instance). Otherwise, the singletons will not be
-                        # singletons (will be at least two instances, one per container
-                        provider = provider(self.container)
-                    else:
-                        provider = providers.Container(provider)
-                    setattr(self.container, class_type, provider)
-
-            if hasattr(bundle, 'wire_modules'):
-                wire_modules += bundle.wire_modules
+            modules += imported_modules[bundle]
 
         # Applauncher services
+        # pylint: disable=attribute-defined-outside-init
         self.container.event_manager = providers.Object(self.event_manager)
         self.container.kernel = providers.Object(self)
 
         if wire_modules:
             self.console.log(f"[bold cyan]Wiring[/] modules: {wire_modules}")
-            self.container.wire(modules=[importlib.import_module(module) for module in wire_modules])
+            with span("container.wire", modules=wire_modules):
+                for module in modules:
+                    self.wiring.wire(module)
+                # The deferred modules are wired on import from now on
+                self.wiring.install()
         self.console.log("Dependency container [bold]built[/]")
 
+    def build_bundle_container(self, bundle: object):
+        """Add the bundle providers to the container and import the modules to wire (unless the wiring is lazy)"""
+        for class_type, provider in getattr(bundle, 'injection_bindings', {}).items():
+            # A container provider is useful when a container has dependencies on other containers. Just provide
+            # the container class as an easy way to use the defaults
+            if isinstance(provider, types.FunctionType):
+                # We use a function instead of directly the Provider to ensure that the dependencies are using
+                # exactly the same container (and not other instance). Otherwise, the singletons will not be
+                # singletons (will be at least two instances, one per container
+                provider = provider(self.container)
+            else:
+                provider = providers.Container(provider)
+            setattr(self.container, class_type, provider)
+        modules = []
+        for module in getattr(bundle, 'wire_modules', []):
+            if self.lazy_wiring:
+                module = self.wiring.defer(module)
+                if module is not None:
+                    modules.append(module)
+            else:
+                modules.append(self.wiring.import_module(module))
+        return modules
+
+    def resolve_provider(self, provider):
+        """Provider of a container attribute (a dotted path for the providers of the bundle containers) or the provider
+        itself"""
+        if isinstance(provider, str):
+            target = self.container
+            for name in provider.split("."):
+                target = getattr(target, name)
+            return target
+        return provider
+
+    @profiled
+    def warm_up(self):
+        """Instantiate the providers listed in the bundles `warm_up` before the services are started, so they do not
+        pay it on their first request. Independent bundles are warmed up concurrently with several boot workers"""
+        if any(getattr(bundle, 'warm_up', []) for bundle in self.bundles):
+            self.console.log("Warming up providers")
+            self.boot.run("warm up", self.warm_up_bundle)
+
+    def warm_up_bundle(self, bundle: object):
+        """Instantiate the warm up providers of a bundle"""
+        for provider in getattr(bundle, 'warm_up', []):
+            with span(str(provider), "warm_up"):
+                self.resolve_provider(provider)()
+
+    def register_process_initializers(self):
+        """Warm up the `process_warm_up` providers and run the `process_initializers` of the bundles in every service
+        process before the service starts"""
+        process_providers = [
+            self.resolve_provider(provider)
+            for bundle in self.bundles for provider in getattr(bundle, 'process_warm_up', [])
+        ]
+        initializers = [
+            initializer for bundle in self.bundles for initializer in getattr(bundle, 'process_initializers', [])
+        ]
+        if process_providers and not self.service_runner.forks:
+            raise ValueError("process_warm_up needs the fork start method, the services started with other methods do "
+                             "not inherit the container")
+        if process_providers or initializers:
+            # Only the providers and the initializers travel to the services, they must be picklable unless forking
+            self.service_runner.add_initializer(functools.partial(warm_up_process, process_providers, initializers))
+
+    @profiled
     def register_services(self):
         """Register the bundles services but not run them yet, it will be done later"""
         self.console.log("Registering services")
+        self.boot.run("services", self.register_bundle_services, concurrent=False)
+
+    def bundle_modules(self):
+        """Modules of the bundles and the modules they wire"""
+        modules = []
         for bundle in self.bundles:
-            if hasattr(bundle, 'services'):
-                for service_name, service_function, args, kwargs in bundle.services:
-                    self.console.log(f"Adding {service_name}")
-                    self.service_runner.add_service(
-                        name=service_name,
-                        function=service_function,
-                        args=args,
-                        kwargs=kwargs
-                    )
+            for module in [bundle.__class__.__module__] + list(getattr(bundle, 'wire_modules', [])):
+                if module not in modules:
+                    modules.append(module)
+        return modules
+
+    def register_bundle_services(self, bundle: object):
+        """Register the services of a bundle. An optional fifth element holds the service options: `runner` ("process",
+        "async" or "thread") and the options of that runner (like `restart`)"""
+        for service_name, service_function, args, kwargs, *options in getattr(bundle, 'services', []):
+            options = dict(options[0]) if options else {}
+            runner = options.pop("runner", "process")
+            if runner == "process":
+                service_runner = self.service_runner
+            elif runner == "async":
+                service_runner = self.async_service_runner
+            elif runner == "thread":
+                service_runner = self.thread_service_runner
+            else:
+                raise ValueError(f"Unknown runner {runner} for the service {service_name}")
+            self.console.log(f"Adding {service_name} ({runner})")
+            service_runner.add_service(
+                name=service_name,
+                function=service_function,
+                args=args,
+                kwargs=kwargs,
+                **options
+            )
+
+    def log_boot_timings(self):
+        """Display how long every bundle took in each boot phase"""
+        table = Table(title="Boot timings (ms)")
+        table.add_column("Bundle", style="bold cyan")
+        for phase in self.boot.timings:
+            table.add_column(phase, justify="right")
+        for bundle in self.boot.bundles:
+            table.add_row(
+                bundle_name(bundle),
+                *[f"{timings.get(bundle, 0) * 1000:.1f}" for timings in self.boot.timings.values()]
+            )
+        table.add_row(
+            "Phase total",
+            *[f"{self.boot.phase_durations[phase] * 1000:.1f}" for phase in self.boot.timings],
+            style="bold"
+        )
+        self.console.print(table)
 
+    def log_wiring(self):
+        """Display how long the wiring of every module took and the time saved by the wiring plan or by deferring it"""
+        if self.wiring is None:
+            return
+        deferred = self.wiring.deferred_savings()
+        if not self.wiring.report and not deferred:
+            return
+        table = Table(title="Wiring (ms)")
+        table.add_column("Module", style="bold cyan")
+        table.add_column("Mode")
+        table.add_column("Import", justify="right")
+        table.add_column("Wire", justify="right")
+        table.add_column("Saved", justify="right")
+        for module, mode, import_seconds, wire_seconds, saved in self.wiring.report:
+            table.add_row(module, mode, f"{import_seconds * 1000:.1f}", f"{wire_seconds * 1000:.1f}",
+                          f"{saved * 1000:.1f}")
+        for module, saved in deferred.items():
+            table.add_row(module, "lazy", "-", "-", "-" if saved is None else f"{saved * 1000:.1f}")
+        self.console.print(table)
+
+    def write_profile(self):
+        """Write the boot trace and display where the time went"""
+        profiler = get_profiler()
+        if not profiler.enabled:
+            return
+        set_profiler(NullProfiler())
+        profiler.write()
+        table = Table(title=f"Boot profile (trace written to {profiler.trace_file})")
+        table.add_column("Span", style="bold cyan")
+        table.add_column("Calls", justify="right")
+        table.add_column("Total (ms)", justify="right")
+        table.add_column("Max (ms)", justify="right")
+        for name, calls, total, maximum in profiler.summary()[:20]:
+            table.add_row(name, str(calls), f"{total * 1000:.1f}", f"{maximum * 1000:.1f}")
+        self.console.print(table)
+
+    @profiled
+    def start_event_bus(self):
+        """Share the events between the kernel and the services processes"""
+        if self.event_bus is not None:
+            self.event_bus.start()
+            self.service_runner.add_initializer(self.event_bus.connect)
+            self.console.log(f"Event bus listening on [bold cyan]{self.event_bus.address}[/]")
+
+    # pylint: disable-next=too-many-arguments,too-many-positional-arguments,too-many-statements,too-many-locals
     def __init__(self,
                  environment,
                  bundles,
                  configuration_file="config/config.yml",
-                 parameters_file="config/parameters.yml"):
-        self.console = Console()
+                 parameters_file="config/parameters.yml",
+                 event_bus=False,
+                 boot_workers=1,
+                 profile=None,
+                 cache_dir=None,
+                 watch_configuration=False,
+                 *,
+                 start_method=None,
+                 metrics_port=None,
+                 metrics_interval=5.0,
+                 metrics_host=None,
+                 lazy_wiring=False,
+                 interactive=True,
+                 headless=None,
+                 centralized_logging=True):
+        if headless is None:
+            headless = os.environ.get(HEADLESS_ENV_VAR, "").lower() in ("1", "true", "yes")
+        if headless:
+            configure_headless_logger()
+        elif interactive:
+            self.setup_interactive()
+        profile = profile or os.environ.get(PROFILE_ENV_VAR)
+        if profile:
+            set_profiler(StartupProfiler(profile))
+        self.console = HeadlessConsole() if headless else Console()
         self.console.log(f"Running environment [bold green]{environment}[/]")
         self.bundles = bundles
+        self.boot = BootScheduler(bundles, workers=boot_workers)
+        cache_dir = cache_dir or os.environ.get(CACHE_DIR_ENV_VAR)
+        self.cache_dir = cache_dir
+        self.configuration_cache = ConfigurationCache(cache_dir) if cache_dir else None
+        self.lazy_wiring = lazy_wiring
+        # Only created when a bundle has modules to wire
+        self.wiring = None
         self.environment = environment
+        self.configuration_file = configuration_file
+        self.parameters_file = parameters_file
+        self.configuration_watcher = None
         self.event_manager = EventManager()
-        self.service_runner = ProcessServiceRunner()
+        if metrics_port is None:
+            metrics_port = os.environ.get(METRICS_PORT_ENV_VAR)
+        self.metrics_server = None
+        self.service_metrics = None
+        # The dispatch metrics include the kernel events
+        self.dispatch_metrics = EventManager.enable_metrics() if metrics_port is not None else None
+        self.service_runner = ProcessServiceRunner(
+            start_method or os.environ.get(START_METHOD_ENV_VAR), centralized_logging=centralized_logging
+        )
+        self.async_service_runner = AsyncServiceRunner()
+        self.thread_service_runner = ThreadServiceRunner()
+        self.event_bus = None
+        if event_bus:
+            from .event_bus import EventBus  # pylint: disable=import-outside-toplevel
+            self.event_bus = EventBus(self.event_manager)
         self.shutting_down = False
 
         # Signals
@@ -187,14 +497,53 @@ class Kernel:
 
         with self.console.status("[bold green]Booting kernel..."):
             self.load_configuration(configuration_file=configuration_file, parameters_file=parameters_file)
+            self.configure_bundles()
+            # After the boot ConfigurationReadyEvent, the bundles got it from configure_bundles
             self.register_event_listeners(config_only=True)
-            self.event_manager.dispatch(ConfigurationReadyEvent(configuration=self.config))
             self.register_event_listeners()
             self.build_dependency_container()
-            self.event_manager.dispatch(KernelReadyEvent())
+            self.warm_up()
+            with span("KernelReadyEvent"):
+                self.event_manager.dispatch(KernelReadyEvent())
+            self.start_event_bus()
+            self.register_process_initializers()
             self.register_services()
+            self.service_runner.preload(self.bundle_modules())
+
+        self.log_boot_timings()
+        self.log_wiring()
+        self.write_profile()
+        if watch_configuration:
+            self.watch_configuration()
+        for service_runner in self.service_runners:
+            service_runner.run()
+        if metrics_port is not None:
+            self.start_metrics(
+                int(metrics_port), metrics_interval, metrics_host or os.environ.get(METRICS_HOST_ENV_VAR, "127.0.0.1")
+            )
 
-        self.service_runner.run()
+    def start_metrics(self, port, interval, host="127.0.0.1"):
+        """Serve the service and event metrics in the Prometheus text format, on localhost by default"""
+        from .metrics import MetricsServer, ServiceMetrics  # pylint: disable=import-outside-toplevel
+        self.service_metrics = ServiceMetrics(self.service_runner, interval)
+        self.service_metrics.start()
+        self.metrics_server = MetricsServer(
+            port, [self.service_metrics.collect, self.dispatch_metrics.collect], host=host
+        )
+        self.metrics_server.start()
+        self.console.log(f"Metrics served on [bold cyan]{host}:{self.metrics_server.port}[/]")
+
+    @property
+    def service_runners(self):
+        """The process runner and the in-process (async and thread) runners"""
+        return self.service_runner, self.async_service_runner, self.thread_service_runner
+
+    @staticmethod
+    def setup_interactive():
+        """Fancy tracebacks and log format, for the kernels run from a terminal"""
+        from rich.traceback import install  # pylint: disable=import-outside-toplevel
+        install()
+        configure_logger()
 
     def _signal_handler(self, _os_signal, _frame):
         self.shutdown()
@@ -208,16 +557,30 @@ class Kernel:
                 table.add_row("Shutdown signal received, press ctrl + c to kill the process")
                 self.console.print(table)
                 self.shutting_down = True
-                self.service_runner.shutdown()
+                for service_runner in self.service_runners:
+                    for name, stop_time in service_runner.shutdown().items():
+                        self.console.log(f"Service [bold cyan]{name}[/] stopped in {stop_time * 1000:.0f} ms")
+                if self.configuration_watcher is not None:
+                    self.configuration_watcher.stop()
+                if self.metrics_server is not None:
+                    self.service_metrics.stop()
+                    self.metrics_server.stop()
+                self.event_manager.flush_batches()
+                if self.event_bus is not None:
+                    self.event_bus.close()
+                if self.wiring is not None:
+                    self.wiring.uninstall()
             # The container should be shutted down even in forks
             self.container.shutdown_resources()
         elif is_main:
             self.console.log("[bold red]Killing...[/]")
-            self.service_runner.kill()
+            for service_runner in self.service_runners:
+                service_runner.kill()
 
     def wait(self):
         """Wait until all services are done"""
-        self.service_runner.wait()
+        for service_runner in self.service_runners:
+            service_runner.wait()
 
     def __enter__(self):
         return self
@@ -227,3 +590,6 @@ class Kernel:
 
 
 ServiceContainer.container = Kernel.container
+if hasattr(os, "register_at_fork"):
+    # The service processes do not trust the providers resolved before the fork
+    os.register_at_fork(after_in_child=ServiceContainer.reset_cache)
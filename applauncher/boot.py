@@ -0,0 +1,93 @@
+"""Bundle boot scheduling: dependencies between bundles, concurrency and timings"""
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from .profiler import span
+
+
+class BootDependencyError(Exception):
+    """The boot dependencies of the bundles cannot be satisfied"""
+
+
+def bundle_name(bundle):
+    """Name used to identify the bundle in the logs"""
+    return bundle.__class__.__name__
+
+
+def resolve_boot_dependencies(bundles):
+    """Map every bundle to the bundles it depends on. Bundles declare them in `boot_dependencies` as a list of bundle
+    classes"""
+    dependencies = {}
+    for bundle in bundles:
+        required = []
+        for dependency in getattr(bundle, "boot_dependencies", []):
+            matches = [candidate for candidate in bundles if isinstance(candidate, dependency)]
+            if not matches:
+                raise BootDependencyError(
+                    f"{bundle_name(bundle)} depends on {dependency.__name__} but it is not registered"
+                )
+            required += matches
+        dependencies[bundle] = required
+    return dependencies
+
+
+def boot_order(bundles, dependencies):
+    """Sort the bundles so every bundle comes after its dependencies. Independent bundles keep their order"""
+    ordered = []
+    pending = list(bundles)
+    while pending:
+        ready = [bundle for bundle in pending if all(dependency in ordered for dependency in dependencies[bundle])]
+        if not ready:
+            names = ", ".join(bundle_name(bundle) for bundle in pending)
+            raise BootDependencyError(f"Circular boot dependencies between {names}")
+        ordered.append(ready[0])
+        pending.remove(ready[0])
+    return ordered
+
+
+class BootScheduler:
+    """Runs the boot phases bundle by bundle. A bundle only waits for its boot dependencies, so with more than one
+    worker the independent bundles are set up concurrently. The time spent by each bundle in each phase is recorded"""
+    def __init__(self, bundles, workers=1):
+        self.dependencies = resolve_boot_dependencies(bundles)
+        self.bundles = boot_order(bundles, self.dependencies)
+        self.workers = workers
+        self.timings = {}
+        self.phase_durations = {}
+
+    def run(self, phase, step, concurrent=True):
+        """Call `step(bundle)` for every bundle and return the results by bundle. Phases with side effects that depend
+        on the bundles order should not be concurrent"""
+        self.timings[phase] = {}
+        started = time.perf_counter()
+        if concurrent and self.workers > 1:
+            results = self._run_concurrently(phase, step)
+        else:
+            results = {bundle: self._timed(phase, step, bundle) for bundle in self.bundles}
+        self.phase_durations[phase] = time.perf_counter() - started
+        return results
+
+    def _timed(self, phase, step, bundle):
+        started = time.perf_counter()
+        try:
+            with span(bundle_name(bundle), "bundle", phase=phase):
+                return step(bundle)
+        finally:
+            self.timings[phase][bundle] = time.perf_counter() - started
+
+    def _run_concurrently(self, phase, step):
+        """Submit every bundle as soon as its dependencies are done"""
+        results = {}
+        pending = list(self.bundles)
+        running = {}
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="boot") as executor:
+            while pending or running:
+                for bundle in list(pending):
+                    if all(dependency in results for dependency in self.dependencies[bundle]):
+                        pending.remove(bundle)
+                        running[executor.submit(self._timed, phase, step, bundle)] = bundle
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    # Raises the exception of the step if any, the pending bundles will not be started
+                    results[running.pop(future)] = future.result()
+        return results
@@ -1,24 +1,81 @@
 """Configuration format loaders"""
+import functools
+import hashlib
+import json
 import locale
+import logging
 import os
+import pickle
+import platform
 import re
 import string
+import sys
+import tempfile
 from abc import ABC, abstractmethod
 
 import yaml
-from pydantic import create_model
+from pydantic import VERSION as PYDANTIC_VERSION, create_model
 
+from .profiler import profiled, span
 
-def load_configuration(configuration_file_path, parameters_file_path, bundles):
-    """Combines the configuration and parameters and build the configuration object"""
+try:
+    import tomllib
+except ImportError:  # Python < 3.11
+    try:
+        import tomli as tomllib
+    except ImportError:
+        tomllib = None
+
+# File extension -> ConfigurationLoader class
+LOADERS = {}
+
+
+def register_loader(loader_class, *extensions):
+    """Use the loader for the configuration files with these extensions"""
+    for extension in extensions:
+        LOADERS[extension.lower()] = loader_class
+
+
+def get_loader(path):
+    """Loader for the file, based on its extension. Unknown extensions are considered YAML"""
+    return LOADERS.get(os.path.splitext(path)[1].lower(), YmlLoader)()
+
+
+@profiled
+def load_configuration(configuration_file_path, parameters_file_path, bundles, cache=None):
+    """Combines the configuration and parameters and build the configuration object. When a ConfigurationCache is
+    provided, the configuration is only parsed and validated if the cached one is stale"""
     mappings = {}
     for bundle in bundles:
         if hasattr(bundle, "config_mapping"):
             mappings.update(bundle.config_mapping)
-    loader = YmlLoader()
+    loader = get_loader(configuration_file_path)
+    if cache is not None:
+        return cache.build_config(
+            loader, mappings, config_source=configuration_file_path, parameters_source=parameters_file_path
+        )
     return loader.build_config(mappings, config_source=configuration_file_path, parameters_source=parameters_file_path)
 
 
+def referenced_parameters(template):
+    """Names of the parameters used by the {PLACEHOLDERS} of a configuration template"""
+    return compile_template(template).parameters
+
+
+def diff_configuration(old, new, prefix=""):
+    """Compare two configuration dictionaries. Returns the dotted path of every value that changed and its (old, new)
+    values, a missing value is None. Nested dictionaries are compared key by key, any other value as a whole"""
+    changes = {}
+    for key in list(old) + [key for key in new if key not in old]:
+        path = f"{prefix}{key}"
+        old_value, new_value = old.get(key), new.get(key)
+        if isinstance(old_value, dict) and isinstance(new_value, dict):
+            changes.update(diff_configuration(old_value, new_value, prefix=f"{path}."))
+        elif old_value != new_value or (key in old) != (key in new):
+            changes[path] = (old_value, new_value)
+    return changes
+
+
 def is_string(value):
     """Check if the value is actually a string or not"""
     try:
@@ -40,18 +97,47 @@ class ConfigurationLoader(ABC):
     def load_config(self, config_source, parameters_source):
         """Prase the config file and build a dictionary"""
 
+    def parse(self, text):
+        """Convert a text in this format into a dictionary, without replacing any parameter. It is optional: the
+        parameters files of the loaders without it are read with their `load_parameters` instead"""
+        raise NotImplementedError(f"{self.__class__.__name__} cannot parse texts")
+
+    @classmethod
+    def can_parse(cls):
+        """True if the loader implements `parse`"""
+        return cls.parse is not ConfigurationLoader.parse
+
+    def referenced_parameters(self, config_raw):
+        """Names of the parameters used by the configuration placeholders"""
+        return referenced_parameters(config_raw)
+
+    @staticmethod
+    def configuration_model(config_mappings):
+        """Build the model of the whole configuration from the bundles mappings"""
+        with span("configuration.create_model"):
+            return create_model('Configuration', **{k: (v, ...) for k, v in config_mappings.items()})
+
     def build_config(self, config_mappings, config_source, parameters_source):
         """By using the loaded parameters and loaded config, build the final configuration object"""
-        configuration_class = create_model('Configuration', **{k: (v, ...) for k, v in config_mappings.items()})
-        return configuration_class(**self.load_config(config_source, parameters_source))
+        configuration_class = self.configuration_model(config_mappings)
+        loaded = self.load_config(config_source, parameters_source)
+        with span("configuration.validate"):
+            return configuration_class(**loaded)
 
 
 class YmlLoader(ConfigurationLoader):
     """YML Format parser and config loader"""
+    # The libyaml parser is much faster than the pure Python one, but it is not always installed
+    yaml_loader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+    def parse(self, text):
+        return yaml.load(text, Loader=self.yaml_loader)
+
     def load_parameters(self, source):
         """For YML, the source it the file path"""
         with open(source, encoding=locale.getpreferredencoding(False)) as parameters_source:
-            loaded = yaml.safe_load(parameters_source.read())
+            with span("configuration.parse_parameters", file=source):
+                loaded = self.parse(parameters_source.read())
             if loaded:
                 for key, value in loaded.items():
                     if isinstance(value, str):
@@ -71,20 +157,83 @@ class YmlLoader(ConfigurationLoader):
                 if params is not None:
                     parameters.update(params)
 
-            # Overwrite parameters with the environment variables
-            env_params = {}
-            env_params.update(os.environ)
-            for key, value in env_params.items():
-                if is_string(value):
-                    env_params[key] = "'" + value + "'"
-
-            parameters.update(env_params)
-            # Replace the parameters
-            final_configuration = FormatterWithListYAML().format(config_raw, **parameters)
-            final_configuration = yaml.safe_load(final_configuration)
+            # Replace the parameters, the environment variables overwrite them
+            with span("configuration.format"):
+                final_configuration = compile_template(config_raw).render(TemplateParameters(parameters))
+            with span("configuration.parse", file=config_source):
+                final_configuration = self.parse(final_configuration)
             return final_configuration if final_configuration is not None else {}
 
 
+class StructuredLoader(ConfigurationLoader):  # pylint: disable=abstract-method
+    """Base loader for the formats whose syntax uses braces, so they cannot be formatted as a text like YAML. The file
+    is parsed first and then the placeholders of its string values are replaced. A string that is only a placeholder
+    takes the value type: numbers and booleans as they would be in YAML and lists when using the `[]` format.
+    Otherwise, the values are formatted into the string"""
+    def load_parameters(self, source):
+        """The parameters file can be in any of the registered formats"""
+        loader = get_loader(source)
+        if not loader.can_parse():
+            return loader.load_parameters(source) or {}
+        with open(source, encoding=locale.getpreferredencoding(False)) as parameters_source:
+            with span("configuration.parse_parameters", file=source):
+                loaded = loader.parse(parameters_source.read())
+        return loaded or {}
+
+    def load_config(self, config_source, parameters_source):
+        with open(config_source, encoding=locale.getpreferredencoding(False)) as config_source_file:
+            with span("configuration.parse", file=config_source):
+                loaded = self.parse(config_source_file.read())
+        parameters = self.load_parameters(parameters_source) if os.path.isfile(parameters_source) else {}
+        with span("configuration.format"):
+            return self._replace(loaded, StructuredParameters(parameters)) if loaded else {}
+
+    # A placeholder in the raw text: an opening brace followed by a name and the end of the field or its format
+    placeholder = re.compile(r"\{([A-Za-z_]\w*)(?=[}:!.\[])")
+
+    def referenced_parameters(self, config_raw):
+        """The placeholders are searched in the raw text, so the file is not parsed. A brace of the syntax that looks
+        like a placeholder adds an extra name, which is harmless for the cache fingerprint"""
+        return set(self.placeholder.findall(config_raw))
+
+    def _replace(self, value, parameters):
+        """Replace the placeholders of all the strings of the parsed configuration"""
+        if isinstance(value, dict):
+            return {key: self._replace(item, parameters) for key, item in value.items()}
+        if isinstance(value, list):
+            return [self._replace(item, parameters) for item in value]
+        if isinstance(value, str) and ("{" in value or "}" in value):
+            return self._replace_string(value, parameters)
+        return value
+
+    @staticmethod
+    def _replace_string(text, parameters):
+        template = compile_template(text)
+        if len(template.parts) == 1:
+            literal_text, field_name, format_spec, conversion = template.parts[0]
+            if not literal_text and field_name and not conversion:
+                value, _ = template.formatter.get_field(field_name, (), parameters)
+                if format_spec.startswith("["):
+                    return template.formatter.split_list(str(value), format_spec)
+                if not format_spec:
+                    return value
+        return template.render(parameters)
+
+
+class JsonLoader(StructuredLoader):
+    """JSON Format parser and config loader"""
+    def parse(self, text):
+        return json.loads(text)
+
+
+class TomlLoader(StructuredLoader):
+    """TOML Format parser and config loader. It requires Python 3.11 or the tomli package"""
+    def parse(self, text):
+        if tomllib is None:
+            raise ImportError("TOML configuration files require Python 3.11 or the tomli package")
+        return tomllib.loads(text)
+
+
 class FormatterWithListYAML(string.Formatter):
     """This class adds extra formatting options to format a string as a list.
     Both [] and YAML-style (item list with -) are supported.
@@ -111,19 +260,28 @@ class FormatterWithListYAML(string.Formatter):
             return self._format_list_field(value, format_spec)
         return super().format_field(value, format_spec)
 
-    def _format_list_field(self, value, format_spec) -> str:
-        """This is the specific logic to convert the string into a list.
+    def split_list(self, value, format_spec) -> list:
+        """Split the value into the list items.
 
         :param value: This is the value which will replace a specific {PLACEHOLDER} in the string.
         :param format_spec: This string describes how to format that value {PLACEHOLDER:format_spec}
 
-        :return: The formatted value to be inserted."""
+        :return: The list items."""
         if len(format_spec) > 2 and format_spec[2] == ']':
             splitter = format_spec[1]
         else:
             splitter = self.default_splitter
         # Found out the value is enclosed in quotes sometimes D:
-        split_value = value.rstrip("'").lstrip("'").rstrip('"').lstrip('"').split(splitter)
+        return value.rstrip("'").lstrip("'").rstrip('"').lstrip('"').split(splitter)
+
+    def _format_list_field(self, value, format_spec) -> str:
+        """This is the specific logic to convert the string into a list.
+
+        :param value: This is the value which will replace a specific {PLACEHOLDER} in the string.
+        :param format_spec: This string describes how to format that value {PLACEHOLDER:format_spec}
+
+        :return: The formatted value to be inserted."""
+        split_value = self.split_list(value, format_spec)
         make_item_list = '-' in format_spec
         if not make_item_list:
             # f-string can't be used since we have both quoting marks occupied.
@@ -135,3 +293,168 @@ class FormatterWithListYAML(string.Formatter):
         for list_element in split_value[1:]:
             output += f"\n{' ' * spaces}- {list_element}"
         return output
+
+
+class TemplateParameters:
+    """Values of the template placeholders. The environment variables overwrite the parameters file, but they are only
+    read (and quoted when they are strings) if the template uses them"""
+    def __init__(self, parameters):
+        self.parameters = parameters
+
+    def __getitem__(self, name):
+        value = os.environ.get(name)
+        if value is None:
+            return self.parameters[name]
+        return "'" + value + "'" if is_string(value) else value
+
+
+class StructuredParameters(TemplateParameters):
+    """Values of the placeholders for the structured formats. Like YAML does, the environment variables with numbers or
+    booleans are converted"""
+    def __getitem__(self, name):
+        value = os.environ.get(name)
+        if value is None:
+            return self.parameters[name]
+        return value if is_string(value) else yaml.safe_load(value)
+
+
+class CompiledTemplate:
+    """A configuration template parsed once into its literal text and its placeholders"""
+    def __init__(self, template, formatter=None):
+        self.formatter = formatter if formatter is not None else FormatterWithListYAML()
+        self.parts = list(self.formatter.parse(template))
+        self.parameters = {
+            re.split(r"[.\[]", field_name, maxsplit=1)[0] for _, field_name, _, _ in self.parts if field_name
+        }
+
+    def render(self, parameters):
+        """Replace the placeholders like `string.Formatter.vformat` does, `parameters` only needs `__getitem__`"""
+        formatter = self.formatter
+        output = []
+        for literal_text, field_name, format_spec, conversion in self.parts:
+            output.append(literal_text)
+            if field_name is None:
+                continue
+            value, _ = formatter.get_field(field_name, (), parameters)
+            value = formatter.convert_field(value, conversion)
+            if "{" in format_spec:
+                format_spec = formatter.vformat(format_spec, (), parameters)
+            output.append(formatter.format_field(value, format_spec))
+        return "".join(output)
+
+
+@functools.lru_cache(maxsize=32)
+def compile_template(template):
+    """Compiled templates are reused while the template text does not change"""
+    return CompiledTemplate(template)
+
+
+class ConfigurationCache:
+    """On-disk cache of the validated configuration.
+
+    The entry is keyed by a fingerprint of the configuration file, the parameters file, the environment variables
+    referenced by the configuration and the modules defining the bundles config mappings. When the fingerprint matches,
+    the configuration is rebuilt from the cached values without parsing nor validating anything. Otherwise the entry is
+    stale and it is replaced by a freshly loaded configuration.
+    """
+    def __init__(self, directory):
+        self.directory = directory
+        self.logger = logging.getLogger("configuration")
+        self.hit = False
+
+    def fingerprint(self, loader, config_mappings, config_source, parameters_source):
+        """Hash of everything the configuration depends on"""
+        digest = hashlib.sha256()
+        digest.update(f"{sys.version}|{platform.machine()}|{PYDANTIC_VERSION}".encode())
+        with open(config_source, "rb") as config_file:
+            config_raw = config_file.read()
+        digest.update(config_raw)
+        if os.path.isfile(parameters_source):
+            with open(parameters_source, "rb") as parameters_file:
+                digest.update(b"parameters:" + parameters_file.read())
+        template = config_raw.decode(locale.getpreferredencoding(False))
+        for name in sorted(loader.referenced_parameters(template)):
+            digest.update(f"env:{name}={os.environ.get(name)!r}".encode())
+        for key in sorted(config_mappings):
+            digest.update(f"mapping:{key}={self._type_fingerprint(config_mappings[key])}".encode())
+        return digest.hexdigest()
+
+    @classmethod
+    def _type_fingerprint(cls, mapping_type):
+        """Identify the mapping type and every model it uses (through its fields and bases, recursively) with the
+        version of the code defining them"""
+        found = set()
+        pending = [mapping_type]
+        while pending:
+            current = pending.pop()
+            if not isinstance(current, type):
+                # List[Model], Optional[Model]...
+                pending.extend(getattr(current, "__args__", None) or ())
+                continue
+            if current in found:
+                continue
+            found.add(current)
+            pending.extend(current.__mro__[1:])
+            pending.extend(field.outer_type_ for field in getattr(current, "__fields__", {}).values())
+        return "|".join(sorted(cls._code_fingerprint(found_type) for found_type in found))
+
+    @staticmethod
+    def _code_fingerprint(found_type):
+        """The type and the version of its module"""
+        module = sys.modules.get(found_type.__module__)
+        module_file = getattr(module, "__file__", None)
+        source = ""
+        if module_file and os.path.isfile(module_file):
+            stat = os.stat(module_file)
+            source = f"{module_file}:{stat.st_mtime_ns}:{stat.st_size}"
+        return f"{found_type.__module__}.{found_type.__qualname__}@{source}"
+
+    def entry_path(self, config_source):
+        """Every configuration file has its own cache entry"""
+        name = hashlib.sha256(os.path.abspath(config_source).encode()).hexdigest()[:16]
+        return os.path.join(self.directory, f"configuration-{name}.pickle")
+
+    def build_config(self, loader, config_mappings, config_source, parameters_source):
+        """Use the cached configuration if it is fresh, otherwise load it with the loader and cache it"""
+        with span("configuration.fingerprint"):
+            key = self.fingerprint(loader, config_mappings, config_source, parameters_source)
+        path = self.entry_path(config_source)
+        values = self._read(path, key)
+        self.hit = values is not None
+        if self.hit:
+            return loader.configuration_model(config_mappings).construct(**values)
+
+        configuration = loader.build_config(config_mappings, config_source, parameters_source)
+        self._write(path, key, {field: getattr(configuration, field) for field in configuration.__fields__})
+        return configuration
+
+    def _read(self, path, key):
+        """Cached values, None when there is no entry or it is stale"""
+        try:
+            with open(path, "rb") as entry_file, span("configuration.cache_read"):
+                entry = pickle.load(entry_file)
+        except FileNotFoundError:
+            return None
+        except Exception:  # pylint: disable=broad-except
+            # Corrupted entry or classes that cannot be imported anymore
+            self.logger.warning("Ignoring unreadable configuration cache %s", path)
+            return None
+        return entry["values"] if entry.get("key") == key else None
+
+    def _write(self, path, key, values):
+        """Write the entry atomically, so a concurrent boot never reads half of it"""
+        try:
+            data = pickle.dumps({"key": key, "values": values}, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception:  # pylint: disable=broad-except
+            self.logger.warning("The configuration cannot be cached, it is not picklable")
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        descriptor, temporary_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(descriptor, "wb") as entry_file:
+            entry_file.write(data)
+        os.replace(temporary_path, path)
+
+
+register_loader(YmlLoader, ".yml", ".yaml")
+register_loader(JsonLoader, ".json")
+register_loader(TomlLoader, ".toml")
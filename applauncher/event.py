@@ -1,50 +1,273 @@
 """Base events used by the applauncher kernel. Bundles events can extend them"""
+import asyncio
+import inspect
+import logging
+import os
+import pickle
+import struct
+import threading
+import time
+import typing
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+
 import blinker
 
 
+# Typed events by (encoded) event name, to decode them
+_typed_events = {}
+EVENT_NAME_HEADER = struct.Struct("!H")
+# Class attributes of every event, they are never fields even if they are annotated
+EVENT_SETTINGS = {"event_name", "ordered", "shared", "coalesce_key"}
+# Struct codes of the fixed size fields, str and bytes are prefixed by their length and the rest is pickled
+FIXED_SIZE_FIELDS = {int: "q", float: "d", bool: "?", "int": "q", "float": "d", "bool": "?"}
+VARIABLE_SIZE_FIELDS = {
+    str: ("{}.encode()", "str({}, 'utf-8')"),
+    "str": ("{}.encode()", "str({}, 'utf-8')"),
+    bytes: ("bytes({})", "bytes({})"),
+    "bytes": ("bytes({})", "bytes({})"),
+}
+PICKLED_FIELD = ("_dumps({}, _protocol)", "_loads({})")
+# Raised by the codec for the values it cannot pack, like None or an int over 64 bits
+CODEC_ERRORS = (AttributeError, TypeError, OverflowError, struct.error)
+
+
+class EventCodec:
+    """Binary encoding of the fields of a typed event: the fixed size values and the lengths of the other ones packed
+    with a struct, followed by the other ones. `prefix` goes before them (the event name). The encode and decode
+    functions are generated for the fields, like dataclasses do"""
+    def __init__(self, fields, prefix=b""):
+        fixed = [(name, FIXED_SIZE_FIELDS[kind]) for name, kind in fields.items() if kind in FIXED_SIZE_FIELDS]
+        variable = [(name, VARIABLE_SIZE_FIELDS.get(kind, PICKLED_FIELD))
+                    for name, kind in fields.items() if kind not in FIXED_SIZE_FIELDS]
+        self.header = struct.Struct("!" + "".join(code for _, code in fixed) + "I" * len(variable))
+        namespace = {
+            "_prefix": prefix, "_pack": self.header.pack, "_unpack_from": self.header.unpack_from,
+            "_header_size": self.header.size, "_dumps": pickle.dumps, "_loads": pickle.loads,
+            "_protocol": pickle.HIGHEST_PROTOCOL,
+        }
+        # The fields are local variables of the generated functions, prefixed to avoid clashes with the helpers
+        packed = [f"event.{name}" for name, _ in fixed] + [f"len(f_{name})" for name, _ in variable]
+        encode = ["def encode(event):"]
+        # struct packs anything as a bool, so None would be decoded as False
+        encode += [f"    if event.{name}.__class__ is not bool: raise TypeError('{name} is not a bool')"
+                   for name, code in fixed if code == "?"]
+        encode += [f"    f_{name} = {encoder.format(f'event.{name}')}" for name, (encoder, _) in variable]
+        parts = ["_prefix", f"_pack({', '.join(packed)})"] + [f"f_{name}" for name, _ in variable]
+        encode.append(f"    return b''.join(({', '.join(parts)}))")
+        unpacked = [f"f_{name}" for name, _ in fixed] + [f"size_{name}" for name, _ in variable]
+        decode = ["def decode(event_class, data, offset=0):"]
+        if unpacked:
+            decode.append(f"    {', '.join(unpacked)}, = _unpack_from(data, offset)")
+        decode += ["    offset += _header_size", "    event = event_class.__new__(event_class)"]
+        decode += [f"    event.{name} = f_{name}" for name, _ in fixed]
+        for name, (_, decoder) in variable:
+            decode.append(f"    event.{name} = {decoder.format(f'data[offset:offset + size_{name}]')}")
+            decode.append(f"    offset += size_{name}")
+        decode.append("    return event")
+        exec("\n".join(encode + decode), namespace)  # pylint: disable=exec-used
+        self.encode = namespace["encode"]
+        self.decode = namespace["decode"]
+
+
+def encode_event(event):
+    """A typed event as bytes, the event name followed by its fields"""
+    return event.codec.encode(event)
+
+
+def decode_event(data):
+    """The typed event encoded by `encode_event`. Its class must be defined in this process"""
+    (size,) = EVENT_NAME_HEADER.unpack_from(data)
+    offset = EVENT_NAME_HEADER.size + size
+    name = bytes(data[EVENT_NAME_HEADER.size:offset])
+    event_class = _typed_events.get(name)
+    if event_class is None:
+        raise KeyError(f"Unknown typed event {name.decode()}")
+    return event_class.codec.decode(event_class, data, offset)
+
+
+def _is_class_var(annotation):
+    if isinstance(annotation, str):
+        return annotation.startswith(("ClassVar", "typing.ClassVar"))
+    # typing.get_origin is Python 3.8+ and the ClassVar of Python 3.6 has no origin
+    return annotation is typing.ClassVar or getattr(annotation, "__origin__", None) is typing.ClassVar or \
+        type(annotation).__name__ == "_ClassVar"
+
+
+def _typed_init(fields, defaults):
+    """Build the __init__ of a typed event, taking the fields in order"""
+    defaulted = [name in defaults for name in fields]
+    if any(defaulted) and not all(defaulted[defaulted.index(True):]):
+        raise TypeError("The fields without default value must come before the ones with a default value")
+    parameters = ", ".join(f"{name}=_defaults[{name!r}]" if name in defaults else name for name in fields)
+    body = "".join(f"\n    self.{name} = {name}" for name in fields) or "\n    pass"
+    namespace = {}
+    exec(f"def __init__(self, {parameters}):{body}", {"_defaults": defaults}, namespace)  # pylint: disable=exec-used
+    return namespace["__init__"]
+
+
+def _restore_typed_event(event_class, values):
+    event = event_class.__new__(event_class)
+    for name, value in zip(event_class.fields, values):
+        setattr(event, name, value)
+    return event
+
+
+def _reduce_typed_event(event):
+    try:
+        return decode_event, (encode_event(event),)
+    except CODEC_ERRORS:
+        # The values the codec cannot pack are pickled as usual
+        return _restore_typed_event, (type(event), tuple(getattr(event, name) for name in event.fields))
+
+
+def _custom_init(bases, dct):
+    """True if the event or one of its bases defines its own __init__"""
+    return "__init__" in dct or any(base.__init__ is not object.__init__ for base in bases)
+
+
 class EventHierarchy(type):
-    """Build the full namespace when creating an event"""
+    """Build the full namespace when creating an event.
+
+    The annotated attributes of an event without its own `__init__` are its fields: the event gets `__slots__` (no
+    instance dict), an `__init__` taking the fields in order (the assigned values are the defaults) and a binary codec,
+    also used to pickle it. The events defining an `__init__` keep their annotated attributes as they are"""
     def __new__(cls, name, bases, dct):
         signal_list = [dct["event_name"]]
         for base in bases:
             if hasattr(base, "_signals"):
                 signal_list += getattr(base, "_signals")
         dct["_signals"] = signal_list
-        return type.__new__(cls, name, bases, dct)
+        inherited = {}
+        defaults = {}
+        for base in reversed(bases):
+            inherited.update(getattr(base, "fields", {}))
+            defaults.update(getattr(base, "field_defaults", {}))
+        own = {
+            key: value for key, value in dct.get("__annotations__", {}).items()
+            if key not in EVENT_SETTINGS and not _is_class_var(value)
+        }
+        if not inherited and (not own or _custom_init(bases, dct)):
+            return type.__new__(cls, name, bases, dct)
+
+        for field in own:
+            if field in dct:
+                defaults[field] = dct.pop(field)
+        fields = {**inherited, **own}
+        dct.setdefault("__slots__", tuple(field for field in own if field not in inherited))
+        dct["fields"] = fields
+        dct["field_defaults"] = defaults
+        event_name = dct["event_name"].encode()
+        if len(event_name) >= 0x8000:
+            # The encoded event must not start like a pickle (0x80)
+            raise ValueError(f"The name of the typed event {name} is too long")
+        dct["codec"] = EventCodec(fields, EVENT_NAME_HEADER.pack(len(event_name)) + event_name)
+        dct["__reduce__"] = _reduce_typed_event
+        if "__init__" not in dct:
+            dct["__init__"] = _typed_init(fields, defaults)
+        event_class = type.__new__(cls, name, bases, dct)
+        _typed_events[event_name] = event_class
+        return event_class
 
 
 class Event(metaclass=EventHierarchy):
     """Generic event"""
+    # The events with fields have no instance dict, the other ones get it as usual
+    __slots__ = ()
     event_name = "event"
+    # Ordered events are delivered to one listener after the other, also when using dispatch_async
+    ordered = False
+    # Shared events are sent to the other processes when an event bus is configured (they must be picklable)
+    shared = False
+    # Attribute of coalesced events: a batch listener only gets the latest event of a batch with the same value
+    coalesce_key = None
 
 
 class KernelReadyEvent(Event):
     """Raised when the kernel is fully ready"""
     event_name = "kernel.kernel_ready"
+    ordered = True
 
 
 class ConfigurationReadyEvent(Event):
     """Raised when the configuration is ready. The configuration is provided in the event"""
     event_name = "kernel.configuration_ready"
+    ordered = True
 
     def __init__(self, configuration):
         self.configuration = configuration
 
 
+class ConfigurationChangedEvent(Event):
+    """Raised when the configuration files change while the kernel is running. `changes` maps the dotted path of every
+    changed value to its (old, new) values, a missing value is None"""
+    event_name = "kernel.configuration_changed"
+
+    def __init__(self, configuration, changes):
+        self.configuration = configuration
+        self.changes = changes
+
+    def changed(self, prefix):
+        """Check if any value under the dotted path has changed"""
+        return any(path == prefix or path.startswith(prefix + ".") for path in self.changes)
+
+
+class ServiceMemoryExceededEvent(Event):
+    """Raised when a service process finishes because it ran out of the memory limit of the service"""
+    event_name = "kernel.service_memory_exceeded"
+
+    def __init__(self, service, replica, memory_limit):
+        self.service = service
+        self.replica = replica
+        self.memory_limit = memory_limit
+
+
 class InjectorReadyEvent(Event):
     """Raised when you can use the dependency injection container"""
     event_name = "kernel.injector_ready"
+    ordered = True
 
 
 class KernelShutdownEvent(Event):
     """This event will be sent to your bundle to notify that it should stop everything"""
     event_name = "kernel.kernel_shutdown"
+    ordered = True
 
 
 class EventManager:
-    """To register and dispatch application events"""
-    @staticmethod
-    def add_listener(event, listener):
+    """To register and dispatch application events.
+
+    Listeners are stored in blinker signals, but dispatching does not go through blinker. The first time an event class
+    is dispatched, the receivers of its whole hierarchy are resolved into a flat list that is reused by the following
+    dispatches until a new listener is added.
+
+    Events can also be dispatched from a coroutine with `dispatch_async`. Each event class gets a bounded queue
+    consumed by its own task, so the publisher only waits when the queue is full. Coroutine listeners are awaited
+    concurrently and the other ones run in a thread pool.
+
+    When a transport (like the EventBus) is set, shared events are also published to the other processes.
+
+    The dispatch count and time of every event type are measured once `enable_metrics` is called.
+
+    Batch listeners (`add_batch_listener`) get lists of events instead of every event.
+    """
+    _dispatch_table = {}
+    # Changes every time the listeners change, a table compiled meanwhile is not kept
+    _generation = 0
+    _transport = None
+    _metrics = None
+    _batchers = []
+
+    def __init__(self, queue_size=1000, max_workers=None):
+        self.queue_size = queue_size
+        self.max_workers = max_workers
+        self.logger = logging.getLogger("event")
+        self._queues = {}
+        self._consumers = []
+        self._executor = None
+
+    @classmethod
+    def add_listener(cls, event, listener):
         """Listen for an event"""
         if isinstance(event, str):
             channel = blinker.signal(event)
@@ -52,9 +275,278 @@ class EventManager:
             channel = blinker.signal(event.event_name)
 
         channel.connect(listener)
+        cls._invalidate()
+
+    @classmethod
+    def remove_listener(cls, event, listener):
+        """Stop listening for an event"""
+        blinker.signal(event if isinstance(event, str) else event.event_name).disconnect(listener)
+        cls._invalidate()
+
+    @classmethod
+    def _invalidate(cls):
+        """Forget the compiled receivers, the listeners changed"""
+        cls._generation += 1
+        cls._dispatch_table.clear()
+
+    @classmethod
+    def add_batch_listener(cls, event, listener, max_size=100, max_delay=0.1):
+        """Listen for an event, receiving lists of up to `max_size` events at most `max_delay` seconds after the first
+        one (from a timer thread). The listener is kept alive until `remove_batch_listener`. Returns its EventBatcher"""
+        batcher = EventBatcher(listener, max_size, max_delay)
+        cls._batchers.append(batcher)
+        cls.add_listener(event, batcher)
+        return batcher
+
+    @classmethod
+    def remove_batch_listener(cls, event, batcher):
+        """Stop a batch listener (the EventBatcher returned by `add_batch_listener`), its pending events are
+        delivered"""
+        cls.remove_listener(event, batcher)
+        if batcher in cls._batchers:
+            cls._batchers.remove(batcher)
+        batcher.close()
+
+    @classmethod
+    def flush_batches(cls):
+        """Deliver the pending events of all the batch listeners right now"""
+        for batcher in list(cls._batchers):
+            batcher.flush()
+
+    @classmethod
+    def _reset_batches_after_fork(cls):
+        for batcher in cls._batchers:
+            batcher.reset()
+
+    @classmethod
+    def enable_metrics(cls, enabled=True):
+        """Start (or stop) measuring the dispatches. Returns the DispatchMetrics"""
+        # The metrics module (and its HTTP server) is only imported when the metrics are used
+        from .metrics import DispatchMetrics  # pylint: disable=import-outside-toplevel
+        cls._metrics = DispatchMetrics() if enabled else None
+        return cls._metrics
+
+    @classmethod
+    def set_transport(cls, transport):
+        """Publish the shared events through this transport. It must provide a `publish(event)` method"""
+        cls._transport = transport
 
-    @staticmethod
-    def dispatch(event):
+    @classmethod
+    def dispatch(cls, event):
         """This event will be propagated to all listeners"""
-        for channel in getattr(event, "_signals"):
-            blinker.signal(channel).send(event)
+        cls.dispatch_local(event)
+        if event.shared and cls._transport is not None:
+            cls._transport.publish(event)
+
+    @classmethod
+    def dispatch_local(cls, event):
+        """Propagate the event to the listeners of this process only"""
+        event_class = event.__class__
+        receivers = cls._dispatch_table.get(event_class)
+        if receivers is None:
+            receivers = cls._compile(event_class)
+
+        metrics = cls._metrics
+        if metrics is not None:
+            started = time.perf_counter()
+        for reference in receivers:
+            receiver = reference()
+            if receiver is None:
+                # The listener was garbage collected, blinker already forgot it so the table must be rebuilt
+                cls._dispatch_table.pop(event_class, None)
+                continue
+            receiver(event)
+        if metrics is not None:
+            metrics.record(event.event_name, time.perf_counter() - started)
+
+    async def dispatch_async(self, event):
+        """Queue the event to be propagated to all listeners. Ordered events are delivered right away, once all the
+        events dispatched before them have been delivered"""
+        if event.ordered:
+            await self.join()
+            await self._deliver_in_order(event)
+        else:
+            queue = self._queues.get(event.__class__)
+            if queue is None:
+                queue = self._start_queue(event.__class__)
+            await queue.put(event)
+
+        if event.shared and self._transport is not None:
+            self._transport.publish(event)
+
+    async def join(self):
+        """Wait until all the queued events have been delivered"""
+        for queue in list(self._queues.values()):
+            await queue.join()
+
+    async def close(self):
+        """Deliver the pending events and stop the queue consumers and the thread pool"""
+        await self.join()
+        for consumer in self._consumers:
+            consumer.cancel()
+        await asyncio.gather(*self._consumers, return_exceptions=True)
+        self._queues = {}
+        self._consumers = []
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def _start_queue(self, event_class):
+        """Create the bounded queue of an event class and the task that consumes it"""
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self._queues[event_class] = queue
+        self._consumers.append(asyncio.get_event_loop().create_task(self._consume(queue)))
+        return queue
+
+    async def _consume(self, queue):
+        """Deliver the events of a queue one after the other"""
+        while True:
+            event = await queue.get()
+            try:
+                await self._deliver(event)
+            finally:
+                queue.task_done()
+
+    async def _deliver(self, event):
+        """Run all the listeners of the event concurrently"""
+        loop = asyncio.get_event_loop()
+        metrics = self._metrics
+        started = time.perf_counter()
+        calls = []
+        for receiver in self._live_receivers(event.__class__):
+            if asyncio.iscoroutinefunction(receiver):
+                calls.append(receiver(event))
+            else:
+                calls.append(loop.run_in_executor(self._get_executor(), receiver, event))
+        for result in await asyncio.gather(*calls, return_exceptions=True):
+            if isinstance(result, Exception):
+                self.logger.error("Listener of %s failed", event.event_name, exc_info=result)
+        if metrics is not None:
+            metrics.record(event.event_name, time.perf_counter() - started)
+
+    async def _deliver_in_order(self, event):
+        """Run the listeners of the event one after the other, like dispatch does"""
+        loop = asyncio.get_event_loop()
+        metrics = self._metrics
+        started = time.perf_counter()
+        for receiver in self._live_receivers(event.__class__):
+            if asyncio.iscoroutinefunction(receiver):
+                await receiver(event)
+            else:
+                await loop.run_in_executor(self._get_executor(), receiver, event)
+        if metrics is not None:
+            metrics.record(event.event_name, time.perf_counter() - started)
+
+    def _get_executor(self):
+        """The thread pool is only created when a synchronous listener is dispatched asynchronously"""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="event")
+        return self._executor
+
+    @classmethod
+    def _live_receivers(cls, event_class):
+        """Receivers of the event class that are still alive"""
+        receivers = cls._dispatch_table.get(event_class)
+        if receivers is None:
+            receivers = cls._compile(event_class)
+        live_receivers = [reference() for reference in receivers]
+        if any(receiver is None for receiver in live_receivers):
+            cls._dispatch_table.pop(event_class, None)
+            live_receivers = [receiver for receiver in live_receivers if receiver is not None]
+        return live_receivers
+
+    @classmethod
+    def _compile(cls, event_class):
+        """Resolve all the receivers of an event class (and its parents) into a flat list. The events are dispatched
+        from several threads, if a listener is added while compiling the table is dropped (the receivers are still
+        used for this dispatch)"""
+        generation = cls._generation
+        receivers = tuple(
+            _weak_reference(receiver)
+            for channel in getattr(event_class, "_signals")
+            for receiver in blinker.signal(channel).receivers_for(blinker.ANY)
+        )
+        cls._dispatch_table[event_class] = receivers
+        if cls._generation != generation:
+            # Stored after (or while) the table was cleared
+            cls._dispatch_table.pop(event_class, None)
+        return receivers
+
+
+class EventBatcher:  # pylint: disable=too-many-instance-attributes
+    """Listener collecting the events of a batch listener. The batch is delivered when it is full, `max_delay` seconds
+    after its first event (None to wait for a full batch or `flush`) or when flushed. Coalesced events replace the
+    previous event of the same class and key in the batch, so bursts of updates of the same thing are delivered once.
+
+    A timer thread only exists while there are pending events"""
+    def __init__(self, listener, max_size=100, max_delay=0.1):
+        self.listener = listener
+        self.max_size = max_size
+        self.max_delay = max_delay
+        self.logger = logging.getLogger("event")
+        self.reset()
+
+    def reset(self):
+        """Forget the pending events. The processes forked with pending events reset it, the parent delivers them"""
+        self._events = {}
+        self._received = 0
+        self._lock = threading.Lock()
+        # Only one batch is delivered at a time, in order. A listener may dispatch events to its own batcher
+        self._delivering = threading.RLock()
+        self._timer = None
+        self._closed = False
+
+    def __call__(self, event):
+        with self._lock:
+            if event.coalesce_key is None:
+                self._received += 1
+                key = self._received
+            else:
+                key = (event.__class__, getattr(event, event.coalesce_key))
+                # The latest event takes the place of the last one
+                self._events.pop(key, None)
+            self._events[key] = event
+            full = len(self._events) >= self.max_size
+            if self._timer is None and not full and self.max_delay is not None and not self._closed:
+                self._timer = threading.Timer(self.max_delay, self._flush_on_time)
+                self._timer.name = "event-batcher"
+                self._timer.daemon = True
+                self._timer.start()
+        if full:
+            self.flush()
+
+    def flush(self):
+        """Deliver the pending events right now"""
+        with self._delivering:
+            with self._lock:
+                events, self._events = self._events, {}
+                timer, self._timer = self._timer, None
+            if timer is not None:
+                timer.cancel()
+            if events:
+                self.listener(list(events.values()))
+
+    def close(self):
+        """Deliver the pending events and stop starting timers"""
+        self._closed = True
+        self.flush()
+
+    def _flush_on_time(self):
+        try:
+            self.flush()
+        except Exception:  # pylint: disable=broad-exception-caught
+            self.logger.exception("Batch listener %s failed", self.listener)
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=EventManager._reset_batches_after_fork)  # pylint: disable=protected-access
+
+
+def _weak_reference(receiver):
+    """Blinker keeps weak references to the listeners, the dispatch table must not keep them alive either"""
+    if inspect.ismethod(receiver):
+        return weakref.WeakMethod(receiver)
+    try:
+        return weakref.ref(receiver)
+    except TypeError:
+        return lambda: receiver
@@ -0,0 +1,213 @@
+"""Inter-process transport for the shared events"""
+import logging
+import os
+import pickle
+import shutil
+import struct
+import tempfile
+import threading
+import time
+from multiprocessing import Pipe
+from multiprocessing.connection import Client, Listener, wait
+from multiprocessing.util import Finalize
+
+from .event import CODEC_ERRORS, decode_event, encode_event
+
+FRAME_HEADER = struct.Struct("!I")
+# First byte of the pickled events (protocol 2 and higher), the typed events start with the length of their name
+PICKLE_MARK = pickle.PROTO[0]
+
+
+def encode_batch(payloads):
+    """Join several pickled events into a single message, each one prefixed by its length"""
+    return b"".join(FRAME_HEADER.pack(len(payload)) + payload for payload in payloads)
+
+
+def decode_batch(data):
+    """Split a message built by `encode_batch` and decode the events"""
+    view = memoryview(data)
+    offset = 0
+    while offset < len(view):
+        (size,) = FRAME_HEADER.unpack_from(view, offset)
+        offset += FRAME_HEADER.size
+        payload = view[offset:offset + size]
+        yield pickle.loads(payload) if payload[0] == PICKLE_MARK else decode_event(payload)
+        offset += size
+
+
+class EventBus:  # pylint: disable=too-many-instance-attributes
+    """Shares the events between the kernel process and the service processes through a local Unix socket.
+
+    The kernel process is the hub: every service connects to it and the hub forwards each message to the other
+    services without unpickling it again. Events are pickled once by the publisher and buffered, so several of them
+    travel in the same message (up to `batch_size` events or `flush_interval` seconds after the first one). Remote
+    events are dispatched to the local listeners from the bus thread.
+    """
+    def __init__(self, event_manager, address=None, batch_size=64, flush_interval=0.002):
+        self.logger = logging.getLogger("event_bus")
+        self.event_manager = event_manager
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._directory = None
+        if address is None:
+            self._directory = tempfile.mkdtemp(prefix="applauncher-")
+            address = os.path.join(self._directory, "events.sock")
+        self.address = address
+        self._listener = None
+        self._is_hub = False
+        self._reset()
+
+    def __getstate__(self):
+        """Only the settings travel to the spawned processes, the connections are created there with `connect`"""
+        # The listeners are registered globally, the event manager class is enough to dispatch the events
+        return {
+            "event_manager": self.event_manager.__class__, "address": self.address,
+            "batch_size": self.batch_size, "flush_interval": self.flush_interval
+        }
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    def _reset(self):
+        """Forget the connections, threads and locks (they are not usable after a fork)"""
+        self._connections = []
+        self._buffer = []
+        self._buffer_ready = threading.Condition()
+        self._send_lock = threading.RLock()
+        self._wakeup_reader, self._wakeup_writer = None, None
+        self._running = False
+
+    def start(self):
+        """Become the hub and publish the shared events of this process. It must be called in the kernel process before
+        starting the services"""
+        self._is_hub = True
+        self._listener = Listener(self.address, family="AF_UNIX")
+        self._wakeup_reader, self._wakeup_writer = Pipe(duplex=False)
+        self._start_threads()
+        self.event_manager.set_transport(self)
+        threading.Thread(target=self._accept, name="event-bus-accept", daemon=True).start()
+
+    def connect(self):
+        """Connect to the hub and publish the shared events of this process. It is meant to be used as a service runner
+        initializer"""
+        for connection in self._connections:
+            connection.close()
+        self._reset()
+        self._is_hub = False
+        self._connections.append(Client(self.address, family="AF_UNIX"))
+        self._start_threads()
+        self.event_manager.set_transport(self)
+        # The services are finished with os._exit, only the multiprocessing finalizers run at that point
+        Finalize(self, self.flush, exitpriority=10)
+
+    def _start_threads(self):
+        self._running = True
+        threading.Thread(target=self._read, name="event-bus-reader", daemon=True).start()
+        threading.Thread(target=self._flush_periodically, name="event-bus-flusher", daemon=True).start()
+
+    def publish(self, event):
+        """Send the event to the other processes"""
+        try:
+            payload = encode_event(event) if hasattr(event, "codec") else None
+        except CODEC_ERRORS:
+            # Pickled with the values the codec cannot pack
+            payload = None
+        if payload is None:
+            payload = pickle.dumps(event, protocol=pickle.HIGHEST_PROTOCOL)
+        with self._buffer_ready:
+            self._buffer.append(payload)
+            buffered = len(self._buffer)
+            if buffered == 1:
+                self._buffer_ready.notify()
+        if buffered >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """Send the buffered events right now"""
+        with self._buffer_ready:
+            payloads, self._buffer = self._buffer, []
+        if payloads:
+            self._send(encode_batch(payloads))
+
+    def close(self):
+        """Send the pending events and close all connections"""
+        self.flush()
+        self._running = False
+        with self._buffer_ready:
+            self._buffer_ready.notify()
+        if self._wakeup_writer is not None:
+            self._wakeup_writer.send_bytes(b"")
+        for connection in self._connections:
+            connection.close()
+        self._connections = []
+        self.event_manager.set_transport(None)
+        if self._is_hub:
+            self._listener.close()
+            if self._directory is not None:
+                shutil.rmtree(self._directory, ignore_errors=True)
+
+    def _send(self, data, exclude=None):
+        """Send a message to all connections (except the one it came from)"""
+        with self._send_lock:
+            for connection in list(self._connections):
+                if connection is exclude:
+                    continue
+                try:
+                    connection.send_bytes(data)
+                except OSError:
+                    self._drop(connection)
+
+    def _drop(self, connection):
+        with self._send_lock:
+            if connection in self._connections:
+                self._connections.remove(connection)
+        connection.close()
+
+    def _flush_periodically(self):
+        """Give some time to the publishers to fill the batch and then send it"""
+        while self._running:
+            with self._buffer_ready:
+                while self._running and not self._buffer:
+                    self._buffer_ready.wait()
+            time.sleep(self.flush_interval)
+            self.flush()
+
+    def _accept(self):
+        """Register the services connecting to the hub"""
+        while self._running:
+            try:
+                connection = self._listener.accept()
+            except OSError:
+                return
+            with self._send_lock:
+                self._connections.append(connection)
+            self._wakeup_writer.send_bytes(b"")
+
+    def _read(self):
+        """Dispatch the events received from the other processes (and forward them when this is the hub)"""
+        while self._running:
+            waiting = list(self._connections)
+            if self._wakeup_reader is not None:
+                waiting.append(self._wakeup_reader)
+            try:
+                ready = wait(waiting)
+            except (OSError, ValueError):
+                # A connection was closed meanwhile
+                continue
+            for connection in ready:
+                try:
+                    data = connection.recv_bytes()
+                except (EOFError, OSError):
+                    self._drop(connection)
+                    if not self._is_hub:
+                        self._running = False
+                    continue
+                if connection is self._wakeup_reader or not data:
+                    continue
+                if self._is_hub:
+                    self._send(data, exclude=connection)
+                for event in decode_batch(data):
+                    try:
+                        self.event_manager.dispatch_local(event)
+                    except Exception:  # pylint: disable=broad-except
+                        self.logger.exception("Listener of %s failed", event.event_name)
@@ -1,10 +1,27 @@
-"""Fancy logging"""
+"""Fancy logging for the terminal, structured (JSON) logging for the headless kernels and the pipeline sending the
+records of the service processes to the kernel process"""
+import atexit
+import contextlib
+import copy
+import json
 import logging
-from rich.logging import RichHandler
+import logging.handlers
+import multiprocessing.util
+import os
+import queue
+import sys
+import threading
+import time
+
+# Attributes of every LogRecord, the rest were added with `extra`
+RECORD_ATTRIBUTES = set(logging.makeLogRecord({}).__dict__) | {"message", "asctime"}
+
+_listener = None  # pylint: disable=invalid-name
 
 
 def configure_logger():
     """Default log format"""
+    from rich.logging import RichHandler  # pylint: disable=import-outside-toplevel
     log_header = "%(asctime)s [bold cyan]%(levelname)s[/] [yellow]-[/] [royal_blue1]%(name)s[/] [yellow]-[/]"
     log_body = "%(message)s [yellow]([/][chartreuse4]%(filename)s[/]:%(lineno)d[yellow])[/]"
     log_format = f"{log_header} {log_body}"
@@ -13,3 +30,267 @@ def configure_logger():
             RichHandler(show_time=False, show_level=False, markup=True, tracebacks_show_locals=True,
                         rich_tracebacks=True)]
     )
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record, with the `extra` attributes as fields"""
+    def format(self, record):
+        message = {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "process": record.process,
+        }
+        for key, value in record.__dict__.items():
+            if key not in RECORD_ATTRIBUTES and key not in message:
+                message[key] = value
+        if record.exc_info:
+            message["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            message["exception"] = record.exc_text
+        return json.dumps(message, default=str)
+
+
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    """Queue handler leaving the formatting (JSON and tracebacks) to the listener thread, only the message is built
+    here because its arguments may change once the call returns"""
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+def configure_headless_logger(level=logging.INFO, stream=None):
+    """Log JSON lines to `stream` (stderr by default). The loggers only put the records in a queue, a listener thread
+    formats and writes them"""
+    global _listener  # pylint: disable=global-statement
+    stop_headless_logger()
+    records = queue.Queue()
+    handler = logging.StreamHandler(stream or sys.stderr)
+    handler.setFormatter(JsonFormatter())
+    _listener = logging.handlers.QueueListener(records, handler, respect_handler_level=True)
+    _listener.start()
+    root = logging.getLogger()
+    for previous in list(root.handlers):
+        root.removeHandler(previous)
+    root.addHandler(_DeferredQueueHandler(records))
+    root.setLevel(level)
+    return _listener
+
+
+def stop_headless_logger():
+    """Write the queued records and stop the listener thread"""
+    global _listener  # pylint: disable=global-statement
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def _restart_listener_after_fork():
+    """The listener thread does not exist in a forked process, it gets its own queue and listener"""
+    global _listener  # pylint: disable=global-statement
+    if _listener is None:
+        return
+    records = queue.Queue()
+    _listener = logging.handlers.QueueListener(records, *_listener.handlers, respect_handler_level=True)
+    _listener.start()
+    for handler in logging.getLogger().handlers:
+        if isinstance(handler, _DeferredQueueHandler):
+            handler.queue = records
+    # The service processes exit without running the atexit callbacks
+    multiprocessing.util.Finalize(None, stop_headless_logger, exitpriority=0)
+
+
+atexit.register(stop_headless_logger)
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_restart_listener_after_fork)
+
+
+def plain_text(text):
+    """Text of a rich markup string"""
+    from rich.markup import MarkupError, render  # pylint: disable=import-outside-toplevel
+    try:
+        return render(str(text)).plain
+    except MarkupError:
+        return str(text)
+
+
+def _field_value(text):
+    try:
+        return float(text)
+    except ValueError:
+        return text
+
+
+class HeadlessConsole:
+    """Replacement of the rich console for the headless kernels. Every message becomes a log record and every table
+    row a record with the row as fields, nothing is rendered nor animated"""
+    def __init__(self, logger=None):
+        self.logger = logger or logging.getLogger("kernel")
+
+    def log(self, text):
+        """A boot step"""
+        self.logger.info(plain_text(text))
+
+    def print(self, renderable):
+        """A message or a table"""
+        columns = getattr(renderable, "columns", None)
+        if columns is None:
+            self.logger.info(plain_text(renderable))
+            return
+        rows = list(zip(*[[plain_text(cell) for cell in column.cells] for column in columns]))
+        if not renderable.show_header:
+            # Banners like "Kernel ready"
+            for row in rows:
+                self.logger.info(" ".join(row))
+            return
+        title = plain_text(renderable.title or "")
+        names = [plain_text(column.header).lower().replace(" ", "_") for column in columns]
+        for row in rows:
+            self.logger.info(title, extra={"row": {name: _field_value(value) for name, value in zip(names, row)}})
+
+    def rule(self, title=""):
+        """A section"""
+        self.logger.info(plain_text(title))
+
+    @contextlib.contextmanager
+    def status(self, text):
+        """A long step, logged once without spinner"""
+        self.logger.info(plain_text(text))
+        yield self
+
+
+class BatchingHandler(logging.Handler):  # pylint: disable=too-many-instance-attributes
+    """Handler of the service processes. The records are sent in batches through `records` (a multiprocessing queue)
+    to the `LogListener` of the kernel process, which formats and writes them. A batch is sent when it is full, every
+    `flush_interval` seconds and right away for errors. With `rate_limit` only that many records per second (with
+    bursts of the same size) get through, the dropped ones are counted and reported"""
+    def __init__(self, records, service=None, *, batch_size=100, flush_interval=0.1, rate_limit=None):
+        super().__init__()
+        self.records = records
+        self.service = service
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.rate_limit = rate_limit
+        self.dropped = 0
+        self._tokens = rate_limit
+        self._refilled_at = time.monotonic()
+        self._batch = []
+        self._flusher = None
+        # logging.Handler has its own _closed
+        self._stopped = threading.Event()
+
+    def _allowed(self):
+        """Token bucket, a token per record"""
+        if self.rate_limit is None:
+            return True
+        now = time.monotonic()
+        self._tokens = min(self.rate_limit, self._tokens + (now - self._refilled_at) * self.rate_limit)
+        self._refilled_at = now
+        if self._tokens < 1:
+            return False
+        self._tokens -= 1
+        return True
+
+    def _prepare(self, record):
+        """The record attributes, ready to be pickled"""
+        values = dict(record.__dict__)
+        values["msg"] = record.getMessage()
+        values["args"] = None
+        if record.exc_info:
+            values["exc_text"] = logging.Formatter().formatException(record.exc_info)
+        values["exc_info"] = None
+        values.pop("message", None)
+        values.setdefault("service", self.service)
+        return values
+
+    def emit(self, record):
+        if not self._allowed():
+            self.dropped += 1
+            return
+        if self.dropped:
+            self._batch.append(self._prepare(logging.makeLogRecord({
+                "name": "service", "levelno": logging.WARNING, "levelname": "WARNING",
+                "msg": f"{self.dropped} log records dropped by the rate limit of {self.rate_limit} records per second"
+            })))
+            self.dropped = 0
+        self._batch.append(self._prepare(record))
+        if len(self._batch) >= self.batch_size or record.levelno >= logging.ERROR:
+            self._send()
+        elif self._flusher is None:
+            self._flusher = threading.Thread(target=self._flush_periodically, name="log-flusher", daemon=True)
+            self._flusher.start()
+
+    def _send(self):
+        if self._batch:
+            self.records.put(self._batch)
+            self._batch = []
+
+    def flush(self):
+        self.acquire()
+        try:
+            self._send()
+        finally:
+            self.release()
+
+    def _flush_periodically(self):
+        while not self._stopped.wait(self.flush_interval):
+            self.flush()
+
+    def close(self):
+        """Send the last batch and stop. It can be called again (like logging.shutdown does at exit)"""
+        self._stopped.set()
+        self.flush()
+        super().close()
+
+
+class LogListener:
+    """Handles in the kernel process the records sent by the `BatchingHandler` of the service processes, with the
+    handlers of the kernel loggers"""
+    def __init__(self, records):
+        self.records = records
+        self._thread = None
+
+    def start(self):
+        """Handle the records in a background thread"""
+        self._thread = threading.Thread(target=self._run, name="log-listener", daemon=True)
+        self._thread.start()
+
+    @property
+    def running(self):
+        """True until it is stopped"""
+        return self._thread is not None and self._thread.is_alive()
+
+    def _run(self):
+        while True:
+            batch = self.records.get()
+            if batch is None:
+                return
+            for values in batch:
+                record = logging.makeLogRecord(values)
+                logger = logging.getLogger(record.name)
+                if logger.isEnabledFor(record.levelno):
+                    logger.handle(record)
+
+    def stop(self, timeout=5):
+        """Handle the records already sent and stop"""
+        if self.running:
+            self.records.put(None)
+            self._thread.join(timeout)
+
+
+def configure_service_logger(records, service, rate_limit=None, level=logging.INFO):
+    """Send the records of this (service) process to the kernel process"""
+    stop_headless_logger()
+    root = logging.getLogger()
+    for previous in list(root.handlers):
+        root.removeHandler(previous)
+    handler = BatchingHandler(records, service, rate_limit=rate_limit)
+    root.addHandler(handler)
+    root.setLevel(level)
+    # The service processes exit without running the atexit callbacks. The last batch is sent before the queue feeder
+    # thread is closed (exit priority 10, the higher ones run first)
+    multiprocessing.util.Finalize(None, handler.close, exitpriority=20)
+    return handler
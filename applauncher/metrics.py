@@ -0,0 +1,193 @@
+"""Service and event metrics, served in the Prometheus text format"""
+import logging
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _read_small_file(path):
+    """Read a /proc file with a single system call, without the buffered file object"""
+    file_descriptor = os.open(path, os.O_RDONLY)
+    try:
+        return os.read(file_descriptor, 4096)
+    finally:
+        os.close(file_descriptor)
+
+
+def read_process_stats(pid):
+    """CPU seconds, RSS bytes and open file descriptors of a process read from /proc, None when not available"""
+    try:
+        stat = _read_small_file(f"/proc/{pid}/stat")
+        statm = _read_small_file(f"/proc/{pid}/statm")
+        file_descriptors = len(os.listdir(f"/proc/{pid}/fd"))
+    except OSError:
+        return None
+    # The process name may contain spaces and parenthesis, the fields are after the last parenthesis (from the state)
+    fields = stat[stat.rindex(b")") + 2:].split()
+    cpu_seconds = (int(fields[11]) + int(fields[12])) / CLOCK_TICKS
+    return cpu_seconds, int(statm.split()[1]) * PAGE_SIZE, file_descriptors
+
+
+def escape_label(value):
+    """Escape a label value for the Prometheus text format"""
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def render(metrics):
+    """Build the Prometheus text from (name, type, help, [(labels, value)]) tuples"""
+    lines = []
+    for name, metric_type, description, samples in metrics:
+        lines.append(f"# HELP {name} {description}")
+        lines.append(f"# TYPE {name} {metric_type}")
+        for labels, value in samples:
+            if labels:
+                label_text = ",".join(f'{key}="{escape_label(label)}"' for key, label in labels.items())
+                lines.append(f"{name}{{{label_text}}} {value}")
+            else:
+                lines.append(f"{name} {value}")
+    return "\n".join(lines) + "\n"
+
+
+class DispatchMetrics:
+    """Number of dispatches and time spent by the listeners of every event type"""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts = {}
+        self.seconds = {}
+
+    def record(self, event_name, seconds):
+        """Add a dispatch"""
+        with self._lock:
+            self.counts[event_name] = self.counts.get(event_name, 0) + 1
+            self.seconds[event_name] = self.seconds.get(event_name, 0.0) + seconds
+
+    def collect(self):
+        """The metrics, in the format used by `render`"""
+        with self._lock:
+            counts, seconds = dict(self.counts), dict(self.seconds)
+        # The average dispatch time is rate(seconds) / rate(dispatches)
+        return [
+            ("applauncher_event_dispatches_total", "counter", "Times the event was dispatched",
+             [({"event": name}, counts[name]) for name in sorted(counts)]),
+            ("applauncher_event_dispatch_seconds_total", "counter", "Time spent by the listeners of the event",
+             [({"event": name}, seconds[name]) for name in sorted(counts)]),
+        ]
+
+
+class ServiceMetrics:
+    """Samples CPU time, RSS, open file descriptors and uptime of the service processes every `interval` seconds, and
+    the restarts of every service. Only available where /proc exists (Linux)"""
+    def __init__(self, service_runner, interval=5.0):
+        self.service_runner = service_runner
+        self.interval = interval
+        self.samples = []
+        self.sample_duration = 0.0
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def sample(self):
+        """Read the stats of all service processes right now"""
+        started = time.perf_counter()
+        now = time.monotonic()
+        samples = []
+        for replica in list(self.service_runner.replicas):
+            process = replica.process
+            if process.pid is None or process.exitcode is not None:
+                continue
+            stats = read_process_stats(process.pid)
+            if stats is not None:
+                samples.append((replica.definition.name, replica.index, now - replica.started_at) + stats)
+        self.samples = samples
+        self.sample_duration = time.perf_counter() - started
+
+    def start(self):
+        """Sample in a background thread"""
+        self.sample()
+        self._thread = threading.Thread(target=self._run, name="service-metrics", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop sampling"""
+        self._stopped.set()
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            self.sample()
+
+    def collect(self):
+        """The metrics of the last sample, in the format used by `render`"""
+        samples = self.samples
+        by_replica = [({"service": name, "replica": index}, values) for name, index, *values in samples]
+        return [
+            ("applauncher_service_cpu_seconds_total", "counter", "CPU time used by the service process",
+             [(labels, values[1]) for labels, values in by_replica]),
+            ("applauncher_service_resident_memory_bytes", "gauge", "Resident memory of the service process",
+             [(labels, values[2]) for labels, values in by_replica]),
+            ("applauncher_service_open_fds", "gauge", "Open file descriptors of the service process",
+             [(labels, values[3]) for labels, values in by_replica]),
+            ("applauncher_service_uptime_seconds", "gauge", "Time since the service process was started",
+             [(labels, round(values[0], 3)) for labels, values in by_replica]),
+            ("applauncher_service_restarts_total", "counter", "Times the service processes were restarted",
+             [({"service": name}, service.restart_count)
+              for name, service in self.service_runner.services.items()]),
+            ("applauncher_metrics_sample_seconds", "gauge", "Time spent reading the stats of the service processes",
+             [({}, self.sample_duration)]),
+        ]
+
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class MetricsServer:
+    """HTTP server answering with the metrics of all collectors in the Prometheus text format. It only listens on
+    localhost unless another `host` is given ("0.0.0.0" for every interface)"""
+    def __init__(self, port, collectors, host="127.0.0.1"):
+        self.logger = logging.getLogger("metrics")
+        self.collectors = collectors
+        self._server = _ThreadingHTTPServer((host, port), self._handler_class())
+
+    @property
+    def port(self):
+        """Port where the server listens (useful when it was created with port 0)"""
+        return self._server.server_address[1]
+
+    def render(self):
+        """The metrics of all collectors"""
+        metrics = []
+        for collector in self.collectors:
+            metrics += collector()
+        return render(metrics)
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            """Serve the metrics on any path"""
+            def do_GET(self):  # pylint: disable=invalid-name
+                """Answer with the metrics"""
+                body = server.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+                server.logger.debug(format, *args)
+        return Handler
+
+    def start(self):
+        """Serve in a background thread"""
+        threading.Thread(target=self._server.serve_forever, name="metrics-server", daemon=True).start()
+
+    def stop(self):
+        """Stop serving and close the socket"""
+        self._server.shutdown()
+        self._server.server_close()
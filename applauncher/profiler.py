@@ -0,0 +1,124 @@
+"""Startup profiler. It records the boot spans and exports them as Chrome trace events (chrome://tracing, Perfetto)"""
+import functools
+import json
+import os
+import threading
+import time
+
+PROFILE_ENV_VAR = "APPLAUNCHER_PROFILE"
+
+
+class _NullSpan:
+    """Span used when the profiler is disabled, it does nothing"""
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    """Measures the time between entering and exiting the context"""
+    __slots__ = ("profiler", "name", "category", "args", "started")
+
+    def __init__(self, profiler, name, category, args):
+        self.profiler = profiler
+        self.name = name
+        self.category = category
+        self.args = args
+        self.started = None
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.profiler.record(self.name, self.category, self.started, time.perf_counter(), self.args)
+        return False
+
+
+class NullProfiler:
+    """Disabled profiler, the default one"""
+    enabled = False
+
+    @staticmethod
+    def span(_name, _category="boot", **_args):
+        """Nothing is measured"""
+        return _NULL_SPAN
+
+
+class StartupProfiler:
+    """Records spans and writes them as a Chrome trace event file"""
+    enabled = True
+
+    def __init__(self, trace_file):
+        self.trace_file = trace_file
+        self.spans = []
+        self.origin = time.perf_counter()
+        self.pid = os.getpid()
+
+    def span(self, name, category="boot", **args):
+        """Context manager measuring a block of code"""
+        return _Span(self, name, category, args)
+
+    def record(self, name, category, started, finished, args):
+        """Add a finished span"""
+        self.spans.append((name, category, started, finished, threading.get_ident(), args))
+
+    def trace_events(self):
+        """The spans in the Chrome trace event format (complete events, times in microseconds)"""
+        return [
+            {
+                "name": name, "cat": category, "ph": "X", "pid": self.pid, "tid": thread,
+                "ts": (started - self.origin) * 1e6, "dur": (finished - started) * 1e6, "args": args
+            }
+            for name, category, started, finished, thread, args in self.spans
+        ]
+
+    def write(self):
+        """Write the trace file"""
+        with open(self.trace_file, "w", encoding="utf-8") as trace_file:
+            json.dump({"traceEvents": self.trace_events(), "displayTimeUnit": "ms"}, trace_file)
+
+    def summary(self):
+        """Time spent by span name: (name, calls, total seconds, max seconds) sorted by total time"""
+        totals = {}
+        for name, _, started, finished, _, _ in self.spans:
+            calls, total, maximum = totals.get(name, (0, 0.0, 0.0))
+            duration = finished - started
+            totals[name] = (calls + 1, total + duration, max(maximum, duration))
+        return sorted(
+            ((name, calls, total, maximum) for name, (calls, total, maximum) in totals.items()),
+            key=lambda row: row[2], reverse=True
+        )
+
+
+_profiler = NullProfiler()
+
+
+def get_profiler():
+    """The active profiler"""
+    return _profiler
+
+
+def set_profiler(profiler):
+    """Replace the active profiler. Use NullProfiler to disable it"""
+    global _profiler  # pylint: disable=global-statement
+    _profiler = profiler
+
+
+def span(name, category="boot", **args):
+    """Measure a block of code with the active profiler"""
+    return _profiler.span(name, category, **args)
+
+
+def profiled(function):
+    """Measure every call of the decorated function with the active profiler"""
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        with _profiler.span(function.__qualname__):
+            return function(*args, **kwargs)
+    return wrapper
@@ -0,0 +1,87 @@
+"""Resources of the service processes: CPU affinity, scheduling priorities and memory limits"""
+import logging
+import os
+import platform
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None  # pylint: disable=invalid-name
+
+# Exit code of the services that ran out of memory under their RLIMIT_AS limit
+MEMORY_EXCEEDED_EXIT_CODE = 90
+
+# ioprio_set is not wrapped by the standard library
+IOPRIO_SET_SYSCALLS = {"x86_64": 251, "aarch64": 30, "arm64": 30, "i386": 289, "i686": 289, "armv7l": 314}
+IOPRIO_WHO_PROCESS = 1
+IOPRIO_CLASS_SHIFT = 13
+IOPRIO_CLASSES = {"realtime": 1, "best-effort": 2, "idle": 3}
+MEMORY_UNITS = {"K": 1024, "M": 1024 ** 2, "G": 1024 ** 3}
+
+
+def parse_memory(value):
+    """Bytes of a memory size like 536870912, "512M" or "2G" """
+    if isinstance(value, int):
+        return value
+    value = str(value).strip().upper().rstrip("B")
+    if value and value[-1] in MEMORY_UNITS:
+        return int(float(value[:-1]) * MEMORY_UNITS[value[-1]])
+    return int(value)
+
+
+def parse_ionice(value):
+    """(class, level) of an ionice setting: a best-effort level (0-7), a class name or (class name, level)"""
+    if isinstance(value, int):
+        return IOPRIO_CLASSES["best-effort"], value
+    if isinstance(value, str):
+        return IOPRIO_CLASSES[value], 4
+    io_class, level = value
+    return IOPRIO_CLASSES[io_class], level
+
+
+def set_ionice(io_class, level):
+    """Set the I/O scheduling class and level of this process"""
+    syscall = IOPRIO_SET_SYSCALLS.get(platform.machine())
+    if syscall is None:
+        raise OSError(f"ioprio_set is not available on {platform.machine()}")
+    # ctypes is only imported by the services using ionice
+    import ctypes  # pylint: disable=import-outside-toplevel
+    import ctypes.util  # pylint: disable=import-outside-toplevel
+    libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+    if libc.syscall(syscall, IOPRIO_WHO_PROCESS, 0, (io_class << IOPRIO_CLASS_SHIFT) | level) != 0:
+        errno = ctypes.get_errno()
+        raise OSError(errno, os.strerror(errno))
+
+
+class ServiceResources:
+    """CPU affinity (CPU numbers), nice level, ionice and memory limit of a service process. They are applied in the
+    service process before the service runs. The memory limit is the address space of the process (RLIMIT_AS), so its
+    allocations fail beyond it"""
+    def __init__(self, cpu_affinity=None, nice=None, ionice=None, memory_limit=None):
+        self.cpu_affinity = set(cpu_affinity) if cpu_affinity is not None else None
+        self.nice = nice
+        self.ionice = parse_ionice(ionice) if ionice is not None else None
+        self.memory_limit = parse_memory(memory_limit) if memory_limit is not None else None
+
+    def __bool__(self):
+        return any(value is not None for value in (self.cpu_affinity, self.nice, self.ionice, self.memory_limit))
+
+    def apply(self):
+        """Apply the settings to this process"""
+        logger = logging.getLogger("service")
+        if self.cpu_affinity is not None:
+            os.sched_setaffinity(0, self.cpu_affinity)
+        if self.nice is not None:
+            os.setpriority(os.PRIO_PROCESS, 0, self.nice)
+        if self.ionice is not None:
+            try:
+                set_ionice(*self.ionice)
+            except OSError as ex:
+                logger.warning("Cannot set the I/O priority: %s", ex)
+        if self.memory_limit is not None:
+            _, hard_limit = resource.getrlimit(resource.RLIMIT_AS)
+            resource.setrlimit(resource.RLIMIT_AS, (self.memory_limit, hard_limit))
+
+    def memory_exceeded(self, exitcode):
+        """True if a finished service process ran out of its memory limit"""
+        return self.memory_limit is not None and exitcode == MEMORY_EXCEEDED_EXIT_CODE
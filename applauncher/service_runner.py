@@ -1,73 +1,465 @@
 """Service runner, like multiprocessing but with more features"""
 import asyncio
+import functools
+import gc
 import logging
+import multiprocessing
 import os
+import signal
 import sys
-from multiprocessing import Process
+import sysconfig
+import threading
+import time
+from multiprocessing import Pipe
+from multiprocessing.connection import wait as wait_for_objects
 
+from .event import EventManager, ServiceMemoryExceededEvent
+from .logging import LogListener, configure_service_logger
+from .resources import MEMORY_EXCEEDED_EXIT_CODE, ServiceResources
 
-class ProcessServiceRunner:
-    """Like a process pool but with initializer and friendly exit process"""
-    def __init__(self):
+try:
+    import uvloop
+except ImportError:
+    uvloop = None  # pylint: disable=invalid-name
+
+
+_current_replica = None  # pylint: disable=invalid-name
+# Replica and stop token of the services running in threads
+_thread_service = threading.local()
+
+
+def current_replica():
+    """Replica index of the service running in this process or thread (from 0), None outside the services"""
+    return getattr(_thread_service, "replica", _current_replica)
+
+
+def current_stop_token():
+    """StopToken of the service running in this thread, None outside the thread services"""
+    return getattr(_thread_service, "stop_token", None)
+
+
+def gil_disabled():
+    """Check if this is a free-threaded CPython build running without the GIL"""
+    if not sysconfig.get_config_var("Py_GIL_DISABLED"):
+        return False
+    # The GIL can be enabled again at runtime (PYTHON_GIL=1 or extensions not supporting free threading)
+    is_gil_enabled = getattr(sys, "_is_gil_enabled", None)
+    return is_gil_enabled is None or not is_gil_enabled()  # pylint: disable=not-callable
+
+
+def resolve_replicas(replicas):
+    """Number of processes for a replicas setting, "auto" is one per CPU available to this process"""
+    if replicas == "auto":
+        if hasattr(os, "sched_getaffinity"):
+            return len(os.sched_getaffinity(0))
+        return os.cpu_count() or 1
+    replicas = int(replicas)
+    if replicas < 0:
+        raise ValueError(f"The number of replicas cannot be negative ({replicas})")
+    return replicas
+
+
+def _run_service(initializers, function, args, kwargs, replica=0, *, resources=None, log_settings=None):
+    # pylint: disable=too-many-arguments
+    """Entry point of the service processes: prepare the process and then run the service"""
+    global _current_replica  # pylint: disable=global-statement,invalid-name
+    _current_replica = replica
+    if log_settings is not None:
+        configure_service_logger(*log_settings)
+    if resources is not None:
+        resources.apply()
+    try:
+        for initializer in initializers:
+            initializer()
+        return function(*args, **kwargs)
+    except MemoryError:
+        logging.getLogger("service").exception("The service ran out of memory (limit of %s bytes)",
+                                               resources.memory_limit if resources is not None else None)
+        sys.exit(MEMORY_EXCEEDED_EXIT_CODE)
+
+
+class RestartPolicy:
+    """When and how fast a service is started again after its process finishes.
+
+    The first restart waits `backoff` seconds and every consecutive failure doubles it, up to `max_backoff`. The
+    consecutive failures are forgotten once the service runs for `restart_window` seconds. If the service is restarted
+    more than `max_restarts` times in `restart_window` seconds, it is considered to be crash looping and it is not
+    restarted anymore.
+    """
+    NEVER = "never"
+    ON_FAILURE = "on-failure"
+    ALWAYS = "always"
+
+    def __init__(self, policy=NEVER, backoff=1.0, max_backoff=30.0, max_restarts=5, restart_window=60.0):
+        if policy not in (self.NEVER, self.ON_FAILURE, self.ALWAYS):
+            raise ValueError(f"Unknown restart policy {policy}")
+        self.policy = policy
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.max_restarts = max_restarts
+        self.restart_window = restart_window
+
+    @classmethod
+    def build(cls, restart):
+        """Accept a RestartPolicy, the name of a policy or a dictionary with the RestartPolicy arguments"""
+        if restart is None:
+            return cls()
+        if isinstance(restart, cls):
+            return restart
+        if isinstance(restart, str):
+            return cls(restart)
+        return cls(**restart)
+
+    def should_restart(self, exitcode):
+        """Check if a process finished with this exit code must be started again"""
+        if self.policy == self.ALWAYS:
+            return True
+        return self.policy == self.ON_FAILURE and exitcode != 0
+
+    def delay(self, consecutive_failures):
+        """Seconds to wait before the restart"""
+        return min(self.max_backoff, self.backoff * 2 ** max(consecutive_failures - 1, 0))
+
+
+class ServiceDefinition:  # pylint: disable=too-many-instance-attributes
+    """Everything needed to start (and start again) the processes of a service"""
+    def __init__(self, name, function, args, kwargs, restart_policy, *, resources=None, log_rate_limit=None):
+        # pylint: disable=too-many-arguments
+        self.name = name
+        self.function = function
+        self.args = args
+        self.kwargs = kwargs
+        self.restart_policy = restart_policy
+        self.resources = resources if resources is not None else ServiceResources()
+        self.log_rate_limit = log_rate_limit
+        self.replicas = 0
+        self.restart_count = 0
+        self.last_recovery_time = None
+        self.gave_up = False
+
+
+class Replica:  # pylint: disable=too-many-instance-attributes
+    """One of the processes of a service"""
+    def __init__(self, definition, index, process):
+        self.definition = definition
+        self.index = index
+        self.process = process
+        self.started_at = None
+        self.exited_at = None
+        self.restart_times = []
+        self.consecutive_failures = 0
+
+    @property
+    def name(self):
+        """Name of the service, with the replica index when the service has more than one"""
+        if self.definition.replicas == 1 and self.index == 0:
+            return self.definition.name
+        return f"{self.definition.name}[{self.index}]"
+
+
+class ProcessServiceRunner:  # pylint: disable=too-many-instance-attributes
+    """Like a process pool but with initializer and friendly exit process.
+
+    Once running, a supervisor thread waits for the processes to finish (on their sentinels, without polling) and
+    applies the restart policy of each service.
+
+    `start_method` is the multiprocessing start method, the platform default when it is not set. With "fork" (given
+    or by default) the objects of this process are frozen (`gc.freeze`) once, before forking the first services, so
+    the garbage collector of the services does not write on them and the memory pages stay shared. With "forkserver"
+    the modules given to `preload` are imported once by the fork server and the services are forked from it.
+
+    With `centralized_logging` the services do not write their logs: the records are sent in batches to this process,
+    where a single listener handles them with the handlers of this process, so the lines do not interleave.
+    """
+    def __init__(self, start_method=None, *, centralized_logging=True):
         self.logger = logging.getLogger("service")
-        self.running_services = []
+        self.start_method = start_method
+        self._context = multiprocessing.get_context(start_method)
+        self.log_records = self._context.Queue() if centralized_logging else None
+        self.log_listener = LogListener(self.log_records) if centralized_logging else None
+        self.replicas = []
+        self.services = {}
+        self.initializers = []
         self.is_older_python_than_37 = sys.version_info[:2] < (3, 7)
+        self._lock = threading.RLock()
+        self._running = False
+        self._stopping = False
+        self._supervisor = None
+        self._wakeup_reader, self._wakeup_writer = None, None
 
-    def add_service(self, name, function, args=None, kwargs=None):
-        """Register a function that will run in the background"""
+    @property
+    def running_services(self):
+        """(name, process) of every service process"""
+        return [(replica.name, replica.process) for replica in self.replicas]
+
+    @property
+    def forks(self):
+        """True when the services are forked from this process (the "fork" start method, given or by default)"""
+        return self._context.get_start_method() == "fork"
+
+    def add_initializer(self, initializer):
+        """Register a function that will run inside every service process before the service itself"""
+        self.initializers.append(initializer)
+
+    def add_service(self, name, function,  # pylint: disable=too-many-arguments
+                    args=None, kwargs=None, *, restart=None, replicas=1, log_rate_limit=None, **resources):
+        """Register a function that will run in the background. `restart` is the RestartPolicy (by default the service
+        is never restarted), the name of a policy or a dictionary with the RestartPolicy arguments. `replicas` is the
+        number of processes running the service, "auto" for one per CPU. `log_rate_limit` is the maximum number of log
+        records per second of every process (with centralized logging). The other options are the ServiceResources of
+        the processes (cpu_affinity, nice, ionice and memory_limit)"""
         if args is None:
             args = ()
 
         if kwargs is None:
             kwargs = {}
 
-        self.running_services.append((name, Process(target=function, args=args, kwargs=kwargs)))
+        definition = ServiceDefinition(
+            name, function, args, kwargs, RestartPolicy.build(restart), resources=ServiceResources(**resources),
+            log_rate_limit=log_rate_limit
+        )
+        self.services[name] = definition
+        self.scale(name, replicas)
+
+    def scale(self, name, replicas, grace_time=10):
+        """Change the number of processes of a service. New replicas are started right away if the runner is running,
+        the extra ones are finished like in `shutdown` (the ones with the highest index first)"""
+        replicas = resolve_replicas(replicas)
+        with self._lock:
+            definition = self.services[name]
+            current = [replica for replica in self.replicas if replica.definition is definition]
+            definition.replicas = replicas
+            removed = current[replicas:]
+            for replica in removed:
+                self.replicas.remove(replica)
+            for index in range(len(current), replicas):
+                replica = Replica(definition, index, self._create_process(definition, index))
+                self.replicas.append(replica)
+                if self._running and not self._stopping:
+                    self._start(replica)
+            if self._running and not self._stopping:
+                if self._supervisor is None:
+                    # It finished when nothing was left to supervise
+                    self._start_supervisor()
+                else:
+                    # Let the supervisor know about the new processes
+                    self._wakeup_writer.send_bytes(b"")
+        started = [replica for replica in removed if replica.process.pid is not None]
+        if started:
+            self.logger.info("Scaling down service %s to %s replicas", name, replicas)
+            self._terminate_processes(started, grace_time)
+
+    def preload(self, modules):
+        """Modules imported by the fork server before forking the services. It must be called before running the first
+        service, the fork server is not started again"""
+        if self._context.get_start_method() == "forkserver":
+            self._context.set_forkserver_preload(list(modules))
+
+    def _create_process(self, definition, index):
+        log_settings = None
+        if self.log_records is not None:
+            log_settings = (
+                self.log_records, definition.name, definition.log_rate_limit, logging.getLogger().getEffectiveLevel()
+            )
+        return self._context.Process(
+            target=_run_service,
+            args=(self.initializers, definition.function, definition.args, definition.kwargs, index),
+            kwargs={"resources": definition.resources or None, "log_settings": log_settings}
+        )
+
+    def _start(self, replica):
+        self.logger.info("Starting service %s", replica.name)
+        replica.process.start()
+        replica.started_at = time.monotonic()
 
     def run(self):
         """Start all registered services"""
-        for name, process in self.running_services:
-            self.logger.info("Starting service %s", name)
-            process.start()
+        if self.log_listener is not None and not self.log_listener.running:
+            self.log_listener.start()
+        if self.forks and hasattr(gc, "freeze"):
+            # Whatever is alive now is shared with the children, the collector must not touch it (Python 3.7+). It is
+            # done once: the garbage of the restarts and the scaling would never be collected
+            gc.collect()
+            gc.freeze()
+        with self._lock:
+            self._stopping = False
+            self._running = True
+            for replica in self.replicas:
+                self._start(replica)
+        self._wakeup_reader, self._wakeup_writer = Pipe(duplex=False)
+        self._start_supervisor()
+
+    def _start_supervisor(self):
+        self._supervisor = threading.Thread(target=self._supervise, name="service-supervisor", daemon=True)
+        self._supervisor.start()
 
     def wait(self):
         """Wait until all services have finished"""
         self.logger.info("Waiting for services to end")
+        supervisor = self._supervisor
+        while supervisor is not None:
+            supervisor.join()
+            # `scale` starts another supervisor if there was nothing left to supervise
+            supervisor = self._supervisor if self._supervisor is not supervisor else None
         for _, i in self.running_services:
             i.join()
+        self._stop_log_listener()
 
     def kill(self):
         """Send a stop signal to all services"""
-        for name, process in self.running_services:
-            self.logger.info("Killing service %s (%s)", name, process.pid)
-            os.kill(process.pid, 9)
-            process.join()
-
-    async def _terminate_processes(self, processes, grace_time=10):
-        """Trying to finish all services concurrently"""
-        await asyncio.gather(*[
-            self._terminate_process(*i, grace_time) for i in processes
-        ])
-
-    async def _terminate_process(self, name, process, grace_time=10):
-        """Try to finish a service. First attempt is friendly, after the grace time it will be killed"""
-        self.logger.info("Terminating service %s (%s)", name, process.pid)
-        process.terminate()
-        wait = True
-        while wait:
-            grace_time -= 1
-            await asyncio.sleep(1)
-            wait = process.is_alive() and grace_time > 0
-
-        if process.is_alive():  # pragma: no cover  signals cannot be tested with pytest, manual test required
-            self.logger.info("Killing service %s (%s)", name, process.pid)
-            os.kill(process.pid, 9)
-            process.join()
+        self._stop_supervisor()
+        for replica in list(self.replicas):
+            process = replica.process
+            if process.pid is not None and process.exitcode is None:
+                self.logger.info("Killing service %s (%s)", replica.name, process.pid)
+                os.kill(process.pid, signal.SIGKILL)
+                process.join()
+        self._stop_log_listener()
+
+    def _stop_log_listener(self):
+        """Handle the records sent by the finished services and stop listening"""
+        if self.log_listener is not None:
+            self.log_listener.stop()
+
+    def _stop_supervisor(self):
+        """No service will be restarted from now on"""
+        with self._lock:
+            self._stopping = True
+        if self._wakeup_writer is not None:
+            self._wakeup_writer.send_bytes(b"")
+        supervisor = self._supervisor
+        if supervisor is not None and supervisor is not threading.current_thread():
+            # From now on only this thread waits for the processes
+            supervisor.join()
+
+    def _supervise(self):
+        """Wait for the processes to finish and restart them following their restart policy"""
+        scheduled = {}
+        handled = set()
+        while True:
+            with self._lock:
+                if self._stopping:
+                    return
+                handled.intersection_update(replica.process for replica in self.replicas)
+                for replica in list(scheduled):
+                    if replica not in self.replicas:
+                        del scheduled[replica]
+                # The sentinel stays ready once the process is finished, even if it finished before getting here
+                alive = {
+                    replica.process.sentinel: replica for replica in self.replicas if replica.process not in handled
+                }
+                if not alive and not scheduled:
+                    # Decided with the lock held, so `scale` knows it has to start a new supervisor
+                    self._supervisor = None
+                    return
+            timeout = max(0.0, min(scheduled.values()) - time.monotonic()) if scheduled else None
+            for ready in wait_for_objects(list(alive) + [self._wakeup_reader], timeout):
+                if ready is self._wakeup_reader:
+                    ready.recv_bytes()
+                    continue
+                replica = alive[ready]
+                handled.add(replica.process)
+                replica.process.join()
+                with self._lock:
+                    # Replicas removed by `scale` are finished on purpose
+                    restart_at = self._on_process_exit(replica) if replica in self.replicas else None
+                if restart_at is not None:
+                    scheduled[replica] = restart_at
+            for replica, restart_at in list(scheduled.items()):
+                if restart_at <= time.monotonic():
+                    del scheduled[replica]
+                    self._restart(replica)
+
+    def _on_process_exit(self, replica):
+        """Decide when the replica will be started again, None when it will not"""
+        now = time.monotonic()
+        exitcode = replica.process.exitcode
+        policy = replica.definition.restart_policy
+        if exitcode == 0:
+            self.logger.info("Service %s finished", replica.name)
+        else:
+            self.logger.error("Service %s exited with code %s", replica.name, exitcode)
+        resources = replica.definition.resources
+        if resources.memory_exceeded(exitcode):
+            self.logger.error("Service %s exceeded its memory limit of %s bytes", replica.name, resources.memory_limit)
+            EventManager.dispatch(
+                ServiceMemoryExceededEvent(replica.definition.name, replica.index, resources.memory_limit)
+            )
+        if self._stopping or not policy.should_restart(exitcode):
+            return None
+
+        if replica.started_at is not None and now - replica.started_at >= policy.restart_window:
+            replica.consecutive_failures = 0
+        replica.consecutive_failures += 1
+        replica.restart_times = [i for i in replica.restart_times if now - i < policy.restart_window]
+        if len(replica.restart_times) >= policy.max_restarts:
+            replica.definition.gave_up = True
+            self.logger.error(
+                "Service %s restarted %s times in %s seconds, it will not be restarted anymore",
+                replica.name, len(replica.restart_times), policy.restart_window
+            )
+            return None
+        replica.restart_times.append(now)
+        delay = policy.delay(replica.consecutive_failures)
+        self.logger.info("Restarting service %s in %.1f seconds", replica.name, delay)
+        replica.exited_at = now
+        return now + delay
+
+    def _restart(self, replica):
+        """Start the process of a replica again"""
+        with self._lock:
+            if self._stopping or replica not in self.replicas:
+                return
+            definition = replica.definition
+            replica.process = self._create_process(definition, replica.index)
+            self._start(replica)
+            definition.restart_count += 1
+            definition.last_recovery_time = replica.started_at - replica.exited_at
+        self.logger.info(
+            "Service %s restarted (%s), recovered in %.3f seconds",
+            replica.name, replica.process.pid, definition.last_recovery_time
+        )
+
+    def _terminate_processes(self, replicas, grace_time=10):
+        """Ask all services to finish at once and wait for them until the same deadline, the ones still alive after
+        the grace time are killed. Returns the seconds every service took to stop"""
+        started = time.monotonic()
+        deadline = started + grace_time
+        pending = {}
+        for replica in replicas:
+            process = replica.process
+            if process.pid is None or process.exitcode is not None:
+                continue
+            self.logger.info("Terminating service %s (%s)", replica.name, process.pid)
+            process.terminate()
+            pending[process.sentinel] = replica
+
+        stop_times = {}
+        while pending:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            # The sentinels are ready as soon as the processes finish, no polling
+            for sentinel in wait_for_objects(list(pending), timeout):
+                replica = pending.pop(sentinel)
+                replica.process.join()
+                stop_times[replica.name] = time.monotonic() - started
+                self.logger.info("Service %s stopped in %.3f seconds", replica.name, stop_times[replica.name])
+
+        for replica in pending.values():  # pragma: no cover  signals cannot be tested with pytest
+            self.logger.info("Killing service %s (%s)", replica.name, replica.process.pid)
+            os.kill(replica.process.pid, signal.SIGKILL)
+            replica.process.join()
+            stop_times[replica.name] = time.monotonic() - started
+        return stop_times
 
     def shutdown(self, grace_time=10):
-        """Start the shutdown process."""
+        """Start the shutdown process. Returns the seconds every service took to stop"""
         self.logger.info("Shutting down services (grace time of %s seconds)", grace_time)
-        loop = self.get_event_loop()
-        loop.run_until_complete(self._terminate_processes(self.running_services, grace_time))
+        self._stop_supervisor()
+        stop_times = self._terminate_processes(list(self.replicas), grace_time)
+        self._stop_log_listener()
+        return stop_times
 
     def get_event_loop(self):
         """Use the right methods to get the event loop (or create it) based on Python version."""
@@ -81,3 +473,252 @@ class ProcessServiceRunner:
             except RuntimeError:
                 loop = asyncio.new_event_loop()
         return loop
+
+
+class AsyncServiceRunner:  # pylint: disable=too-many-instance-attributes
+    """Runs the services inside the kernel process, as tasks of an event loop living in a background thread. It is
+    meant for I/O bound coroutines that do not need their own process.
+
+    Coroutine functions run on the loop (uvloop when it is installed and `use_uvloop` is set) and regular functions run
+    in a thread of the loop executor. On shutdown the tasks are cancelled and they have the grace time to finish.
+    """
+    def __init__(self, use_uvloop=True):
+        self.logger = logging.getLogger("service")
+        self.use_uvloop = use_uvloop
+        self.services = []
+        self.running_services = []
+        self.initializers = []
+        self.loop = None
+        self._thread = None
+        self._started = threading.Event()
+
+    def add_initializer(self, initializer):
+        """Register a function that will run in the loop thread before the services"""
+        self.initializers.append(initializer)
+
+    def add_service(self, name, function, args=None, kwargs=None):
+        """Register a coroutine function (or a regular function) that will run in the background"""
+        if args is None:
+            args = ()
+
+        if kwargs is None:
+            kwargs = {}
+
+        self.services.append((name, function, args, kwargs))
+
+    def new_event_loop(self):
+        """The loop running the services"""
+        if self.use_uvloop and uvloop is not None:
+            return uvloop.new_event_loop()
+        return asyncio.new_event_loop()
+
+    def run(self):
+        """Start all registered services"""
+        if not self.services:
+            return
+        self.loop = self.new_event_loop()
+        self._thread = threading.Thread(target=self._run_loop, name="async-services", daemon=True)
+        self._thread.start()
+        self._started.wait()
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self.loop)
+        try:
+            self.loop.run_until_complete(self._run_services())
+        except RuntimeError:
+            # The loop was stopped by `kill`
+            pass
+        finally:
+            self._started.set()
+            self.loop.close()
+
+    async def _run_services(self):
+        for initializer in self.initializers:
+            initializer()
+        for name, function, args, kwargs in self.services:
+            self.logger.info("Starting service %s", name)
+            task = self.loop.create_task(self._run_service(name, function, args, kwargs))
+            self.running_services.append((name, task))
+        self._started.set()
+        await asyncio.gather(*[task for _, task in self.running_services], return_exceptions=True)
+
+    async def _run_service(self, name, function, args, kwargs):
+        try:
+            if asyncio.iscoroutinefunction(function):
+                await function(*args, **kwargs)
+            else:
+                await self.loop.run_in_executor(None, functools.partial(function, *args, **kwargs))
+            self.logger.info("Service %s finished", name)
+        except asyncio.CancelledError:  # pylint: disable=try-except-raise
+            # Before Python 3.8 it is an Exception, the cancellation must not be reported as a failure
+            raise
+        except Exception:  # pylint: disable=broad-except
+            self.logger.exception("Service %s failed", name)
+
+    def wait(self):
+        """Wait until all services have finished"""
+        self.logger.info("Waiting for services to end")
+        if self._thread is not None:
+            self._thread.join()
+
+    def shutdown(self, grace_time=10):
+        """Cancel all services and wait for them up to the grace time. Returns the seconds every service took to stop"""
+        if self._thread is None or not self._thread.is_alive():
+            return {}
+        self.logger.info("Shutting down services (grace time of %s seconds)", grace_time)
+        try:
+            stop_times = asyncio.run_coroutine_threadsafe(self._cancel(grace_time), self.loop).result()
+        except RuntimeError:
+            # The loop finished meanwhile
+            return {}
+        self.wait()
+        return stop_times
+
+    async def _cancel(self, grace_time):
+        started = time.monotonic()
+        stop_times = {}
+
+        def stopped(name, _task):
+            stop_times[name] = time.monotonic() - started
+            self.logger.info("Service %s stopped in %.3f seconds", name, stop_times[name])
+
+        pending = [task for _, task in self.running_services if not task.done()]
+        for name, task in self.running_services:
+            if not task.done():
+                self.logger.info("Cancelling service %s", name)
+                task.add_done_callback(functools.partial(stopped, name))
+                task.cancel()
+        if pending:
+            _, not_done = await asyncio.wait(pending, timeout=grace_time)
+            for name, task in self.running_services:
+                if task in not_done:
+                    self.logger.warning("Service %s did not stop in %s seconds", name, grace_time)
+                    stop_times[name] = time.monotonic() - started
+        return stop_times
+
+    def kill(self):
+        """Cancel all services without waiting for them and stop the loop"""
+        if self._thread is None or not self._thread.is_alive():
+            return
+        self.logger.info("Killing services")
+
+        def kill():
+            for _, task in self.running_services:
+                task.cancel()
+            self.loop.stop()
+        try:
+            self.loop.call_soon_threadsafe(kill)
+        except RuntimeError:
+            # The loop is already closed
+            pass
+        self.wait()
+
+
+class StopToken:
+    """Tells a thread service that it should finish. Threads cannot be stopped from outside, the services check the
+    token from time to time (or wait on it instead of sleeping) and return when it is stopped"""
+    def __init__(self):
+        self._event = threading.Event()
+
+    @property
+    def stopped(self):
+        """The service should finish"""
+        return self._event.is_set()
+
+    def stop(self):
+        """Ask the service to finish"""
+        self._event.set()
+
+    def wait(self, timeout=None):
+        """Sleep until the timeout or until the service is asked to finish. Returns True if it should finish"""
+        return self._event.wait(timeout)
+
+
+class ThreadServiceRunner:
+    """Runs every service in a thread of the kernel process, sharing its memory (like the container singletons)
+    instead of pickling it. It suits services that release the GIL (C extensions, blocking I/O) or any service on a
+    free-threaded CPython build.
+
+    On shutdown the stop tokens of the services are stopped (see `current_stop_token`) and they have the grace time to
+    return. The threads are daemons, the ones still running when the kernel exits are abandoned.
+    """
+    def __init__(self):
+        self.logger = logging.getLogger("service")
+        self.running_services = []
+        self.initializers = []
+        self.stop_tokens = {}
+
+    def add_initializer(self, initializer):
+        """Register a function that will run in every service thread before the service itself"""
+        self.initializers.append(initializer)
+
+    def add_service(self, name, function, args=None, kwargs=None, *, replicas=1):
+        """Register a function that will run in the background in `replicas` threads ("auto" for one per CPU)"""
+        if args is None:
+            args = ()
+
+        if kwargs is None:
+            kwargs = {}
+
+        replicas = resolve_replicas(replicas)
+        for index in range(replicas):
+            replica_name = name if replicas == 1 else f"{name}[{index}]"
+            token = StopToken()
+            thread = threading.Thread(
+                target=self._run_service, name=f"service-{replica_name}", daemon=True,
+                args=(replica_name, functools.partial(function, *args, **kwargs), index, token)
+            )
+            self.stop_tokens[replica_name] = token
+            self.running_services.append((replica_name, thread))
+
+    def _run_service(self, name, function, replica, stop_token):
+        _thread_service.replica = replica
+        _thread_service.stop_token = stop_token
+        try:
+            for initializer in self.initializers:
+                initializer()
+            function()
+            self.logger.info("Service %s finished", name)
+        except Exception:  # pylint: disable=broad-except
+            self.logger.exception("Service %s failed", name)
+
+    def run(self):
+        """Start all registered services"""
+        if self.running_services:
+            if gil_disabled():
+                self.logger.info("Free-threaded Python without GIL, the thread services run in parallel")
+            else:
+                self.logger.info("The GIL is enabled, only the thread services releasing it run in parallel")
+        for name, thread in self.running_services:
+            self.logger.info("Starting service %s", name)
+            thread.start()
+
+    def wait(self):
+        """Wait until all services have finished"""
+        self.logger.info("Waiting for services to end")
+        for _, thread in self.running_services:
+            thread.join()
+
+    def shutdown(self, grace_time=10):
+        """Stop the tokens of all services and wait for them until the grace time is over. Returns the seconds every
+        service took to stop"""
+        self.logger.info("Shutting down services (grace time of %s seconds)", grace_time)
+        started = time.monotonic()
+        deadline = started + grace_time
+        running = [(name, thread) for name, thread in self.running_services if thread.is_alive()]
+        for name, _ in running:
+            self.stop_tokens[name].stop()
+        stop_times = {}
+        for name, thread in running:
+            thread.join(max(0.0, deadline - time.monotonic()))
+            stop_times[name] = time.monotonic() - started
+            if thread.is_alive():
+                self.logger.warning("Service %s did not stop in %s seconds", name, grace_time)
+            else:
+                self.logger.info("Service %s stopped in %.3f seconds", name, stop_times[name])
+        return stop_times
+
+    def kill(self):
+        """Ask all services to finish without waiting for them, the threads die with the kernel process"""
+        for token in self.stop_tokens.values():
+            token.stop()
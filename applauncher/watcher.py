@@ -0,0 +1,140 @@
+"""File watchers, used to reload the configuration when it changes"""
+import ctypes
+import ctypes.util
+import logging
+import os
+import select
+import struct
+import sys
+import threading
+
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+INOTIFY_EVENT = struct.Struct("iIII")
+
+
+def _load_inotify():
+    """The libc with inotify support, None when it is not available"""
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        libc.inotify_init1.argtypes = [ctypes.c_int]
+        libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        return libc
+    except (OSError, AttributeError):
+        return None
+
+
+class PollingWatcher:
+    """Checks the files every `interval` seconds and calls `callback` when any of them has changed"""
+    def __init__(self, paths, callback, interval=1.0):
+        self.logger = logging.getLogger("watcher")
+        self.paths = [os.path.abspath(path) for path in paths]
+        self.callback = callback
+        self.interval = interval
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Start watching in a background thread"""
+        self._thread = threading.Thread(target=self._run, name="configuration-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop watching"""
+        self._stopped.set()
+
+    def _notify(self):
+        try:
+            self.callback()
+        except Exception:  # pylint: disable=broad-except
+            self.logger.exception("Error while handling the change of %s", ", ".join(self.paths))
+
+    def _snapshot(self):
+        snapshot = []
+        for path in self.paths:
+            try:
+                stat = os.stat(path)
+                snapshot.append((stat.st_ino, stat.st_mtime_ns, stat.st_size))
+            except FileNotFoundError:
+                snapshot.append(None)
+        return snapshot
+
+    def _run(self):
+        previous = self._snapshot()
+        while not self._stopped.wait(self.interval):
+            current = self._snapshot()
+            if current != previous:
+                previous = current
+                self._notify()
+
+
+class InotifyWatcher(PollingWatcher):
+    """Linux watcher: the kernel tells when the files are written, nothing is done meanwhile. The directories are
+    watched instead of the files so the files replaced by editors (written somewhere else and then moved) are seen.
+    Changes arriving in less than `debounce` seconds are notified once"""
+    libc = _load_inotify()
+
+    def __init__(self, paths, callback, debounce=0.1):
+        super().__init__(paths, callback, interval=debounce)
+        self._wakeup_reader, self._wakeup_writer = os.pipe()
+        self._file_descriptor = self.libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._file_descriptor < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._watched = {}
+        mask = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+        for path in self.paths:
+            directory, name = os.path.split(path)
+            descriptor = self.libc.inotify_add_watch(self._file_descriptor, os.fsencode(directory), mask)
+            if descriptor < 0:
+                raise OSError(ctypes.get_errno(), f"Cannot watch {directory}")
+            self._watched.setdefault(descriptor, set()).add(os.fsencode(name))
+
+    def stop(self):
+        if not self._stopped.is_set():
+            super().stop()
+            os.write(self._wakeup_writer, b"\0")
+            os.close(self._wakeup_writer)
+
+    def _changed(self):
+        """Read the pending inotify events and tell if any of them is about the watched files"""
+        changed = False
+        try:
+            data = os.read(self._file_descriptor, 65536)
+        except BlockingIOError:
+            return False
+        offset = 0
+        while offset < len(data):
+            descriptor, _, _, length = INOTIFY_EVENT.unpack_from(data, offset)
+            offset += INOTIFY_EVENT.size
+            name = data[offset:offset + length].rstrip(b"\0")
+            offset += length
+            changed = changed or name in self._watched.get(descriptor, ())
+        return changed
+
+    def _run(self):
+        try:
+            while not self._stopped.is_set():
+                readable, _, _ = select.select([self._file_descriptor, self._wakeup_reader], [], [])
+                if self._file_descriptor not in readable or not self._changed():
+                    continue
+                # Let the writer finish, the following events are part of the same change
+                while not self._stopped.wait(self.interval) and self._changed():
+                    pass
+                if not self._stopped.is_set():
+                    self._notify()
+        finally:
+            os.close(self._file_descriptor)
+            os.close(self._wakeup_reader)
+
+
+def create_watcher(paths, callback, interval=1.0):
+    """Use inotify when it is available, otherwise poll the files every `interval` seconds"""
+    if InotifyWatcher.libc is not None:
+        try:
+            return InotifyWatcher(paths, callback)
+        except OSError as ex:
+            logging.getLogger("watcher").warning("inotify is not available (%s), polling the files instead", ex)
+    return PollingWatcher(paths, callback, interval=interval)
@@ -0,0 +1,288 @@
+"""Wiring of the bundle modules: wiring plans that skip the introspection on warm boots and lazy wiring on import"""
+import hashlib
+import importlib
+import importlib.abc
+import inspect
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+import types
+
+import dependency_injector
+from dependency_injector import wiring
+from dependency_injector.wiring import Closing, Provide, Provider
+
+from .profiler import span
+
+PLAN_FILE = "wiring-plan.json"
+MARKERS = (Provide, Provider, Closing)
+
+
+def _is_marker(value):
+    return isinstance(value, MARKERS)
+
+
+def _annotation_marker(annotation):
+    """True for the `Annotated[..., Provide[...]]` annotations"""
+    return any(_is_marker(metadata) for metadata in getattr(annotation, "__metadata__", ()))
+
+
+def needs_injection(function):
+    """True if any parameter of the function asks for a dependency (the default value or an Annotated marker)"""
+    try:
+        signature = inspect.signature(function)
+    except (TypeError, ValueError):
+        return False
+    return any(
+        _is_marker(parameter.default) or _annotation_marker(parameter.annotation)
+        for parameter in signature.parameters.values()
+    )
+
+
+def _member_needs_injection(member):
+    if isinstance(member, (classmethod, staticmethod)):
+        member = member.__func__
+    return _is_marker(member) or (inspect.isfunction(member) or inspect.ismethod(member)) and needs_injection(member)
+
+
+def _class_needs_injection(cls):
+    try:
+        members = inspect.getmembers(cls)
+        annotations = dict(getattr(cls, "__annotations__", {}))
+    except Exception:  # pylint: disable=broad-except
+        # Same as the wiring, classes that cannot be inspected are not wired
+        return False
+    return any(_member_needs_injection(member) for _, member in members) or \
+        any(_annotation_marker(annotation) for annotation in annotations.values())
+
+
+def plan_module(module):
+    """The members of a module the wiring has to patch: injected functions, marker attributes and classes with
+    injected methods or marker attributes"""
+    functions, attributes, classes = [], [], []
+    for name, member in vars(module).items():
+        if _is_marker(member):
+            attributes.append(name)
+        elif inspect.isfunction(member):
+            if needs_injection(member):
+                functions.append(name)
+        elif inspect.isclass(member) and _class_needs_injection(member):
+            classes.append(name)
+    for name, annotation in getattr(module, "__annotations__", {}).items():
+        if _annotation_marker(annotation) and name not in attributes:
+            attributes.append(name)
+    return {"functions": functions, "attributes": attributes, "classes": classes}
+
+
+def module_fingerprint(module):
+    """Hash of the files of the module and of the modules its functions and classes come from, the plan is stale when
+    any of them changes"""
+    sources = {module.__name__}
+    for member in vars(module).values():
+        if isinstance(member, (type, types.FunctionType)) and isinstance(member.__module__, str):
+            sources.add(member.__module__)
+    digest = hashlib.sha256(f"{sys.version}|{dependency_injector.__version__}".encode())
+    for name in sorted(sources):
+        path = getattr(sys.modules.get(name), "__file__", None)
+        try:
+            stat = os.stat(path)
+        except (TypeError, OSError):
+            continue
+        digest.update(f"|{name}:{path}:{stat.st_mtime_ns}:{stat.st_size}".encode())
+    return digest.hexdigest()
+
+
+def planned_module(module, entry):
+    """Module with the same name containing only the planned members, so the wiring does not inspect anything else"""
+    proxy = types.ModuleType(module.__name__)
+    members = vars(module)
+    annotations = getattr(module, "__annotations__", {})
+    for name in entry["functions"] + entry["attributes"] + entry["classes"]:
+        if name in members:
+            setattr(proxy, name, members[name])
+    proxy.__annotations__ = {name: annotations[name] for name in entry["attributes"] if name in annotations}
+    return proxy
+
+
+class WiringPlan:
+    """On-disk record of what every wired module needs. The entries are keyed by the module fingerprint and keep how
+    long the module took to import and wire without a plan"""
+    def __init__(self, directory=None):
+        self.path = os.path.join(directory, PLAN_FILE) if directory else None
+        self.logger = logging.getLogger("wiring")
+        self.entries = self._read()
+        self.dirty = False
+
+    def _read(self):
+        if self.path is None:
+            return {}
+        try:
+            with open(self.path, encoding="utf-8") as plan_file:
+                return json.load(plan_file)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError):
+            self.logger.warning("Ignoring unreadable wiring plan %s", self.path)
+            return {}
+
+    def get(self, module_name, fingerprint):
+        """Entry of a module, None when there is no entry or it is stale"""
+        entry = self.entries.get(module_name)
+        return entry if entry is not None and entry.get("fingerprint") == fingerprint else None
+
+    def set(self, module_name, entry):
+        """Add or replace the entry of a module"""
+        self.entries[module_name] = entry
+        self.dirty = True
+
+    def save(self):
+        """Write the plan atomically if it changed"""
+        if self.path is None or not self.dirty:
+            return
+        directory = os.path.dirname(self.path)
+        os.makedirs(directory, exist_ok=True)
+        descriptor, temporary_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(descriptor, "w", encoding="utf-8") as plan_file:
+            json.dump(self.entries, plan_file, indent=1, sort_keys=True)
+        os.replace(temporary_path, self.path)
+        self.dirty = False
+
+
+class _WiringLoader(importlib.abc.Loader):
+    """Loader wrapper wiring the module once it is executed"""
+    def __init__(self, loader, on_loaded):
+        self.loader = loader
+        self.on_loaded = on_loaded
+
+    def create_module(self, spec):
+        """The real loader creates the module"""
+        return self.loader.create_module(spec)
+
+    def exec_module(self, module):
+        """Execute the module and wire it"""
+        started = time.perf_counter()
+        self.loader.exec_module(module)
+        self.on_loaded(module, time.perf_counter() - started)
+
+    def __getattr__(self, name):
+        # get_source, get_resource_reader... are answered by the real loader
+        return getattr(self.loader, name)
+
+
+class Wiring(importlib.abc.MetaPathFinder):
+    """Imports and wires the bundle modules. Every wiring is recorded in a `WiringPlan`: when the plan of a module is
+    fresh, only the planned members are wired and the rest of the module is not inspected. The deferred modules are
+    imported (and wired) when something imports them for the first time"""
+    def __init__(self, container, plan=None):
+        self.container = container
+        self.plan = plan or WiringPlan()
+        self.logger = logging.getLogger("wiring")
+        # (module, mode, import seconds, wire seconds, saved seconds)
+        self.report = []
+        self.deferred = set()
+        self._import_times = {}
+        self._lock = threading.RLock()
+
+    def import_module(self, module_name):
+        """Import a module to wire, measuring it"""
+        started = time.perf_counter()
+        with span(module_name, "import"):
+            module = importlib.import_module(module_name)
+        with self._lock:
+            self._import_times.setdefault(module_name, time.perf_counter() - started)
+        return module
+
+    def defer(self, module_name):
+        """Wire the module when it is imported. It returns the module if it is already imported, it cannot wait"""
+        module = sys.modules.get(module_name)
+        if module is not None:
+            return module
+        with self._lock:
+            self.deferred.add(module_name)
+        return None
+
+    def wire(self, module, import_seconds=None):
+        """Wire a module, with its plan if it is fresh. Returns the mode ("planned" or "cold") and the time it took"""
+        name = module.__name__
+        if import_seconds is None:
+            import_seconds = self._import_times.get(name, 0.0)
+        with span(name, "wire"):
+            started = time.perf_counter()
+            fingerprint = module_fingerprint(module) if self.plan.path is not None else None
+            entry = self.plan.get(name, fingerprint) if fingerprint is not None else None
+            if entry is not None:
+                proxy = planned_module(module, entry)
+                wiring.wire(self.container, modules=[proxy])
+                # The functions and attributes were patched in the proxy, the classes are shared
+                for member in entry["functions"] + entry["attributes"]:
+                    if hasattr(proxy, member):
+                        setattr(module, member, getattr(proxy, member))
+                seconds = time.perf_counter() - started
+                mode, saved = "planned", entry["wire_seconds"] - seconds
+            else:
+                # The wiring replaces the marker attributes, the plan must be built before
+                entry = plan_module(module) if self.plan.path is not None else None
+                wire_started = time.perf_counter()
+                wiring.wire(self.container, modules=[module])
+                seconds = time.perf_counter() - wire_started
+                if entry is not None:
+                    entry.update(fingerprint=fingerprint, import_seconds=import_seconds, wire_seconds=seconds)
+                    with self._lock:
+                        self.plan.set(name, entry)
+                mode, saved = "cold", 0.0
+        self.container.wired_to_modules.append(module)
+        with self._lock:
+            self.report.append((name, mode, import_seconds, seconds, saved))
+        return mode, seconds
+
+    def install(self):
+        """Start wiring the deferred modules on import. The deferred modules imported meanwhile are wired now"""
+        with self._lock:
+            already_imported = [name for name in sorted(self.deferred) if name in sys.modules]
+            self.deferred.difference_update(already_imported)
+            if self not in sys.meta_path:
+                sys.meta_path.insert(0, self)
+        for name in already_imported:
+            self.wire(sys.modules[name])
+        with self._lock:
+            self.plan.save()
+
+    def uninstall(self):
+        """Stop wiring on import"""
+        with self._lock:
+            if self in sys.meta_path:
+                sys.meta_path.remove(self)
+
+    def deferred_savings(self):
+        """Import and wire seconds the boot did not spend on the deferred modules (None when they were never wired)"""
+        savings = {}
+        for name in sorted(self.deferred):
+            entry = self.plan.entries.get(name)
+            savings[name] = entry["import_seconds"] + entry["wire_seconds"] if entry else None
+        return savings
+
+    def find_spec(self, fullname, path, target=None):
+        """Find the deferred modules with the other finders and wire them once they are executed"""
+        if fullname not in self.deferred:
+            return None
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, "find_spec"):
+                continue
+            spec = finder.find_spec(fullname, path, target)
+            if spec is not None:
+                if spec.loader is not None:
+                    spec.loader = _WiringLoader(spec.loader, self._on_loaded)
+                return spec
+        return None
+
+    def _on_loaded(self, module, import_seconds):
+        with self._lock:
+            self.deferred.discard(module.__name__)
+        mode, seconds = self.wire(module, import_seconds)
+        self.logger.info("Wired %s on first import (%s) in %.1f ms", module.__name__, mode, seconds * 1000)
+        with self._lock:
+            self.plan.save()
@@ -0,0 +1,109 @@
+"""Parse and validation time of a large configuration in every supported format.
+
+Run it from the repository root: PYTHONPATH=. python benchmarks/configuration_formats.py
+"""
+import json
+import os
+import statistics
+import tempfile
+import time
+from typing import List
+
+import yaml
+from pydantic import BaseModel
+
+from applauncher.configuration import YmlLoader, load_configuration
+
+SECTIONS = 500
+REPEAT = 5
+
+
+class SectionModel(BaseModel):
+    """Every section of the sample configuration"""
+    name: str
+    host: str
+    port: int
+    enabled: bool
+    ratio: float
+    tags: List[str]
+
+
+class SampleBundle:
+    """Maps all the sections of the sample configuration"""
+    config_mapping = {f"section_{i}": SectionModel for i in range(SECTIONS)}
+
+
+def sample_configuration():
+    """A large configuration using placeholders"""
+    return {
+        f"section_{i}": {
+            "name": f"service number {i}", "host": "{HOST}", "port": "{PORT}", "enabled": True, "ratio": i / 7,
+            "tags": "{TAGS:[]}"
+        }
+        for i in range(SECTIONS)
+    }
+
+
+def to_toml(configuration):
+    """Minimal TOML writer, enough for the sample configuration"""
+    lines = []
+    for section, values in configuration.items():
+        lines.append(f"[{section}]")
+        for key, value in values.items():
+            lines.append(f"{key} = {json.dumps(value)}")
+    return "\n".join(lines)
+
+
+def write_samples(directory):
+    """Write the sample in every format and return the paths by format"""
+    configuration = sample_configuration()
+    # YAML templates are formatted as text, so the placeholders are not quoted
+    yaml_text = yaml.safe_dump(configuration).replace("'{HOST}'", "{HOST}").replace("'{PORT}'", "{PORT}")
+    yaml_text = yaml_text.replace("'{TAGS:[]}'", "{TAGS:[]}")
+    samples = {
+        "yml": yaml_text,
+        "json": json.dumps(configuration, indent=2),
+        "toml": to_toml(configuration),
+    }
+    paths = {}
+    for extension, text in samples.items():
+        paths[extension] = os.path.join(directory, f"config.{extension}")
+        with open(paths[extension], "w", encoding="utf-8") as sample_file:
+            sample_file.write(text)
+    parameters = os.path.join(directory, "parameters.yml")
+    with open(parameters, "w", encoding="utf-8") as parameters_file:
+        parameters_file.write("HOST: localhost\nPORT: 5432\nTAGS: a,b,c\n")
+    return paths, parameters
+
+
+def measure(path, parameters):
+    """Median time of loading and validating the configuration"""
+    timings = []
+    for _ in range(REPEAT):
+        started = time.perf_counter()
+        load_configuration(path, parameters, [SampleBundle()])
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings) * 1000
+
+
+def main():
+    """Print the load time of every format"""
+    with tempfile.TemporaryDirectory() as directory:
+        paths, parameters = write_samples(directory)
+        print(f"{SECTIONS} sections, median of {REPEAT} loads")
+        print(f"{'format':>22} {'load + validate (ms)':>22}")
+        libyaml = YmlLoader.yaml_loader
+        YmlLoader.yaml_loader = yaml.SafeLoader
+        print(f"{'yml (pure Python)':>22} {measure(paths['yml'], parameters):>22.1f}")
+        YmlLoader.yaml_loader = libyaml
+        if libyaml is not yaml.SafeLoader:
+            print(f"{'yml (libyaml)':>22} {measure(paths['yml'], parameters):>22.1f}")
+        print(f"{'json':>22} {measure(paths['json'], parameters):>22.1f}")
+        try:
+            print(f"{'toml':>22} {measure(paths['toml'], parameters):>22.1f}")
+        except ImportError as ex:
+            print(f"{'toml':>22} {str(ex):>22}")
+
+
+if __name__ == "__main__":
+    main()
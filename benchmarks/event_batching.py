@@ -0,0 +1,73 @@
+"""Listener calls and dispatch time of a burst of state updates: a regular listener, a batch listener and a batch
+listener of coalesced events (only the latest update of every key in a batch).
+
+Run it from the repository root: PYTHONPATH=. python benchmarks/event_batching.py
+"""
+import time
+
+from applauncher.event import Event, EventManager
+
+EVENTS = 200000
+KEYS = 50
+
+
+class UpdateEvent(Event):
+    """State update of one of the keys"""
+    event_name = "benchmark.update"
+
+    def __init__(self, key, value):
+        self.key = key
+        self.value = value
+
+
+class RegularUpdateEvent(UpdateEvent):
+    """The update, for the regular listener"""
+    event_name = "benchmark.regular_update"
+
+
+class BatchUpdateEvent(UpdateEvent):
+    """The same update, for the batch listener"""
+    event_name = "benchmark.batch_update"
+
+
+class CoalescedUpdateEvent(UpdateEvent):
+    """The same update, only the latest one of every key matters"""
+    event_name = "benchmark.coalesced_update"
+    coalesce_key = "key"
+
+
+def burst(event_class, batch):
+    """Dispatch the burst and count the listener calls and the delivered events"""
+    counts = {"calls": 0, "events": 0}
+
+    def listener(events):
+        counts["calls"] += 1
+        counts["events"] += len(events) if batch else 1
+
+    if batch:
+        EventManager.add_batch_listener(event_class, listener, max_size=1000, max_delay=0.1)
+    else:
+        EventManager.add_listener(event_class, listener)
+    started = time.perf_counter()
+    for i in range(EVENTS):
+        EventManager.dispatch(event_class(i % KEYS, i))
+    EventManager.flush_batches()
+    return counts, time.perf_counter() - started
+
+
+def main():
+    """Print the calls and the time of every kind of listener"""
+    print(f"{EVENTS} events of {KEYS} keys")
+    cases = (
+        ("regular", RegularUpdateEvent, False),
+        ("batch", BatchUpdateEvent, True),
+        ("coalesced", CoalescedUpdateEvent, True),
+    )
+    for name, event_class, batch in cases:
+        counts, seconds = burst(event_class, batch)
+        print(f"{name:>10}: {counts['calls']:>7} calls, {counts['events']:>7} events delivered, "
+              f"{seconds / EVENTS * 1e6:.2f} us per dispatch")
+
+
+if __name__ == "__main__":
+    main()
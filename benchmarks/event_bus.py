@@ -0,0 +1,63 @@
+"""Throughput and latency of the EventBus between a service process and the kernel process.
+
+Run it from the repository root on Linux: PYTHONPATH=. python benchmarks/event_bus.py
+"""
+import time
+
+from applauncher.event import Event, EventManager
+from applauncher.event_bus import EventBus
+from applauncher.service_runner import ProcessServiceRunner
+
+EVENTS = 100000
+
+
+class BenchmarkEvent(Event):
+    """Small event carrying the time it was published"""
+    event_name = "benchmark.bus"
+    shared = True
+
+    def __init__(self, sent_at):
+        self.sent_at = sent_at
+
+
+def publisher(total):
+    """Publish the events as fast as possible from the service process"""
+    for _ in range(total):
+        EventManager.dispatch(BenchmarkEvent(time.perf_counter()))
+
+
+def run(batch_size):
+    """Measure one configuration of the bus"""
+    latencies = []
+
+    def receive(event):
+        latencies.append(time.perf_counter() - event.sent_at)
+
+    EventManager.add_listener(BenchmarkEvent, receive)
+    bus = EventBus(EventManager(), batch_size=batch_size)
+    bus.start()
+    runner = ProcessServiceRunner()
+    runner.add_initializer(bus.connect)
+    runner.add_service(name="publisher", function=publisher, args=(EVENTS,))
+    started = time.perf_counter()
+    runner.run()
+    while len(latencies) < EVENTS:
+        time.sleep(0.01)
+    elapsed = time.perf_counter() - started
+    runner.wait()
+    bus.close()
+    latencies.sort()
+    p50 = latencies[len(latencies) // 2] * 1e3
+    p99 = latencies[int(len(latencies) * 0.99)] * 1e3
+    print(f"{batch_size:>6} {EVENTS / elapsed:>14.0f} {p50:>10.3f} {p99:>10.3f}")
+
+
+def main():
+    """Compare several batch sizes, 1 means one message per event"""
+    print(f"{'batch':>6} {'events/sec':>14} {'p50 (ms)':>10} {'p99 (ms)':>10}")
+    for batch_size in (1, 16, 64, 256):
+        run(batch_size)
+
+
+if __name__ == "__main__":
+    main()
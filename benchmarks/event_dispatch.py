@@ -0,0 +1,53 @@
+"""Compare EventManager.dispatch with the plain blinker path for deep event hierarchies.
+
+Run it from the repository root: PYTHONPATH=. python benchmarks/event_dispatch.py
+"""
+import timeit
+
+import blinker
+
+from applauncher.event import Event, EventManager
+
+DEPTHS = (1, 5, 10, 20)
+LISTENERS_PER_LEVEL = 2
+NUMBER = 100000
+# Blinker only keeps weak references, the listeners must be alive during the benchmark
+LISTENERS = []
+
+
+def blinker_dispatch(event):
+    """The dispatch as it was done before the dispatch table: one registry lookup and one send per level"""
+    for channel in getattr(event, "_signals"):
+        blinker.signal(channel).send(event)
+
+
+def build_hierarchy(depth):
+    """Create a chain of events of the given depth, each level with some listeners"""
+    event_class = Event
+    for level in range(depth):
+        event_class = type(f"Level{depth}_{level}", (event_class,), {"event_name": f"bench.{depth}.{level}"})
+        for _ in range(LISTENERS_PER_LEVEL):
+            LISTENERS.append(make_listener())
+            EventManager.add_listener(event_class, LISTENERS[-1])
+    return event_class
+
+
+def make_listener():
+    """Build a new listener that does nothing, only the dispatch cost is measured"""
+    def listener(_event):
+        pass
+    return listener
+
+
+def main():
+    """Print the time per dispatch of both approaches"""
+    print(f"{'depth':>6} {'blinker (us)':>14} {'table (us)':>12} {'speedup':>8}")
+    for depth in DEPTHS:
+        event = build_hierarchy(depth)()
+        blinker_time = timeit.timeit(lambda: blinker_dispatch(event), number=NUMBER) / NUMBER * 1e6
+        table_time = timeit.timeit(lambda: EventManager.dispatch(event), number=NUMBER) / NUMBER * 1e6
+        print(f"{depth:>6} {blinker_time:>14.3f} {table_time:>12.3f} {blinker_time / table_time:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
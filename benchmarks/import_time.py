@@ -0,0 +1,50 @@
+"""Import time of the package entry points, measured with `python -X importtime` in fresh interpreters. It also tells
+whether the heavy dependencies of the kernel (rich, pydantic, dependency_injector) were imported.
+
+Run it from the repository root: PYTHONPATH=. python benchmarks/import_time.py
+"""
+import os
+import subprocess
+import sys
+
+STATEMENTS = [
+    "import applauncher",
+    "import applauncher.event",
+    "import applauncher.service_runner",
+    "from applauncher import Kernel",
+]
+HEAVY = ("rich", "pydantic", "dependency_injector")
+ROUNDS = 7
+
+
+def import_time(statement):
+    """Microseconds spent importing (the top level imports of the statement) and the heavy packages imported"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"{statement}\nimport sys\nprint(' '.join(sys.modules))"],
+        capture_output=True, text=True, check=True, env=dict(os.environ, PYTHONPATH=os.getcwd())
+    )
+    total = 0
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        # Only the modules imported by the statement itself, their imports are included in the cumulative time
+        if not name[1:].startswith(" "):
+            total += int(cumulative)
+    modules = result.stdout.split()
+    return total, [package for package in HEAVY if package in modules]
+
+
+def main():
+    """Print the median import time of every statement"""
+    for statement in STATEMENTS:
+        times = []
+        for _ in range(ROUNDS):
+            total, heavy = import_time(statement)
+            times.append(total)
+        median = sorted(times)[ROUNDS // 2]
+        print(f"{statement:<36} {median / 1000:>8.1f} ms  heavy: {', '.join(heavy) or '-'}")
+
+
+if __name__ == "__main__":
+    main()
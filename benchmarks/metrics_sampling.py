@@ -0,0 +1,42 @@
+"""CPU overhead of sampling the service processes from /proc with 100 services.
+
+Run it from the repository root on Linux: PYTHONPATH=. python benchmarks/metrics_sampling.py
+"""
+import logging
+import time
+
+from applauncher.metrics import ServiceMetrics, render
+from applauncher.service_runner import ProcessServiceRunner
+
+SERVICES = 100
+SAMPLES = 200
+INTERVALS = (1.0, 5.0)
+
+
+def service():
+    """Do nothing until the benchmark is done"""
+    time.sleep(3600)
+
+
+def main():
+    """Print the time per sample and the CPU used by the sampler at every interval"""
+    logging.getLogger("service").setLevel(logging.WARNING)
+    runner = ProcessServiceRunner("fork")
+    runner.add_service("bench", service, replicas=SERVICES)
+    runner.run()
+    try:
+        metrics = ServiceMetrics(runner)
+        started = time.process_time()
+        for _ in range(SAMPLES):
+            metrics.sample()
+            render(metrics.collect())
+        per_sample = (time.process_time() - started) / SAMPLES
+        print(f"{len(metrics.samples)} services, {per_sample * 1000:.2f} ms of CPU per sample (and render)")
+        for interval in INTERVALS:
+            print(f"interval {interval:>4.1f} s: {per_sample / interval * 100:.3f}% CPU")
+    finally:
+        runner.kill()
+
+
+if __name__ == "__main__":
+    main()
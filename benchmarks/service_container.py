@@ -0,0 +1,42 @@
+"""Cost of a `ServiceContainer.some_service` lookup: uncached (hasattr and getattr on the container every time, the
+previous behaviour) and cached as a class attribute.
+
+Run it from the repository root: PYTHONPATH=. python benchmarks/service_container.py
+"""
+import timeit
+
+from dependency_injector import providers
+
+from applauncher import Kernel, ServiceContainer
+
+LOOKUPS = 1000000
+
+
+class UncachedServiceContainerMeta(type):
+    """The service container lookup without cache"""
+    def __getattr__(cls, key):
+        if not hasattr(cls.container, key):
+            raise AttributeError(key)
+        return getattr(cls.container, key)
+
+
+class UncachedServiceContainer(metaclass=UncachedServiceContainerMeta):
+    """Service container without cache"""
+    container = None
+
+
+def main():
+    """Print the time per lookup"""
+    for i in range(100):
+        setattr(Kernel.container, f"service_{i}", providers.Object(i))
+    UncachedServiceContainer.container = Kernel.container
+    names = {"UncachedServiceContainer": UncachedServiceContainer, "ServiceContainer": ServiceContainer}
+    uncached = timeit.timeit("UncachedServiceContainer.service_50", globals=names, number=LOOKUPS) / LOOKUPS
+    first = timeit.timeit("ServiceContainer.service_50", globals=names, number=1)
+    cached = timeit.timeit("ServiceContainer.service_50", globals=names, number=LOOKUPS) / LOOKUPS
+    print(f"uncached: {uncached * 1e9:.0f} ns per lookup")
+    print(f"  cached: {cached * 1e9:.0f} ns per lookup ({first * 1e9:.0f} ns the first one)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""Throughput of the service logs: every service writing its own records (the handlers inherited from the kernel) and
+the centralized pipeline (batches sent to a single listener in the kernel process). It also shows the CPU time a
+service spends per record, which is what the requests pay: with the pipeline the formatting and writing happen in the
+kernel process, the total throughput depends on the CPUs left for the listener.
+
+Both write formatted lines to /dev/null, so only the log path is measured.
+
+Run it from the repository root: PYTHONPATH=. python benchmarks/service_logging.py
+"""
+import logging
+import multiprocessing
+import os
+import time
+
+from applauncher.service_runner import ProcessServiceRunner
+
+SERVICES = 8
+RECORDS = 20000
+
+
+def service(cpu_times):
+    """Log as fast as possible"""
+    logger = logging.getLogger("bench")
+    started = time.process_time()
+    for i in range(RECORDS):
+        logger.info("request %s handled in %.3f ms", i, 1.5)
+    cpu_times.put(time.process_time() - started)
+
+
+def run(centralized_logging):
+    """Seconds until every record is written and CPU seconds per record in the services"""
+    cpu_times = multiprocessing.get_context("fork").Queue()
+    runner = ProcessServiceRunner("fork", centralized_logging=centralized_logging)
+    runner.add_service("bench", service, args=(cpu_times,), replicas=SERVICES)
+    started = time.perf_counter()
+    runner.run()
+    runner.wait()
+    seconds = time.perf_counter() - started
+    return seconds, sum(cpu_times.get() for _ in range(SERVICES)) / (SERVICES * RECORDS)
+
+
+def main():
+    """Print the records per second of both pipelines and the service CPU time per record"""
+    logging.getLogger("service").setLevel(logging.WARNING)
+    with open(os.devnull, "w", encoding="utf-8") as devnull:
+        handler = logging.StreamHandler(devnull)
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s - %(message)s"))
+        logging.basicConfig(level=logging.INFO, handlers=[handler])
+        for name, centralized_logging in (("direct", False), ("centralized", True)):
+            seconds, per_record = run(centralized_logging)
+            print(f"{name:>12}: {SERVICES * RECORDS / seconds:>10.0f} records/s ({seconds:.2f} s), "
+                  f"{per_record * 1e6:.1f} us of service CPU per record")
+    print(f"{os.cpu_count()} CPUs")
+
+
+if __name__ == "__main__":
+    main()
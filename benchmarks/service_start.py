@@ -0,0 +1,82 @@
+"""Compare the service start methods: time until the service function runs and memory of every child.
+
+RSS counts the shared pages in every process, PSS splits them between the processes sharing them, so a lower PSS
+means more copy-on-write sharing with the kernel process.
+
+Run it from the repository root: PYTHONPATH=. python benchmarks/service_start.py
+"""
+import logging
+import multiprocessing
+import os
+import time
+
+from applauncher.service_runner import ProcessServiceRunner
+
+CHILDREN = 8
+# Heavy modules the bundles usually import, the kernel process already has them
+PRELOAD = ["applauncher.applauncher", "pydantic", "yaml", "dependency_injector.containers", "rich.console"]
+# Memory held by the kernel process, shared with the forked children
+BALLAST = []
+
+
+def service(started, stop):
+    """Tell when the service function runs and then wait until the benchmark is done"""
+    for module in PRELOAD:
+        __import__(module)
+    started.put((os.getpid(), time.monotonic()))
+    stop.wait()
+
+
+def memory(pid):
+    """RSS and PSS of a process in MiB (PSS needs Linux 4.14+)"""
+    values = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup", encoding="ascii") as smaps:
+            for line in smaps:
+                key, _, value = line.partition(":")
+                if key in ("Rss", "Pss"):
+                    values[key] = int(value.split()[0]) / 1024
+    except FileNotFoundError:
+        pass
+    return values.get("Rss", float("nan")), values.get("Pss", float("nan"))
+
+
+def run(start_method):
+    """Start the children with a start method and measure them"""
+    context = multiprocessing.get_context(start_method)
+    started = context.Queue()
+    stop = context.Event()
+    runner = ProcessServiceRunner(start_method)
+    runner.preload(PRELOAD)
+    if start_method == "forkserver":
+        # The fork server boots (and imports the preloaded modules) once per kernel, only the services are measured
+        warm_up = context.Process(target=time.sleep, args=(0,))
+        warm_up.start()
+        warm_up.join()
+    runner.add_service("bench", service, args=(started, stop), replicas=CHILDREN)
+    begin = time.monotonic()
+    runner.run()
+    latencies = sorted(started.get()[1] - begin for _ in range(CHILDREN))
+    memories = [memory(process.pid) for _, process in runner.running_services]
+    stop.set()
+    runner.wait()
+    rss = sum(i[0] for i in memories) / CHILDREN
+    pss = sum(i[1] for i in memories) / CHILDREN
+    return latencies[len(latencies) // 2] * 1000, latencies[-1] * 1000, rss, pss
+
+
+def main():
+    """Print the start latency and memory per child of every start method"""
+    # The forkserver and spawn children run the main module again, the application state belongs here
+    BALLAST.extend({"value": i, "name": str(i)} for i in range(200000))
+    for module in PRELOAD:
+        __import__(module)
+    logging.getLogger("service").setLevel(logging.WARNING)
+    print(f"{'method':>10} {'median (ms)':>12} {'last (ms)':>10} {'RSS (MiB)':>10} {'PSS (MiB)':>10}")
+    for start_method in ("spawn", "forkserver", "fork"):
+        median, last, rss, pss = run(start_method)
+        print(f"{start_method:>10} {median:>12.1f} {last:>10.1f} {rss:>10.1f} {pss:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""Compare the thread and process service runners: start time, memory and a GIL releasing workload (hashlib).
+
+The memory is the PSS of the kernel process plus its children, so the pages shared by the forked services are counted
+once.
+
+Run it from the repository root: PYTHONPATH=. python benchmarks/thread_runner.py
+"""
+import hashlib
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+import time
+
+from applauncher.service_runner import ProcessServiceRunner, ThreadServiceRunner, gil_disabled
+
+SERVICES = 8
+# hashlib releases the GIL for buffers bigger than 2 KiB
+CHUNK = b"x" * (1 << 20)
+CHUNKS = 64
+
+
+def service(started, done, release):
+    """Tell when the service runs, hash some data, tell when it is done and wait until the memory is measured"""
+    started.put(time.monotonic())
+    digest = hashlib.sha256()
+    for _ in range(CHUNKS):
+        digest.update(CHUNK)
+    done.put(time.monotonic())
+    release.wait()
+
+
+def pss(pid):
+    """PSS of a process in MiB (Linux 4.14+)"""
+    try:
+        with open(f"/proc/{pid}/smaps_rollup", encoding="ascii") as smaps:
+            for line in smaps:
+                if line.startswith("Pss:"):
+                    return int(line.split()[1]) / 1024
+    except FileNotFoundError:
+        pass
+    return float("nan")
+
+
+def run(runner, queue_factory, event_factory):
+    """Run the services and measure them"""
+    started, done, release = queue_factory(), queue_factory(), event_factory()
+    runner.add_service("bench", service, args=(started, done, release), replicas=SERVICES)
+    begin = time.monotonic()
+    runner.run()
+    last_start = max(started.get() for _ in range(SERVICES)) - begin
+    last_done = max(done.get() for _ in range(SERVICES)) - begin
+    pids = {os.getpid()} | {getattr(worker, "pid", None) for _, worker in runner.running_services} - {None}
+    memory = sum(pss(pid) for pid in pids)
+    release.set()
+    runner.wait()
+    return last_start * 1000, last_done * 1000, memory
+
+
+def main():
+    """Print the start time, total time and memory of both runners"""
+    logging.getLogger("service").setLevel(logging.WARNING)
+    print(f"GIL disabled: {gil_disabled()}")
+    print(f"{'runner':>8} {'started (ms)':>13} {'done (ms)':>10} {'PSS (MiB)':>10}")
+    for name, runner, queue_factory, event_factory in (
+        ("process", ProcessServiceRunner(), multiprocessing.Queue, multiprocessing.Event),
+        ("thread", ThreadServiceRunner(), queue.SimpleQueue, threading.Event),
+    ):
+        started, done, memory = run(runner, queue_factory, event_factory)
+        print(f"{name:>8} {started:>13.1f} {done:>10.1f} {memory:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
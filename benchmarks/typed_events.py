@@ -0,0 +1,81 @@
+"""Compare a plain event (instance dict, pickled as it is) with the same event declared with typed fields (slots and
+binary codec): creation time, memory per event and the size and time of the serialization.
+
+Run it from the repository root: PYTHONPATH=. python benchmarks/typed_events.py
+"""
+import pickle
+import timeit
+import tracemalloc
+
+from applauncher.event import Event, decode_event, encode_event
+
+NUMBER = 200000
+ALLOCATED = 100000
+
+
+class PlainOrderEvent(Event):
+    """An event as they are usually written"""
+    event_name = "benchmark.plain_order"
+    shared = True
+
+    def __init__(self, order_id, amount, paid, currency):
+        self.order_id = order_id
+        self.amount = amount
+        self.paid = paid
+        self.currency = currency
+
+
+class TypedOrderEvent(Event):
+    """The same event with typed fields"""
+    event_name = "benchmark.typed_order"
+    shared = True
+    order_id: int
+    amount: float
+    paid: bool
+    currency: str
+
+
+def allocated_bytes(event_class):
+    """Memory taken by every event when many of them are alive"""
+    tracemalloc.start()
+    events = [event_class(i, 9.99, True, "EUR") for i in range(ALLOCATED)]
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del events
+    return size / ALLOCATED
+
+
+def per_call(statement, names):
+    """Best time of a statement in microseconds"""
+    return min(timeit.repeat(statement, globals=names, number=NUMBER, repeat=3)) / NUMBER * 1e6
+
+
+def main():
+    """Print the cost of every step for both events"""
+    rows = []
+    for event_class in (PlainOrderEvent, TypedOrderEvent):
+        event = event_class(1234, 9.99, True, "EUR")
+        payload = pickle.dumps(event, protocol=pickle.HIGHEST_PROTOCOL)
+        names = {"event_class": event_class, "event": event, "payload": payload, "pickle": pickle}
+        rows.append((
+            event_class.__name__,
+            per_call("event_class(1234, 9.99, True, 'EUR')", names),
+            allocated_bytes(event_class),
+            len(payload),
+            per_call("pickle.dumps(event, protocol=pickle.HIGHEST_PROTOCOL)", names),
+            per_call("pickle.loads(payload)", names),
+        ))
+    print(f"{'event':>16} {'create us':>10} {'bytes':>6} {'pickled':>8} {'dumps us':>9} {'loads us':>9}")
+    for name, create, memory, size, dumps, loads in rows:
+        print(f"{name:>16} {create:>10.3f} {memory:>6.0f} {size:>8} {dumps:>9.3f} {loads:>9.3f}")
+
+    event = TypedOrderEvent(1234, 9.99, True, "EUR")
+    data = encode_event(event)
+    names = {"event": event, "data": data, "encode_event": encode_event, "decode_event": decode_event}
+    encode = per_call("encode_event(event)", names)
+    decode = per_call("decode_event(data)", names)
+    print(f"encode_event: {len(data)} bytes, {encode:.3f} us to encode, {decode:.3f} us to decode")
+
+
+if __name__ == "__main__":
+    main()
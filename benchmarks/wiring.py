@@ -0,0 +1,70 @@
+"""Compare wiring a big module without a plan (full introspection), with the wiring plan and lazily.
+
+The module has many functions and pydantic models and only a few of them ask for dependencies, like the usual
+application modules.
+
+Run it from the repository root: PYTHONPATH=. python benchmarks/wiring.py
+"""
+import importlib
+import sys
+import tempfile
+import time
+
+from dependency_injector import containers, providers
+
+from applauncher.wiring import Wiring, WiringPlan
+
+MODULE = "bench_wired_module"
+FUNCTIONS = 2000
+MODELS = 200
+INJECTED = 20
+ROUNDS = 20
+
+
+def module_source():
+    """Source of the module to wire"""
+    lines = ["from dependency_injector.wiring import Provide", "from pydantic import BaseModel", ""]
+    for i in range(FUNCTIONS):
+        default = 'Provide["name"]' if i < INJECTED else '"value"'
+        lines.append(f"def function_{i}(first, second=1, name={default}):\n    return name\n")
+    for i in range(MODELS):
+        lines.append(f"class Model{i}(BaseModel):\n    value: int = {i}\n    name: str = 'model'\n")
+    return "\n".join(lines)
+
+
+def fresh_import():
+    """Import the module again, like a new boot would do"""
+    sys.modules.pop(MODULE, None)
+    started = time.perf_counter()
+    module = importlib.import_module(MODULE)
+    return module, time.perf_counter() - started
+
+
+def main():
+    """Print the wiring time of every mode"""
+    container = containers.DynamicContainer()
+    container.name = providers.Object("bench")
+    with tempfile.TemporaryDirectory() as directory:
+        with open(f"{directory}/{MODULE}.py", "w", encoding="utf-8") as module_file:
+            module_file.write(module_source())
+        sys.path.insert(0, directory)
+        cache_dir = f"{directory}/cache"
+        results = {"cold": [], "planned": []}
+        for _ in range(ROUNDS):
+            for mode, plan in (("cold", WiringPlan()), ("planned", WiringPlan(cache_dir))):
+                module, _ = fresh_import()
+                wiring = Wiring(container, plan)
+                results[mode].append(wiring.wire(module)[1])
+                plan.save()
+        _, import_seconds = fresh_import()
+        # The lazy boot does not import nor wire the module at all
+        print(f"{FUNCTIONS} functions ({INJECTED} injected), {MODELS} models, import {import_seconds * 1000:.1f} ms")
+        cold = sorted(results["cold"])[ROUNDS // 2]
+        for mode, times in results.items():
+            median = sorted(times)[ROUNDS // 2]
+            print(f"{mode:>8}: {median * 1000:.2f} ms, saved {(cold - median) * 1000:.2f} ms")
+        print(f"{'lazy':>8}: 0.00 ms at boot, saved {(cold + import_seconds) * 1000:.2f} ms until the first import")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,12 @@
+import signal
+
+import pytest
+
+
+@pytest.fixture
+def restore_signals():
+    """The kernel installs its SIGINT and SIGTERM handlers, the ones of pytest are put back after the test"""
+    handlers = {sig: signal.getsignal(sig) for sig in (signal.SIGINT, signal.SIGTERM)}
+    yield
+    for sig, handler in handlers.items():
+        signal.signal(sig, handler)
@@ -0,0 +1,247 @@
+import functools
+import multiprocessing
+import os
+import threading
+import time
+import types
+
+import pytest
+from dependency_injector import providers
+from pydantic import BaseModel
+
+from applauncher import Kernel
+from applauncher.boot import BootDependencyError, BootScheduler
+from applauncher.event import ConfigurationReadyEvent, Event, EventManager
+
+
+class FirstBundle:
+    pass
+
+
+class SecondBundle:
+    boot_dependencies = [FirstBundle]
+
+
+class ThirdBundle:
+    boot_dependencies = [SecondBundle]
+
+
+class IndependentBundle:
+    pass
+
+
+class TestBootScheduler:
+    def test_dependencies_order(self):
+        third, second, first = ThirdBundle(), SecondBundle(), FirstBundle()
+        scheduler = BootScheduler([third, second, first])
+        assert scheduler.bundles == [first, second, third]
+
+    def test_independent_bundles_keep_order(self):
+        bundles = [IndependentBundle(), FirstBundle(), IndependentBundle()]
+        assert BootScheduler(bundles).bundles == bundles
+
+    def test_missing_dependency(self):
+        with pytest.raises(BootDependencyError):
+            BootScheduler([SecondBundle()])
+
+    def test_circular_dependencies(self):
+        class A:
+            pass
+
+        class B:
+            boot_dependencies = [A]
+
+        A.boot_dependencies = [B]
+        with pytest.raises(BootDependencyError):
+            BootScheduler([A(), B()])
+
+    def test_concurrent_phase(self):
+        first, second, independent = FirstBundle(), SecondBundle(), IndependentBundle()
+        scheduler = BootScheduler([first, second, independent], workers=4)
+        finished = []
+        lock = threading.Lock()
+
+        def step(bundle):
+            time.sleep(0.2)
+            with lock:
+                finished.append(bundle)
+            return bundle.__class__.__name__
+
+        started = time.perf_counter()
+        results = scheduler.run("phase", step)
+        elapsed = time.perf_counter() - started
+        # First and Independent run together, Second waits for First
+        assert elapsed < 0.55
+        assert finished.index(first) < finished.index(second)
+        assert results[second] == "SecondBundle"
+        assert set(scheduler.timings["phase"]) == {first, second, independent}
+
+    def test_step_error(self):
+        scheduler = BootScheduler([FirstBundle(), SecondBundle()], workers=2)
+
+        def step(bundle):
+            raise ValueError("Boom")
+
+        with pytest.raises(ValueError):
+            scheduler.run("phase", step)
+
+
+class KernelModel(BaseModel):
+    value: str
+
+
+class ConfiguredBundle:
+    def __init__(self):
+        self.config_mapping = {"test": KernelModel}
+        self.event_listeners = [(ConfigurationReadyEvent, self.configuration_ready)]
+        self.value = None
+
+    def configuration_ready(self, event):
+        self.value = event.configuration.test.value
+
+
+class DependentBundle:
+    boot_dependencies = [ConfiguredBundle]
+
+    def __init__(self, configured_bundle):
+        self.configured_bundle = configured_bundle
+        self.event_listeners = [(ConfigurationReadyEvent, self.configuration_ready)]
+        self.value = None
+
+    def configuration_ready(self, event):
+        self.value = self.configured_bundle.value.upper()
+
+
+@pytest.fixture
+def kernel_bundles():
+    """Bundles of the kernels of a test. Their listeners are removed afterwards, the kernels are kept alive"""
+    bundles = []
+    yield bundles
+    for bundle in bundles:
+        for event_type, listener in bundle.event_listeners:
+            EventManager.remove_listener(event_type, listener)
+
+
+def test_kernel_boot_phases(restore_signals, kernel_bundles):
+    configured = ConfiguredBundle()
+    dependent = DependentBundle(configured)
+    kernel_bundles += [configured, dependent]
+    kernel = Kernel(
+        environment="TEST",
+        bundles=[dependent, configured],
+        configuration_file="test/config_assets/config.yml",
+        parameters_file="test/config_assets/parameters_2.yml",
+        boot_workers=2
+    )
+    assert dependent.value == configured.value.upper()
+    assert list(kernel.boot.timings) == ["configuration", "config listeners", "listeners", "container", "services"]
+    assert kernel.boot.bundles == [configured, dependent]
+
+
+def test_configuration_ready_event_listeners(restore_signals, kernel_bundles):
+    received = []
+
+    def global_listener(event):
+        received.append("global")
+
+    def parent_listener(event):
+        if isinstance(event, ConfigurationReadyEvent):
+            received.append("parent")
+
+    EventManager.add_listener(ConfigurationReadyEvent, global_listener)
+    EventManager.add_listener(Event, parent_listener)
+    bundle = ConfiguredBundle()
+    kernel_bundles.append(bundle)
+    bundle.event_listeners.append((ConfigurationReadyEvent, lambda event: received.append("bundle")))
+    kernel = Kernel(
+        environment="TEST",
+        bundles=[bundle],
+        configuration_file="test/config_assets/config.yml",
+        parameters_file="test/config_assets/parameters_2.yml",
+    )
+    assert received == ["global", "parent", "bundle"]
+    assert bundle.value == kernel.config.test.value
+
+    # The bundle listeners are registered like the other ones for the next dispatches
+    EventManager.dispatch(ConfigurationReadyEvent(types.SimpleNamespace(test=KernelModel(value="reloaded"))))
+    assert bundle.value == "reloaded"
+
+
+class Connection:
+    def __init__(self):
+        self.pid = os.getpid()
+
+
+class WarmUpBundle:
+    def __init__(self, queue):
+        self.created = []
+        self.initialized = []
+        self.injection_bindings = {
+            "warm_pool": lambda _container: providers.Singleton(self.created.append, "pool"),
+            "warm_connection": lambda _container: providers.Singleton(Connection),
+        }
+        # The connection is also created in the kernel, before the fork
+        self.warm_up = ["warm_pool", "warm_connection"]
+        self.process_warm_up = ["warm_connection"]
+        self.process_initializers = [lambda: self.initialized.append(os.getpid())]
+        self.services = [("warm_up_service", self.service, (queue,), {})]
+
+    def service(self, queue):
+        queue.put((Kernel.container.warm_connection().pid, self.initialized, os.getpid()))
+
+
+def test_kernel_warm_up(restore_signals):
+    queue = multiprocessing.get_context("fork").Queue()
+    bundle = WarmUpBundle(queue)
+    kernel = Kernel(
+        environment="TEST",
+        bundles=[bundle],
+        configuration_file="test/config_assets/config.yml",
+        parameters_file="test/config_assets/parameters_2.yml",
+        start_method="fork"
+    )
+    assert Kernel.container.warm_connection().pid == os.getpid()
+    kernel.wait()
+    connection_pid, initialized, service_pid = queue.get(timeout=10)
+    assert bundle.created == ["pool"]
+    assert "warm up" in kernel.boot.timings
+    assert connection_pid == service_pid != os.getpid()
+    assert initialized == [service_pid]
+
+
+def write_pid(path):
+    with open(path, "a", encoding="utf-8") as pid_file:
+        pid_file.write(f"{os.getpid()}\n")
+
+
+class InitializedBundle:
+    def __init__(self, path):
+        self.process_initializers = [functools.partial(write_pid, f"{path}.initialized")]
+        self.services = [("initialized_service", write_pid, (f"{path}.service",), {})]
+
+
+@pytest.mark.parametrize("start_method", ["spawn", "forkserver"])
+def test_process_initializers_without_fork(restore_signals, tmp_path, start_method):
+    path = tmp_path / "pids"
+    kernel = Kernel(
+        environment="TEST",
+        bundles=[InitializedBundle(path)],
+        configuration_file="test/config_assets/config.yml",
+        parameters_file="test/config_assets/parameters_2.yml",
+        start_method=start_method
+    )
+    kernel.wait()
+    service_pid = open(f"{path}.service", encoding="utf-8").read()
+    assert open(f"{path}.initialized", encoding="utf-8").read() == service_pid
+    assert service_pid != f"{os.getpid()}\n"
+
+
+def test_process_warm_up_needs_fork(restore_signals):
+    with pytest.raises(ValueError, match="fork start method"):
+        Kernel(
+            environment="TEST",
+            bundles=[WarmUpBundle(None)],
+            configuration_file="test/config_assets/config.yml",
+            parameters_file="test/config_assets/parameters_2.yml",
+            start_method="spawn"
+        )
@@ -1,4 +1,6 @@
+import importlib
 import os
+import sys
 from typing import List
 from unittest import mock
 
@@ -6,7 +8,11 @@ import pytest
 import yaml
 from pydantic import BaseModel, validator, ValidationError
 
-from applauncher.configuration import FormatterWithListYAML, is_string, load_configuration
+from applauncher.configuration import (
+    LOADERS, ConfigurationCache, ConfigurationLoader, FormatterWithListYAML, JsonLoader, StructuredParameters,
+    TemplateParameters, TomlLoader, YmlLoader, compile_template, diff_configuration, get_loader, is_string,
+    load_configuration, register_loader, tomllib
+)
 
 
 class TestModel(BaseModel):
@@ -153,3 +159,224 @@ class TestFormatterWithListYAML:
     def test_yaml_list_all_params(self, formatter):
         expected_value = 'Some value: \n    - a\n    - b\n    - c,d'
         assert formatter.format('Some value: {VALUE:[|]-.4^}', VALUE='a|b|c,d') == expected_value
+
+
+class TestConfigurationCache:
+    def copy_assets(self, tmp_path):
+        config_file = tmp_path / "config.yml"
+        parameters_file = tmp_path / "parameters.yml"
+        config_file.write_text("test:\n  value: {VALUE}\n  number: {NUMBER}\n")
+        parameters_file.write_text("VALUE: two words\nNUMBER: 3\n")
+        return str(config_file), str(parameters_file)
+
+    def test_warm_load(self, tmp_path, monkeypatch):
+        monkeypatch.delenv("VALUE", raising=False)
+        monkeypatch.delenv("NUMBER", raising=False)
+        config_file, parameters_file = self.copy_assets(tmp_path)
+        cache = ConfigurationCache(str(tmp_path / "cache"))
+
+        cold = load_configuration(config_file, parameters_file, [Bundle()], cache=cache)
+        assert cache.hit is False
+        with mock.patch.object(YmlLoader, "load_config") as load_config:
+            warm = load_configuration(config_file, parameters_file, [Bundle()], cache=cache)
+            load_config.assert_not_called()
+        assert cache.hit is True
+        assert warm.test == cold.test
+        assert warm.test.value == "Two Words"
+        assert warm.test.number == 3
+
+    def test_warm_load_without_parsing(self, tmp_path, monkeypatch):
+        monkeypatch.setenv("NUMBER", "4")
+        config_file = tmp_path / "config.json"
+        config_file.write_text('{"test": {"value": "{VALUE}", "number": "{NUMBER}"}}')
+        parameters_file = tmp_path / "parameters.json"
+        parameters_file.write_text('{"VALUE": "two words"}')
+        cache = ConfigurationCache(str(tmp_path / "cache"))
+
+        load_configuration(str(config_file), str(parameters_file), [Bundle()], cache=cache)
+        with mock.patch.object(JsonLoader, "parse") as parse:
+            warm = load_configuration(str(config_file), str(parameters_file), [Bundle()], cache=cache)
+            parse.assert_not_called()
+        assert cache.hit is True
+        assert warm.test.number == 4
+
+        monkeypatch.setenv("NUMBER", "5")
+        assert load_configuration(str(config_file), str(parameters_file), [Bundle()], cache=cache).test.number == 5
+        assert cache.hit is False
+
+    def test_stale_entries(self, tmp_path, monkeypatch):
+        monkeypatch.delenv("VALUE", raising=False)
+        monkeypatch.delenv("NUMBER", raising=False)
+        config_file, parameters_file = self.copy_assets(tmp_path)
+        cache = ConfigurationCache(str(tmp_path / "cache"))
+        load_configuration(config_file, parameters_file, [Bundle()], cache=cache)
+
+        # A referenced environment variable changes
+        monkeypatch.setenv("NUMBER", "5")
+        assert load_configuration(config_file, parameters_file, [Bundle()], cache=cache).test.number == 5
+        assert cache.hit is False
+        # Variables not used by the configuration do not matter
+        monkeypatch.setenv("SOMETHING_ELSE", "value")
+        load_configuration(config_file, parameters_file, [Bundle()], cache=cache)
+        assert cache.hit is True
+
+        # The parameters file changes
+        with open(parameters_file, "w") as parameters:
+            parameters.write("VALUE: other words\nNUMBER: 3\n")
+        assert load_configuration(config_file, parameters_file, [Bundle()], cache=cache).test.value == "Other Words"
+        assert cache.hit is False
+
+        # The configuration file changes
+        with open(config_file, "w") as config:
+            config.write("test:\n  value: fixed value\n")
+        configuration = load_configuration(config_file, parameters_file, [Bundle()], cache=cache)
+        assert cache.hit is False
+        assert configuration.test.value == "Fixed Value"
+        assert configuration.test.number == 0
+
+        # A nested model defined in another module changes
+        monkeypatch.syspath_prepend(str(tmp_path))
+        model = "from pydantic import BaseModel\n{}\n\n\nclass {}(BaseModel):\n{}\n"
+        (tmp_path / "cache_inner.py").write_text(model.format("", "Inner", "    host: str"))
+        outer = model.format("from cache_inner import Inner", "Outer", "    db: Inner")
+        (tmp_path / "cache_outer.py").write_text(outer)
+        with open(config_file, "w") as config:
+            config.write("test:\n  value: fixed value\napp:\n  db:\n    host: localhost\n")
+        cache_outer = importlib.import_module("cache_outer")
+        bundle = Bundle()
+        bundle.config_mapping["app"] = cache_outer.Outer
+        load_configuration(config_file, parameters_file, [bundle], cache=cache)
+        (tmp_path / "cache_inner.py").write_text(model.format("", "Inner", "    host: str\n    port: int = 5432"))
+        importlib.reload(sys.modules["cache_inner"])
+        bundle.config_mapping["app"] = importlib.reload(cache_outer).Outer
+        configuration = load_configuration(config_file, parameters_file, [bundle], cache=cache)
+        assert cache.hit is False
+        assert configuration.app.db.port == 5432
+
+        # The mappings change
+        class OtherBundle:
+            config_mapping = {"test": TestModel, "other": TestModel}
+
+        with pytest.raises(ValidationError):
+            load_configuration(config_file, parameters_file, [OtherBundle()], cache=cache)
+
+
+class TestCompiledTemplate:
+    def test_same_output_as_formatter(self, formatter):
+        template = 'a: {VALUE}\nb: {LIST:[]}\nc: {LIST:[|]-.4^}\nd: {{literal}}\ne: {VALUE!r:>10}'
+        parameters = {"VALUE": "text", "LIST": "a,b|c"}
+        assert compile_template(template).render(parameters) == formatter.format(template, **parameters)
+
+    def test_referenced_parameters(self):
+        assert compile_template("{A} {B.attribute} {C[0]} {A:[]} {{D}}").parameters == {"A", "B", "C"}
+
+    def test_template_reused(self):
+        template = "value: {SOME_VALUE}"
+        first = compile_template(template)
+        assert compile_template("value: {SOME_" + "VALUE}") is first
+
+    def test_only_referenced_environment_variables(self, monkeypatch):
+        monkeypatch.setenv("VALUE", "from env")
+        monkeypatch.setenv("UNRELATED_VARIABLE", "12")
+        with mock.patch("applauncher.configuration.is_string", wraps=is_string) as checked:
+            c = load_configuration("test/config_assets/config.yml", "test/config_assets/parameters_2.yml", [Bundle()])
+        assert c.test.value == "From Env"
+        checked.assert_called_once_with("from env")
+
+    def test_missing_parameter(self):
+        with pytest.raises(KeyError):
+            compile_template("{MISSING_PARAMETER}").render(TemplateParameters({}))
+
+
+def test_diff_configuration():
+    old = {"a": {"b": 1, "c": [1, 2], "d": {"e": "x"}}, "f": 1, "g": None}
+    new = {"a": {"b": 1, "c": [1, 3], "d": {"e": "y"}}, "h": 2, "g": None}
+    assert diff_configuration(old, new) == {
+        "a.c": ([1, 2], [1, 3]),
+        "a.d.e": ("x", "y"),
+        "f": (1, None),
+        "h": (None, 2),
+    }
+    assert diff_configuration(old, old) == {}
+
+
+class TestLoaderRegistry:
+    def test_get_loader(self):
+        assert isinstance(get_loader("config/config.yml"), YmlLoader)
+        assert isinstance(get_loader("config/config.YAML"), YmlLoader)
+        assert isinstance(get_loader("config/config.json"), JsonLoader)
+        assert isinstance(get_loader("config/config.toml"), TomlLoader)
+        # Unknown extensions are considered YAML
+        assert isinstance(get_loader("config/config.conf"), YmlLoader)
+
+    def test_register_loader(self):
+        class CustomLoader(JsonLoader):
+            pass
+
+        register_loader(CustomLoader, ".custom")
+        try:
+            assert isinstance(get_loader("config.custom"), CustomLoader)
+        finally:
+            del LOADERS[".custom"]
+
+    def test_parameters_of_custom_loader(self, tmp_path):
+        class IniLoader(ConfigurationLoader):
+            """Only knows how to read parameters files of KEY=value lines"""
+            def load_parameters(self, source):
+                with open(source, encoding="utf-8") as lines:
+                    return dict(line.strip().split("=", 1) for line in lines if line.strip())
+
+            def load_config(self, config_source, parameters_source):
+                raise NotImplementedError()
+
+        (tmp_path / "parameters.ini").write_text("VALUE=ini value\n")
+        register_loader(IniLoader, ".ini")
+        try:
+            assert not IniLoader.can_parse()
+            assert JsonLoader.can_parse()
+            assert JsonLoader().load_parameters(str(tmp_path / "parameters.ini")) == {"VALUE": "ini value"}
+        finally:
+            del LOADERS[".ini"]
+
+    def test_json_lists(self):
+        c = load_configuration(
+            "test/config_assets/config_list.json",
+            "test/config_assets/parameters_list.yml",
+            [ListBundle()]
+        )
+        assert c.test.some_list == ['a', 'b', 'c', 'd', 'e', 'f', 'g']
+        assert c.test.custom_splitter == ['a,b,c', 'd,e', 'f', 'g']
+        assert c.test.yaml_style == ['a,b,c,d,e,f,g', 'other-value', 'and-more']
+        assert c.test.yaml_style_same_line == ['a', 'b', 'c', 'd', 'e', 'f', 'g']
+
+    @pytest.mark.skipif(tomllib is None, reason="tomllib or tomli are required")
+    def test_toml_types(self, monkeypatch):
+        monkeypatch.delenv("VALUE", raising=False)
+        monkeypatch.delenv("NUMBER", raising=False)
+        c = load_configuration("test/config_assets/config.toml", "test/config_assets/parameters.json", [Bundle()])
+        assert c.test.value == "Json Words"
+        assert c.test.number == 4
+
+        # Environment variables are converted like YAML does
+        monkeypatch.setenv("NUMBER", "7")
+        monkeypatch.setenv("VALUE", "from env")
+        c = load_configuration("test/config_assets/config.toml", "test/config_assets/parameters.json", [Bundle()])
+        assert c.test.value == "From Env"
+        assert c.test.number == 7
+
+    def test_mixed_strings(self, monkeypatch):
+        monkeypatch.setenv("HOST", "localhost")
+        monkeypatch.setenv("PORT", "8080")
+        loaded = JsonLoader()._replace(
+            {"url": "http://{HOST}:{PORT}/", "port": "{PORT}", "flag": "{FLAG}", "raw": 3},
+            StructuredParameters({"FLAG": True})
+        )
+        assert loaded == {"url": "http://localhost:8080/", "port": 8080, "flag": True, "raw": 3}
+
+    def test_referenced_parameters(self):
+        assert JsonLoader().referenced_parameters('{"a": "{A}", "b": ["{B:[]}", 1], "c": {"d": "x{C}"}}') == {
+            "A", "B", "C"
+        }
+
+    def test_libyaml(self):
+        assert YmlLoader.yaml_loader is getattr(yaml, "CSafeLoader", yaml.SafeLoader)
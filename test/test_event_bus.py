@@ -0,0 +1,88 @@
+import pickle
+import time
+from multiprocessing import Manager
+
+from applauncher.event import Event, EventManager, encode_event
+from applauncher.event_bus import EventBus, decode_batch, encode_batch
+from applauncher.service_runner import ProcessServiceRunner
+
+
+class PingEvent(Event):
+    event_name = "test.bus.ping"
+    shared = True
+
+    def __init__(self, value):
+        self.value = value
+
+
+class TypedPingEvent(Event):
+    event_name = "test.bus.typed_ping"
+    shared = True
+    value: int
+    text: str
+
+
+class PongEvent(Event):
+    event_name = "test.bus.pong"
+    shared = True
+
+    def __init__(self, value):
+        self.value = value
+
+
+def pong_service(received):
+    """Answer every ping coming from the kernel process"""
+    def answer(event):
+        received.append(event.value)
+        EventManager.dispatch(PongEvent(event.value * 2))
+
+    EventManager.add_listener(PingEvent, answer)
+    time.sleep(3)
+
+
+def test_batch_codec():
+    payloads = [b"a", b"", b"some longer payload"]
+    encoded = encode_batch([pickle.dumps(p) for p in payloads])
+    assert list(decode_batch(encoded)) == payloads
+
+
+def test_batch_codec_typed_events():
+    event = TypedPingEvent(7, "ping")
+    decoded = list(decode_batch(encode_batch([encode_event(event), pickle.dumps("plain")])))
+    assert (decoded[0].value, decoded[0].text, decoded[1]) == (7, "ping", "plain")
+
+
+def test_publish_values_out_of_the_codec():
+    bus = EventBus(EventManager(), batch_size=10)
+    bus.publish(TypedPingEvent(2 ** 70, None))
+    (decoded,) = decode_batch(encode_batch(bus._buffer))
+    assert (decoded.value, decoded.text) == (2 ** 70, None)
+    bus.close()
+
+
+def test_events_cross_processes():
+    manager = Manager()
+    received_in_service = manager.list()
+    received_in_kernel = []
+
+    def pong(event):
+        received_in_kernel.append(event.value)
+
+    event_manager = EventManager()
+    event_manager.add_listener(PongEvent, pong)
+    bus = EventBus(event_manager)
+    bus.start()
+    runner = ProcessServiceRunner()
+    runner.add_initializer(bus.connect)
+    runner.add_service(name="pong", function=pong_service, args=(received_in_service,))
+    try:
+        runner.run()
+        deadline = time.monotonic() + 5
+        while not received_in_kernel and time.monotonic() < deadline:
+            event_manager.dispatch(PingEvent(21))
+            time.sleep(0.1)
+        assert 42 in received_in_kernel
+        assert 21 in received_in_service
+    finally:
+        runner.kill()
+        bus.close()
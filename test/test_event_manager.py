@@ -1,4 +1,64 @@
-from applauncher.event import EventManager, KernelReadyEvent, ConfigurationReadyEvent
+import asyncio
+import pickle
+import threading
+import time
+import typing
+
+import pytest
+
+from applauncher.event import EventManager, Event, KernelReadyEvent, ConfigurationReadyEvent, KernelShutdownEvent
+from applauncher import event as event_module
+from applauncher.event import decode_event, encode_event
+
+
+class OrderEvent(Event):
+    event_name = "test.typed.order"
+    shared = True
+    order_id: int
+    amount: float
+    paid: bool
+    currency: str = "EUR"
+    receipt: bytes = b""
+    items: list = None
+    created: typing.ClassVar[int] = 0
+
+
+class StockEvent(Event):
+    event_name = "test.batch.stock"
+    coalesce_key = "product"
+
+    def __init__(self, product, quantity):
+        self.product = product
+        self.quantity = quantity
+
+
+class StockSoldEvent(StockEvent):
+    event_name = "test.batch.stock.sold"
+
+
+class RefundEvent(OrderEvent):
+    event_name = "test.typed.refund"
+    reason: str = ""
+
+
+class OptionalEvent(Event):
+    event_name = "test.typed.optional"
+    count: int
+    paid: bool = None
+    note: str = None
+
+
+class LegacyEvent(Event):
+    event_name = "test.typed.legacy"
+    retries: int = 3
+
+    def __init__(self, payload):
+        self.payload = payload
+
+
+class LegacyChildEvent(LegacyEvent):
+    event_name = "test.typed.legacy.child"
+    delay: float = 0.5
 
 
 class TestClass:
@@ -79,3 +139,311 @@ class TestClass:
         em.add_listener(ConfigurationReadyEvent.event_name, OtherCounter.event)
         em.dispatch(ConfigurationReadyEvent({"config": "config"}))
         assert OtherCounter.config == {"config": "config"}
+
+    def test_dispatch_table_invalidation(self):
+        """Listeners added after the event was already dispatched must be called too"""
+        em = EventManager()
+
+        class ChildEvent(KernelReadyEvent):
+            event_name = "test.child_of_kernel_ready"
+
+        received = []
+
+        def parent_listener(event):
+            received.append(("parent", event))
+
+        def child_listener(event):
+            received.append(("child", event))
+
+        em.add_listener(ChildEvent, child_listener)
+        first = ChildEvent()
+        em.dispatch(first)
+        assert received == [("child", first)]
+
+        em.add_listener(KernelReadyEvent, parent_listener)
+        second = ChildEvent()
+        em.dispatch(second)
+        assert ("child", second) in received
+        assert ("parent", second) in received
+        assert len(received) == 3
+
+    def test_listener_added_while_compiling(self, monkeypatch):
+        """A listener added by another thread while the table is compiled must not be missed afterwards"""
+        race_event = type("RaceEvent", (Event,), {"event_name": "test.race"})
+        received = []
+
+        def first(event):
+            received.append("first")
+
+        def late(event):
+            received.append("late")
+
+        weak_reference = event_module._weak_reference
+
+        def add_while_compiling(receiver):
+            monkeypatch.setattr(event_module, "_weak_reference", weak_reference)
+            EventManager.add_listener(race_event, late)
+            return weak_reference(receiver)
+
+        EventManager.add_listener(race_event, first)
+        monkeypatch.setattr(event_module, "_weak_reference", add_while_compiling)
+        EventManager.dispatch(race_event())
+        assert received == ["first"]
+        EventManager.dispatch(race_event())
+        assert received[1:] == ["first", "late"]
+
+    def test_dispatch_table_weak_listeners(self):
+        """The dispatch table must not keep alive listeners that blinker only references weakly"""
+        em = EventManager()
+
+        class TemporaryEvent(KernelReadyEvent):
+            event_name = "test.temporary"
+
+        class Listener:
+            calls = 0
+
+            def listen(self, event):
+                Listener.calls += 1
+
+        listener = Listener()
+        em.add_listener(TemporaryEvent, listener.listen)
+        em.dispatch(TemporaryEvent())
+        assert Listener.calls == 1
+
+        del listener
+        em.dispatch(TemporaryEvent())
+        em.dispatch(TemporaryEvent())
+        assert Listener.calls == 1
+
+
+class TestAsyncDispatch:
+    @staticmethod
+    def run(coroutine):
+        loop = asyncio.new_event_loop()
+        try:
+            return loop.run_until_complete(coroutine)
+        finally:
+            loop.close()
+
+    def test_slow_listener_does_not_block_publisher(self):
+        class SlowEvent(Event):
+            event_name = "test.async.slow"
+
+        received = []
+        release = threading.Event()
+
+        def sync_listener(event):
+            release.wait(5)
+            received.append("sync")
+
+        async def async_listener(event):
+            received.append("async")
+
+        em = EventManager()
+        em.add_listener(SlowEvent, sync_listener)
+        em.add_listener(SlowEvent, async_listener)
+
+        async def scenario():
+            await em.dispatch_async(SlowEvent())
+            # The publisher goes on while the sync listener is still blocked
+            await asyncio.sleep(0.05)
+            assert received == ["async"]
+            release.set()
+            await em.close()
+
+        self.run(scenario())
+        assert sorted(received) == ["async", "sync"]
+
+    def test_backpressure(self):
+        class BurstEvent(Event):
+            event_name = "test.async.burst"
+
+        async def scenario():
+            gate = asyncio.Event()
+
+            async def listener(event):
+                await gate.wait()
+
+            em = EventManager(queue_size=1)
+            em.add_listener(BurstEvent, listener)
+            # The first one is being delivered and the second one fills the queue
+            await em.dispatch_async(BurstEvent())
+            await asyncio.sleep(0)
+            await em.dispatch_async(BurstEvent())
+            with pytest.raises(asyncio.TimeoutError):
+                await asyncio.wait_for(em.dispatch_async(BurstEvent()), timeout=0.05)
+            gate.set()
+            await em.close()
+
+        self.run(scenario())
+
+    def test_ordered_events(self):
+        class RegularEvent(Event):
+            event_name = "test.async.regular"
+
+        received = []
+
+        async def regular_listener(event):
+            await asyncio.sleep(0.05)
+            received.append("regular")
+
+        async def kernel_listener(event):
+            received.append("kernel")
+
+        em = EventManager()
+        em.add_listener(RegularEvent, regular_listener)
+        em.add_listener(KernelShutdownEvent, kernel_listener)
+
+        async def scenario():
+            await em.dispatch_async(RegularEvent())
+            await em.dispatch_async(KernelShutdownEvent())
+            # Lifecycle events are delivered before dispatch_async returns and after the previous events
+            assert received == ["regular", "kernel"]
+            await em.close()
+
+        self.run(scenario())
+
+
+class TestTypedEvents:
+    def test_fields(self):
+        event = OrderEvent(1, 9.5, True, items=["book"])
+        assert not hasattr(event, "__dict__")
+        assert OrderEvent.__slots__ == ("order_id", "amount", "paid", "currency", "receipt", "items")
+        assert (event.order_id, event.currency, event.items) == (1, "EUR", ["book"])
+        assert OrderEvent.created == 0
+        with pytest.raises(AttributeError):
+            event.other = 1
+
+    def test_codec(self):
+        event = RefundEvent(2, -1.25, False, "€", b"\x00\xff", {"a": 1}, "broken")
+        for decoded in (decode_event(encode_event(event)), pickle.loads(pickle.dumps(event))):
+            assert type(decoded) is RefundEvent
+            assert [getattr(decoded, name) for name in RefundEvent.fields] == [
+                2, -1.25, False, "€", b"\x00\xff", {"a": 1}, "broken"]
+        assert len(encode_event(event)) < len(pickle.dumps(event))
+
+    def test_parent_listeners(self):
+        received = []
+
+        def listener(event):
+            received.append(event.reason)
+
+        EventManager.add_listener(OrderEvent, listener)
+        EventManager.dispatch(RefundEvent(3, 1.0, True, reason="late"))
+        assert received == ["late"]
+
+    def test_annotated_settings(self):
+        class AnnotatedEvent(Event):
+            event_name: str = "test.typed.annotated"
+            shared: bool = True
+            value: int
+
+        assert AnnotatedEvent.fields == {"value": int}
+        assert (AnnotatedEvent.event_name, AnnotatedEvent.shared) == ("test.typed.annotated", True)
+        assert decode_event(encode_event(AnnotatedEvent(5))).value == 5
+
+    def test_values_out_of_the_codec(self):
+        for event in (OptionalEvent(2 ** 70), OptionalEvent(1, None, None)):
+            with pytest.raises(event_module.CODEC_ERRORS):
+                encode_event(event)
+        decoded = pickle.loads(pickle.dumps(OptionalEvent(2 ** 70)))
+        assert (decoded.count, decoded.paid, decoded.note) == (2 ** 70, None, None)
+        decoded = pickle.loads(pickle.dumps(OptionalEvent(-3, note="ok")))
+        assert (decoded.count, decoded.paid, decoded.note) == (-3, None, "ok")
+
+    def test_annotated_legacy_event(self):
+        for event in (LegacyEvent("data"), LegacyChildEvent("data")):
+            assert not hasattr(type(event), "fields")
+            assert (event.payload, event.retries) == ("data", 3)
+        assert LegacyChildEvent("data").delay == 0.5
+        assert pickle.loads(pickle.dumps(LegacyEvent("data"))).payload == "data"
+
+    def test_field_order(self):
+        with pytest.raises(TypeError, match="default"):
+            class WrongEvent(Event):  # pylint: disable=unused-variable
+                event_name = "test.typed.wrong"
+                first: int = 0
+                second: int
+
+
+class TestBatchListeners:
+    @pytest.fixture
+    def batch_listener(self):
+        """Add batch listeners, removed at the end of the test"""
+        added = []
+
+        def add(event, listener, **options):
+            added.append((event, EventManager.add_batch_listener(event, listener, **options)))
+            return added[-1][1]
+
+        yield add
+        for event, batcher in added:
+            EventManager.remove_batch_listener(event, batcher)
+
+    def test_max_size(self, batch_listener):
+        batches = []
+        size_event = type("SizeEvent", (Event,), {"event_name": "test.batch.size"})
+        batcher = batch_listener(size_event, batches.append, max_size=3, max_delay=None)
+        events = [size_event() for _ in range(7)]
+        for event in events:
+            EventManager.dispatch(event)
+        assert batches == [events[:3], events[3:6]]
+        batcher.flush()
+        assert batches[2] == events[6:]
+        batcher.flush()
+        assert len(batches) == 3
+
+    def test_max_delay(self, batch_listener):
+        batches = []
+        batcher = batch_listener("test.batch.delay", batches.append, max_delay=0.05)
+        delay_event = type("DelayEvent", (Event,), {"event_name": "test.batch.delay"})
+        # No timer while there is nothing to deliver
+        assert batcher._timer is None  # pylint: disable=protected-access
+        for _ in range(5):
+            EventManager.dispatch(delay_event())
+        assert batches == []
+        deadline = time.monotonic() + 5
+        while not batches and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert [len(batch) for batch in batches] == [5]
+        assert batcher._timer is None  # pylint: disable=protected-access
+
+    def test_coalescing(self, batch_listener):
+        batches = []
+        batch_listener(StockEvent, batches.append, max_delay=None)
+        for quantity in range(1000):
+            EventManager.dispatch(StockEvent("apple", quantity))
+            EventManager.dispatch(StockSoldEvent("apple", quantity))
+        EventManager.dispatch(StockEvent("pear", 1))
+        EventManager.dispatch(StockEvent("apple", -1))
+        EventManager.flush_batches()
+        # Listeners of the parent event get the child events, coalesced by class and key
+        assert [(type(event), event.product, event.quantity) for event in batches[0]] == [
+            (StockSoldEvent, "apple", 999), (StockEvent, "pear", 1), (StockEvent, "apple", -1)]
+
+    def test_listener_dispatching_to_its_batcher(self, batch_listener):
+        batches = []
+        echo_event = type("EchoEvent", (Event,), {"event_name": "test.batch.echo"})
+
+        def echo(events):
+            batches.append(len(events))
+            if len(batches) < 3:
+                for _ in range(2):
+                    EventManager.dispatch(echo_event())
+
+        batch_listener(echo_event, echo, max_size=2, max_delay=None)
+        EventManager.dispatch(echo_event())
+        EventManager.dispatch(echo_event())
+        assert batches == [2, 2, 2]
+
+    def test_remove_batch_listener(self):
+        batches = []
+        removed_event = type("RemovedEvent", (Event,), {"event_name": "test.batch.removed"})
+        batcher = EventManager.add_batch_listener(removed_event, batches.append, max_delay=60)
+        EventManager.dispatch(removed_event())
+        EventManager.remove_batch_listener(removed_event, batcher)
+        assert [len(batch) for batch in batches] == [1]
+        assert batcher._timer is None  # pylint: disable=protected-access
+        EventManager.dispatch(removed_event())
+        EventManager.flush_batches()
+        assert len(batches) == 1
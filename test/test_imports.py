@@ -0,0 +1,50 @@
+import subprocess
+import sys
+
+import pytest
+
+import applauncher
+
+HEAVY = ("rich", "pydantic", "dependency_injector", "applauncher.applauncher")
+
+
+def imported_modules(statement):
+    """Modules imported by a statement in a fresh interpreter"""
+    result = subprocess.run(
+        [sys.executable, "-c", f"{statement}\nimport sys\nprint(' '.join(sys.modules))"],
+        stdout=subprocess.PIPE, universal_newlines=True, check=True
+    )
+    return set(result.stdout.split())
+
+
+def test_package_import_is_lazy():
+    modules = imported_modules("import applauncher, applauncher.event, applauncher.service_runner")
+    assert [module for module in HEAVY if module in modules] == []
+
+
+def test_kernel_import():
+    modules = imported_modules("from applauncher import Kernel, ServiceContainer")
+    assert set(HEAVY) <= modules
+
+
+def test_optional_features_are_not_imported():
+    modules = imported_modules("from applauncher import Kernel")
+    optional = ("applauncher.metrics", "applauncher.event_bus", "applauncher.watcher", "applauncher.wiring", "ctypes")
+    assert [module for module in optional if module in modules] == []
+
+
+def test_unknown_attribute():
+    assert "Kernel" in dir(applauncher)
+    with pytest.raises(AttributeError, match="Missing"):
+        applauncher.Missing  # pylint: disable=pointless-statement
+
+
+def test_kernel_is_interactive_on_demand():
+    statement = (
+        "import logging\n"
+        "from applauncher import Kernel\n"
+        "Kernel('test', [], 'test/config_assets/config.yml', 'test/config_assets/parameters_2.yml', "
+        "interactive=False)\n"
+        "assert not logging.getLogger().handlers"
+    )
+    assert "rich.traceback" not in imported_modules(statement)
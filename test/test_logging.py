@@ -0,0 +1,181 @@
+import io
+import json
+import logging
+import os
+import queue
+import time
+
+import pytest
+from rich.table import Table
+
+from applauncher import Kernel
+from applauncher.logging import BatchingHandler, HeadlessConsole, JsonFormatter, configure_headless_logger
+from applauncher.logging import stop_headless_logger
+from applauncher.service_runner import ProcessServiceRunner
+
+
+@pytest.fixture
+def root_logger():
+    root = logging.getLogger()
+    handlers, level = list(root.handlers), root.level
+    yield root
+    stop_headless_logger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    for handler in handlers:
+        root.addHandler(handler)
+    root.setLevel(level)
+
+
+def json_lines(stream):
+    return [json.loads(line) for line in stream.getvalue().splitlines()]
+
+
+def test_json_formatter():
+    record = logging.makeLogRecord({"name": "service", "msg": "%s started", "args": ("web",), "levelname": "INFO",
+                                    "replica": 2})
+    line = json.loads(JsonFormatter().format(record))
+    assert line["message"] == "web started"
+    assert line["logger"] == "service"
+    assert line["replica"] == 2
+    assert line["time"].endswith("Z")
+
+
+def test_headless_logger(root_logger):
+    stream = io.StringIO()
+    configure_headless_logger(stream=stream)
+    values = ["first"]
+    logging.getLogger("service").info("values %s", values)
+    # The message is built when logging, not when the listener writes it
+    values.append("second")
+    try:
+        raise ValueError("broken")
+    except ValueError:
+        logging.getLogger("service").exception("failed")
+    stop_headless_logger()
+    first, second = json_lines(stream)
+    assert first["message"] == "values ['first']"
+    assert second["message"] == "failed"
+    assert "ValueError: broken" in second["exception"]
+
+
+def test_headless_console(root_logger):
+    stream = io.StringIO()
+    configure_headless_logger(stream=stream)
+    console = HeadlessConsole()
+    console.log("[bold cyan]Wiring[/] modules: ['app']")
+    table = Table(title="Boot timings (ms)")
+    table.add_column("Bundle")
+    table.add_column("config listeners")
+    table.add_row("MyBundle", "1.5")
+    console.print(table)
+    banner = Table(show_header=False)
+    banner.add_row("Kernel ready")
+    console.print(banner)
+    with console.status("[bold green]Booting kernel..."):
+        pass
+    stop_headless_logger()
+    lines = json_lines(stream)
+    assert [line["message"] for line in lines] == [
+        "Wiring modules: ['app']", "Boot timings (ms)", "Kernel ready", "Booting kernel..."
+    ]
+    assert lines[1]["row"] == {"bundle": "MyBundle", "config_listeners": 1.5}
+
+
+def test_headless_kernel(restore_signals, root_logger, capsys):
+    Kernel("test", [], "test/config_assets/config.yml", "test/config_assets/parameters_2.yml", headless=True)
+    stop_headless_logger()
+    messages = [json.loads(line) for line in capsys.readouterr().err.splitlines()]
+    assert {"logger": "kernel", "message": "Configuration OK"} in [
+        {"logger": message["logger"], "message": message["message"]} for message in messages
+    ]
+    assert any(message.get("row", {}).get("bundle") == "Phase total" for message in messages)
+
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+@pytest.fixture
+def service_logger():
+    logger = logging.getLogger("test.service")
+    handler = ListHandler()
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    yield handler
+    logger.removeHandler(handler)
+    logger.setLevel(logging.NOTSET)
+
+
+def logging_service(records, pause=0.0):
+    logger = logging.getLogger("test.service")
+    for i in range(records):
+        logger.info("record %s", i)
+    time.sleep(pause)
+    logger.warning("done")
+
+
+def test_batching_handler():
+    records = queue.Queue()
+    handler = BatchingHandler(records, "web", batch_size=2, flush_interval=60)
+    logger = logging.getLogger("test.batching")
+    logger.addHandler(handler)
+    try:
+        logger.warning("first")
+        assert records.empty()
+        logger.warning("second %s", "batch")
+        assert [values["msg"] for values in records.get_nowait()] == ["first", "second batch"]
+        logger.error("right away")
+        batch = records.get_nowait()
+        assert batch[0]["service"] == "web"
+        assert batch[0]["args"] is None
+    finally:
+        logger.removeHandler(handler)
+        handler.close()
+
+
+def test_batching_handler_double_close():
+    records = queue.Queue()
+    handler = BatchingHandler(records, "web")
+    handler.handle(logging.makeLogRecord({"msg": "last", "levelno": logging.INFO}))
+    handler.close()
+    handler.close()
+    assert [values["msg"] for values in records.get_nowait()] == ["last"]
+    assert records.empty()
+
+
+def test_rate_limit():
+    records = queue.Queue()
+    handler = BatchingHandler(records, "web", batch_size=1, rate_limit=5)
+    for i in range(20):
+        handler.handle(logging.makeLogRecord({"msg": f"record {i}", "levelno": logging.INFO}))
+    assert handler.dropped == 15
+    handler._tokens = 1  # pylint: disable=protected-access
+    handler.handle(logging.makeLogRecord({"msg": "after", "levelno": logging.INFO}))
+    messages = []
+    while not records.empty():
+        messages += [values["msg"] for values in records.get_nowait()]
+    assert messages[-2:] == ["15 log records dropped by the rate limit of 5 records per second", "after"]
+    handler.close()
+
+
+def test_centralized_logging(service_logger):
+    runner = ProcessServiceRunner("fork")
+    runner.add_service("chatty", logging_service, args=(50,), replicas=2)
+    runner.add_service("limited", logging_service, args=(50, 0.3), log_rate_limit=10)
+    runner.run()
+    runner.wait()
+    by_service = {}
+    for record in service_logger.records:
+        by_service.setdefault(record.service, []).append(record)
+    assert len(by_service["chatty"]) == 2 * 51
+    assert {record.process for record in by_service["chatty"]} - {os.getpid()}
+    assert all(record.process != os.getpid() for record in service_logger.records)
+    # The burst, then the last record once the rate limit lets it through
+    assert 11 <= len(by_service["limited"]) < 15
+    assert by_service["limited"][-1].getMessage() == "done"
@@ -0,0 +1,114 @@
+import os
+import time
+import urllib.request
+
+import pytest
+
+from applauncher import Kernel
+from applauncher.event import Event, EventManager
+from applauncher.metrics import DispatchMetrics, MetricsServer, ServiceMetrics, read_process_stats, render
+from applauncher.service_runner import ProcessServiceRunner
+
+pytestmark = pytest.mark.skipif(not os.path.exists("/proc/self/stat"), reason="/proc is required")
+
+
+class MeasuredEvent(Event):
+    event_name = "test.measured"
+
+
+def sleeping(seconds=60):
+    time.sleep(seconds)
+
+
+@pytest.fixture
+def dispatch_metrics():
+    yield EventManager.enable_metrics()
+    EventManager.enable_metrics(False)
+
+
+def test_read_process_stats():
+    cpu_seconds, rss, file_descriptors = read_process_stats(os.getpid())
+    assert cpu_seconds > 0
+    assert rss > 1024 * 1024
+    assert file_descriptors >= 3
+    assert read_process_stats(2 ** 22 + 1) is None
+
+
+def test_render():
+    text = render([
+        ("requests_total", "counter", "Requests", [({"path": 'a"b\\c'}, 3), ({}, 4)])
+    ])
+    assert text == (
+        '# HELP requests_total Requests\n'
+        '# TYPE requests_total counter\n'
+        'requests_total{path="a\\"b\\\\c"} 3\n'
+        'requests_total 4\n'
+    )
+
+
+def test_dispatch_metrics(dispatch_metrics):
+    received = []
+
+    def listener(event):
+        received.append(event)
+    EventManager.add_listener(MeasuredEvent, listener)
+    for _ in range(3):
+        EventManager.dispatch(MeasuredEvent())
+    assert len(received) == 3
+    assert dispatch_metrics.counts["test.measured"] == 3
+    assert dispatch_metrics.seconds["test.measured"] > 0
+    text = render(dispatch_metrics.collect())
+    assert 'applauncher_event_dispatches_total{event="test.measured"} 3' in text
+
+
+def test_dispatch_metrics_disabled():
+    EventManager.dispatch(MeasuredEvent())
+    assert EventManager._metrics is None
+
+
+def test_service_metrics():
+    runner = ProcessServiceRunner()
+    runner.add_service("A", sleeping, replicas=2)
+    runner.run()
+    try:
+        metrics = ServiceMetrics(runner)
+        metrics.sample()
+        assert [(name, index) for name, index, *_ in metrics.samples] == [("A", 0), ("A", 1)]
+        text = render(metrics.collect())
+        assert 'applauncher_service_resident_memory_bytes{service="A",replica="1"}' in text
+        assert 'applauncher_service_restarts_total{service="A"} 0' in text
+    finally:
+        runner.shutdown(grace_time=1)
+
+
+def test_metrics_server():
+    server = MetricsServer(0, [DispatchMetrics().collect, lambda: [("up", "gauge", "Up", [({}, 1)])]])
+    server.start()
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{server.port}/metrics") as response:
+            assert response.headers["Content-Type"].startswith("text/plain; version=0.0.4")
+            assert "up 1\n" in response.read().decode()
+    finally:
+        server.stop()
+
+
+class ServiceBundle:
+    def __init__(self):
+        self.services = [("sleeping", sleeping, (1,), {})]
+
+
+def test_kernel_metrics(restore_signals, dispatch_metrics):
+    kernel = Kernel(
+        environment="TEST",
+        bundles=[ServiceBundle()],
+        configuration_file="test/config_assets/config.yml",
+        parameters_file="test/config_assets/parameters_2.yml",
+        metrics_port=0
+    )
+    # Only served on localhost by default
+    assert kernel.metrics_server._server.server_address[0] == "127.0.0.1"  # pylint: disable=protected-access
+    with urllib.request.urlopen(f"http://127.0.0.1:{kernel.metrics_server.port}/metrics") as response:
+        text = response.read().decode()
+    kernel.shutdown()
+    assert 'applauncher_service_uptime_seconds{service="sleeping",replica="0"}' in text
+    assert 'applauncher_event_dispatches_total{event="kernel.kernel_ready"}' in text
@@ -0,0 +1,74 @@
+import json
+
+import pytest
+from pydantic import BaseModel
+
+from applauncher import Kernel
+from applauncher.profiler import NullProfiler, StartupProfiler, get_profiler, profiled, set_profiler, span
+
+
+@pytest.fixture
+def profiler(tmp_path):
+    profiler = StartupProfiler(str(tmp_path / "trace.json"))
+    set_profiler(profiler)
+    yield profiler
+    set_profiler(NullProfiler())
+
+
+@profiled
+def profiled_function(value):
+    return value * 2
+
+
+def test_disabled_by_default():
+    assert get_profiler().enabled is False
+    # The disabled spans are always the same object, nothing is allocated
+    assert span("a") is span("b", "other", argument=1)
+    assert profiled_function(2) == 4
+
+
+def test_spans(profiler):
+    with span("outer", "test", argument=1):
+        with span("inner"):
+            pass
+    assert profiled_function(3) == 6
+
+    summary = {name: calls for name, calls, _, _ in profiler.summary()}
+    assert summary == {"outer": 1, "inner": 1, "profiled_function": 1}
+
+    profiler.write()
+    with open(profiler.trace_file, encoding="utf-8") as trace_file:
+        events = json.load(trace_file)["traceEvents"]
+    outer = next(event for event in events if event["name"] == "outer")
+    inner = next(event for event in events if event["name"] == "inner")
+    assert outer["ph"] == "X"
+    assert outer["cat"] == "test"
+    assert outer["args"] == {"argument": 1}
+    assert outer["ts"] <= inner["ts"]
+    assert inner["ts"] + inner["dur"] <= outer["ts"] + outer["dur"]
+
+
+class ProfiledModel(BaseModel):
+    value: str
+
+
+class ProfiledBundle:
+    def __init__(self):
+        self.config_mapping = {"test": ProfiledModel}
+
+
+def test_kernel_profile(restore_signals, tmp_path):
+    trace = tmp_path / "boot.json"
+    Kernel(
+        environment="TEST",
+        bundles=[ProfiledBundle()],
+        configuration_file="test/config_assets/config.yml",
+        parameters_file="test/config_assets/parameters_2.yml",
+        profile=str(trace)
+    )
+
+    # The profiler is disabled once the kernel is booted
+    assert get_profiler().enabled is False
+    with open(trace, encoding="utf-8") as trace_file:
+        names = {event["name"] for event in json.load(trace_file)["traceEvents"]}
+    assert {"Kernel.load_configuration", "configuration.parse", "configuration.validate", "ProfiledBundle"} <= names
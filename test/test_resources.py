@@ -0,0 +1,84 @@
+import ctypes
+import os
+import platform
+import time
+from multiprocessing import Manager
+
+import pytest
+
+from applauncher.event import EventManager, ServiceMemoryExceededEvent
+from applauncher.resources import (
+    IOPRIO_CLASSES, MEMORY_EXCEEDED_EXIT_CODE, ServiceResources, parse_ionice, parse_memory
+)
+from applauncher.service_runner import ProcessServiceRunner
+
+
+def report(data):
+    data["affinity"] = sorted(os.sched_getaffinity(0))
+    data["nice"] = os.getpriority(os.PRIO_PROCESS, 0)
+    if platform.machine() == "x86_64":
+        libc = ctypes.CDLL(None, use_errno=True)
+        # ioprio_get(IOPRIO_WHO_PROCESS, 0)
+        data["ionice"] = libc.syscall(252, 1, 0)
+
+
+def allocate():
+    data = bytearray(1024 ** 3)
+    time.sleep(0.1)
+    return data
+
+
+def virtual_memory():
+    with open("/proc/self/status") as status:
+        for line in status:
+            if line.startswith("VmSize:"):
+                return int(line.split()[1]) * 1024
+
+
+def test_parse_memory():
+    assert parse_memory(1024) == 1024
+    assert parse_memory("512M") == 512 * 1024 ** 2
+    assert parse_memory("1.5g") == int(1.5 * 1024 ** 3)
+    assert parse_memory("2GB") == 2 * 1024 ** 3
+    assert parse_memory("4096") == 4096
+
+
+def test_parse_ionice():
+    assert parse_ionice(7) == (IOPRIO_CLASSES["best-effort"], 7)
+    assert parse_ionice("idle") == (IOPRIO_CLASSES["idle"], 4)
+    assert parse_ionice(("realtime", 0)) == (IOPRIO_CLASSES["realtime"], 0)
+
+
+def test_no_resources():
+    assert not ServiceResources()
+    assert ServiceResources(nice=1)
+
+
+@pytest.mark.skipif(not hasattr(os, "sched_setaffinity"), reason="Linux only")
+def test_apply_resources():
+    data = Manager().dict()
+    runner = ProcessServiceRunner()
+    cpu = sorted(os.sched_getaffinity(0))[0]
+    runner.add_service("A", report, args=(data,), cpu_affinity=[cpu], nice=5, ionice=7)
+    runner.run()
+    runner.wait()
+    assert data["affinity"] == [cpu]
+    assert data["nice"] == 5
+    if "ionice" in data:
+        assert data["ionice"] == (IOPRIO_CLASSES["best-effort"] << 13) | 7
+
+
+@pytest.mark.skipif(not os.path.exists("/proc/self/status"), reason="Linux only")
+def test_memory_limit():
+    events = []
+
+    def listener(event):
+        events.append(event)
+    EventManager.add_listener(ServiceMemoryExceededEvent, listener)
+    runner = ProcessServiceRunner("fork")
+    limit = virtual_memory() + 256 * 1024 ** 2
+    runner.add_service("hungry", allocate, memory_limit=limit)
+    runner.run()
+    runner.wait()
+    assert runner.running_services[0][1].exitcode == MEMORY_EXCEEDED_EXIT_CODE
+    assert [(event.service, event.replica, event.memory_limit) for event in events] == [("hungry", 0, limit)]
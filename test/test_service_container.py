@@ -0,0 +1,61 @@
+import os
+
+import pytest
+from dependency_injector import containers, providers
+
+from applauncher import Kernel, ServiceContainer
+
+
+@pytest.fixture
+def provider():
+    Kernel.container.cached_service = providers.Object("first")
+    yield Kernel.container.cached_service
+    del Kernel.container.cached_service
+
+
+def test_provider_is_cached(provider):
+    assert ServiceContainer.cached_service is provider
+    assert ServiceContainer.__dict__["cached_service"] is provider
+    assert ServiceContainer.cached_service() == "first"
+
+
+def test_missing_service():
+    with pytest.raises(Exception, match="does not have any"):
+        ServiceContainer.missing_service  # pylint: disable=pointless-statement
+    assert "missing_service" not in ServiceContainer.__dict__
+
+
+def test_replaced_provider(provider):
+    assert ServiceContainer.cached_service() == "first"
+    Kernel.container.cached_service = providers.Object("second")
+    assert "cached_service" not in ServiceContainer.__dict__
+    assert ServiceContainer.cached_service() == "second"
+
+
+def test_overridden_provider(provider):
+    assert ServiceContainer.cached_service() == "first"
+    with provider.override(providers.Object("mock")):
+        assert ServiceContainer.cached_service() == "mock"
+    assert ServiceContainer.cached_service() == "first"
+
+
+def test_replaced_container(provider):
+    assert ServiceContainer.cached_service() == "first"
+    other = containers.DynamicContainer()
+    other.cached_service = providers.Object("other")
+    ServiceContainer.container = other
+    try:
+        assert ServiceContainer.cached_service() == "other"
+    finally:
+        ServiceContainer.container = Kernel.container
+    assert ServiceContainer.cached_service() == "first"
+
+
+def test_cache_reset_after_fork(provider):
+    assert ServiceContainer.cached_service() == "first"
+    pid = os.fork()
+    if pid == 0:
+        os._exit(0 if "cached_service" not in ServiceContainer.__dict__ else 1)
+    _, status = os.waitpid(pid, 0)
+    assert os.waitstatus_to_exitcode(status) == 0
+    assert "cached_service" in ServiceContainer.__dict__
@@ -1,7 +1,17 @@
-from applauncher.service_runner import ProcessServiceRunner
-from multiprocessing import Manager
+from applauncher import Kernel
+from applauncher.service_runner import (
+    AsyncServiceRunner, ProcessServiceRunner, RestartPolicy, StopToken, ThreadServiceRunner, current_replica,
+    current_stop_token, gil_disabled, resolve_replicas
+)
+from multiprocessing import Manager, forkserver
+import asyncio
+import gc
 import time
+import os
 import signal
+import sys
+import sysconfig
+import pytest
 
 
 # Just a dummy process
@@ -190,3 +200,332 @@ class TestClass:
         assert process.is_alive() is True
         r.shutdown(grace_time=1)
         assert process.is_alive() is False
+
+
+def failing():
+    sys.exit(3)
+
+
+def succeeding():
+    pass
+
+
+class TestRestartPolicy:
+    def test_backoff(self):
+        policy = RestartPolicy("on-failure", backoff=0.5, max_backoff=3)
+        assert [policy.delay(i) for i in range(1, 6)] == [0.5, 1, 2, 3, 3]
+
+    def test_should_restart(self):
+        assert RestartPolicy().should_restart(1) is False
+        assert RestartPolicy("on-failure").should_restart(0) is False
+        assert RestartPolicy("on-failure").should_restart(1) is True
+        assert RestartPolicy("always").should_restart(0) is True
+        with pytest.raises(ValueError):
+            RestartPolicy("sometimes")
+
+    def test_build(self):
+        assert RestartPolicy.build(None).policy == "never"
+        assert RestartPolicy.build("always").policy == "always"
+        assert RestartPolicy.build({"policy": "on-failure", "max_restarts": 2}).max_restarts == 2
+
+    def test_restart_until_circuit_opens(self):
+        r = ProcessServiceRunner()
+        r.add_service(name="A", function=failing, restart={"policy": "on-failure", "backoff": 0.01, "max_restarts": 3})
+        r.run()
+        r.wait()
+        service = r.services["A"]
+        assert service.restart_count == 3
+        assert service.gave_up is True
+        assert service.last_recovery_time >= 0.01
+        assert r.running_services[0][1].exitcode == 3
+
+    def test_no_restart_on_success(self):
+        r = ProcessServiceRunner()
+        r.add_service(name="A", function=succeeding, restart="on-failure")
+        r.add_service(name="B", function=failing)
+        r.run()
+        r.wait()
+        assert r.services["A"].restart_count == 0
+        assert r.services["B"].restart_count == 0
+
+    def test_no_restart_after_shutdown(self):
+        r = ProcessServiceRunner()
+        r.add_service(name="A", function=infinito, restart={"policy": "always", "backoff": 0.01})
+        r.run()
+        _, process = r.running_services[0]
+        r.shutdown(grace_time=1)
+        r.wait()
+        assert r.services["A"].restart_count == 0
+        assert r.running_services[0][1] is process
+        assert process.is_alive() is False
+
+
+def report_replica(data):
+    data[current_replica()] = os.getpid()
+
+
+class TestReplicas:
+    def test_resolve_replicas(self):
+        assert resolve_replicas(3) == 3
+        assert resolve_replicas("2") == 2
+        assert resolve_replicas("auto") >= 1
+        with pytest.raises(ValueError):
+            resolve_replicas(-1)
+
+    def test_replica_index(self):
+        r = ProcessServiceRunner()
+        d = Manager().dict()
+        r.add_service(name="A", function=report_replica, args=(d,), replicas=3)
+        assert [name for name, _ in r.running_services] == ["A[0]", "A[1]", "A[2]"]
+        r.run()
+        r.wait()
+        assert sorted(d.keys()) == [0, 1, 2]
+        assert len(set(d.values())) == 3
+        assert current_replica() is None
+
+    def test_scale(self):
+        r = ProcessServiceRunner()
+        r.add_service(name="A", function=infinito, replicas=2)
+        r.add_service(name="B", function=infinito)
+        r.run()
+        r.scale("A", 4)
+        assert [name for name, _ in r.running_services] == ["A[0]", "A[1]", "B", "A[2]", "A[3]"]
+        assert all(process.is_alive() for _, process in r.running_services)
+        removed = [process for name, process in r.running_services if name in ("A[2]", "A[3]")]
+        r.scale("A", 2, grace_time=1)
+        assert [name for name, _ in r.running_services] == ["A[0]", "A[1]", "B"]
+        assert not any(process.is_alive() for process in removed)
+        r.shutdown(grace_time=1)
+        r.wait()
+        assert not any(process.is_alive() for _, process in r.running_services)
+
+    def test_scale_after_every_process_finished(self):
+        r = ProcessServiceRunner()
+        r.add_service(name="A", function=succeeding)
+        r.run()
+        r.wait()
+        r.add_service(name="B", function=failing, restart={"policy": "on-failure", "backoff": 0.01, "max_restarts": 2})
+        r.scale("B", 2)
+        r.wait()
+        assert r.services["B"].restart_count == 4
+        assert r.services["B"].gave_up is True
+
+
+class TestStartMethod:
+    @pytest.mark.parametrize("start_method", ["fork", "forkserver", "spawn"])
+    def test_start_method(self, start_method):
+        r = ProcessServiceRunner(start_method)
+        d = Manager().dict()
+        r.add_service(name="A", function=report_replica, args=(d,), replicas=2)
+        r.run()
+        r.wait()
+        assert sorted(d.keys()) == [0, 1]
+
+    @pytest.mark.parametrize("start_method", ["fork", None])
+    def test_fork_freezes_objects(self, start_method):
+        r = ProcessServiceRunner(start_method)
+        assert r.forks
+        r.add_service(name="A", function=succeeding)
+        gc.unfreeze()
+        r.run()
+        r.wait()
+        assert gc.get_freeze_count() > 0
+        gc.unfreeze()
+
+    def test_freeze_once(self, monkeypatch):
+        calls = []
+        monkeypatch.setattr(gc, "collect", lambda *args: calls.append("collect"))
+        monkeypatch.setattr(gc, "freeze", lambda: calls.append("freeze"))
+        r = ProcessServiceRunner("fork")
+        r.add_service(name="A", function=failing, restart={"policy": "on-failure", "backoff": 0.01, "max_restarts": 3})
+        r.run()
+        r.scale("A", 2)
+        r.wait()
+        assert r.services["A"].restart_count >= 3
+        assert calls == ["collect", "freeze"]
+
+    def test_forkserver_preload(self):
+        r = ProcessServiceRunner("forkserver")
+        previous = forkserver._forkserver._preload_modules
+        try:
+            r.preload(["json", "applauncher.event"])
+            assert forkserver._forkserver._preload_modules == ["json", "applauncher.event"]
+        finally:
+            forkserver.set_forkserver_preload(previous)
+
+
+def sleeping():
+    time.sleep(60)
+
+
+class TestShutdownLatency:
+    def test_shutdown_is_not_rounded_to_seconds(self):
+        r = ProcessServiceRunner()
+        r.add_service(name="A", function=sleeping, replicas=3)
+        r.run()
+        started = time.monotonic()
+        stop_times = r.shutdown(grace_time=10)
+        assert time.monotonic() - started < 0.5
+        assert sorted(stop_times) == ["A[0]", "A[1]", "A[2]"]
+        assert all(stop_time < 0.5 for stop_time in stop_times.values())
+        assert not any(process.is_alive() for _, process in r.running_services)
+
+    def test_single_deadline(self):
+        r = ProcessServiceRunner()
+        r.add_service(name="A", function=infinito, replicas=3)
+        r.add_service(name="B", function=sleeping)
+        r.run()
+        # Let infinito install its SIGTERM handler
+        time.sleep(0.3)
+        started = time.monotonic()
+        stop_times = r.shutdown(grace_time=0.5)
+        assert 0.5 <= time.monotonic() - started < 1.2
+        assert stop_times["B"] < 0.5
+        assert all(stop_times[f"A[{i}]"] >= 0.5 for i in range(3))
+        assert not any(process.is_alive() for _, process in r.running_services)
+
+
+async def async_service(data, value):
+    await asyncio.sleep(0.01)
+    data.append(value)
+
+
+async def cancellable(data):
+    try:
+        await asyncio.sleep(60)
+    except asyncio.CancelledError:
+        data.append("cancelled")
+        raise
+
+
+class TestAsyncServiceRunner:
+    def test_run(self):
+        r = AsyncServiceRunner()
+        data = []
+        r.add_initializer(lambda: data.append("initializer"))
+        r.add_service(name="A", function=async_service, args=(data, "async"))
+        r.add_service(name="B", function=data.append, args=("thread",))
+        r.run()
+        r.wait()
+        assert data[0] == "initializer"
+        assert sorted(data[1:]) == ["async", "thread"]
+        assert [name for name, _ in r.running_services] == ["A", "B"]
+
+    def test_service_error(self):
+        r = AsyncServiceRunner()
+        data = []
+        r.add_service(name="A", function=async_service, args=(None, "fail"))
+        r.add_service(name="B", function=async_service, args=(data, "ok"))
+        r.run()
+        r.wait()
+        assert data == ["ok"]
+
+    def test_shutdown(self):
+        r = AsyncServiceRunner()
+        data = []
+        r.add_service(name="A", function=cancellable, args=(data,))
+        r.add_service(name="B", function=cancellable, args=(data,))
+        r.run()
+        started = time.monotonic()
+        stop_times = r.shutdown(grace_time=5)
+        assert time.monotonic() - started < 0.5
+        assert sorted(stop_times) == ["A", "B"]
+        assert data == ["cancelled", "cancelled"]
+        assert r.loop.is_closed()
+
+    def test_kill(self):
+        r = AsyncServiceRunner()
+        r.add_service(name="A", function=cancellable, args=([],))
+        r.run()
+        r.kill()
+        assert r.loop.is_closed()
+
+    def test_no_services(self):
+        r = AsyncServiceRunner()
+        r.run()
+        r.wait()
+        assert r.shutdown() == {}
+
+
+def thread_service(data, delay):
+    token = current_stop_token()
+    while not token.wait(delay):
+        pass
+    data.append((current_replica(), token.stopped))
+
+
+def stubborn_service():
+    time.sleep(1)
+
+
+class TestThreadServiceRunner:
+    def test_run(self):
+        r = ThreadServiceRunner()
+        data = []
+        r.add_initializer(lambda: data.append("initializer"))
+        r.add_service(name="A", function=data.append, args=("service",))
+        r.run()
+        r.wait()
+        assert data == ["initializer", "service"]
+        assert current_stop_token() is None
+
+    def test_shutdown(self):
+        r = ThreadServiceRunner()
+        data = []
+        r.add_service(name="A", function=thread_service, args=(data, 60), replicas=2)
+        r.run()
+        started = time.monotonic()
+        stop_times = r.shutdown(grace_time=5)
+        assert time.monotonic() - started < 0.5
+        assert sorted(stop_times) == ["A[0]", "A[1]"]
+        assert sorted(data) == [(0, True), (1, True)]
+
+    def test_shutdown_grace_time(self):
+        r = ThreadServiceRunner()
+        r.add_service(name="A", function=stubborn_service)
+        r.run()
+        stop_times = r.shutdown(grace_time=0.1)
+        assert 0.1 <= stop_times["A"] < 0.5
+        assert r.running_services[0][1].is_alive()
+
+    def test_stop_token(self):
+        token = StopToken()
+        assert token.wait(0.01) is False
+        token.stop()
+        assert token.stopped is True
+        assert token.wait() is True
+
+    def test_gil_disabled(self, monkeypatch):
+        monkeypatch.setattr(sysconfig, "get_config_var", lambda name: 1)
+        monkeypatch.setattr(sys, "_is_gil_enabled", lambda: False, raising=False)
+        assert gil_disabled() is True
+        # Free-threaded build with the GIL enabled again
+        monkeypatch.setattr(sys, "_is_gil_enabled", lambda: True, raising=False)
+        assert gil_disabled() is False
+        monkeypatch.setattr(sysconfig, "get_config_var", lambda name: None)
+        assert gil_disabled() is False
+
+
+class RunnersBundle:
+    def __init__(self):
+        self.data = []
+        self.services = [
+            ("async", async_service, (self.data, "async"), {}, {"runner": "async"}),
+            ("thread", self.data.append, ("thread",), {}, {"runner": "thread"}),
+            ("process", succeeding, (), {}),
+        ]
+
+
+def test_kernel_runners(restore_signals):
+    bundle = RunnersBundle()
+    kernel = Kernel(
+        environment="TEST",
+        bundles=[bundle],
+        configuration_file="test/config_assets/config.yml",
+        parameters_file="test/config_assets/parameters_2.yml"
+    )
+    kernel.wait()
+    assert sorted(bundle.data) == ["async", "thread"]
+    assert [name for name, _ in kernel.service_runner.running_services] == ["process"]
+    assert [name for name, _ in kernel.async_service_runner.running_services] == ["async"]
+    assert [name for name, _ in kernel.thread_service_runner.running_services] == ["thread"]
@@ -0,0 +1,95 @@
+import os
+import sys
+import threading
+
+import pytest
+from pydantic import BaseModel
+
+from applauncher import Kernel
+from applauncher.event import ConfigurationChangedEvent
+from applauncher.watcher import InotifyWatcher, PollingWatcher, create_watcher
+
+
+def write(path, content):
+    # Written somewhere else and then moved, like many editors do
+    temporary = f"{path}.tmp"
+    with open(temporary, "w") as file:
+        file.write(content)
+    os.replace(temporary, path)
+
+
+def assert_notified(watcher_class, tmp_path, **kwargs):
+    watched = tmp_path / "watched.yml"
+    other = tmp_path / "other.yml"
+    watched.write_text("a: 1")
+    changed = threading.Event()
+    watcher = watcher_class([str(watched)], changed.set, **kwargs)
+    watcher.start()
+    try:
+        other.write_text("not watched")
+        assert not changed.wait(0.3)
+        write(str(watched), "a: 2")
+        assert changed.wait(2)
+    finally:
+        watcher.stop()
+
+
+def test_polling_watcher(tmp_path):
+    assert_notified(PollingWatcher, tmp_path, interval=0.05)
+
+
+@pytest.mark.skipif(InotifyWatcher.libc is None, reason="inotify is only available on Linux")
+def test_inotify_watcher(tmp_path):
+    assert_notified(InotifyWatcher, tmp_path)
+
+
+def test_create_watcher(tmp_path):
+    watcher = create_watcher([str(tmp_path / "config.yml")], lambda: None)
+    expected = InotifyWatcher if sys.platform.startswith("linux") else PollingWatcher
+    assert isinstance(watcher, expected)
+
+
+class ReloadModel(BaseModel):
+    value: str
+    number: int = 0
+
+
+class ReloadBundle:
+    def __init__(self):
+        self.config_mapping = {"reload": ReloadModel}
+        self.changes = []
+        self.event_listeners = [(ConfigurationChangedEvent, self.configuration_changed)]
+
+    def configuration_changed(self, event):
+        self.changes.append(event)
+
+
+def test_kernel_reload(restore_signals, tmp_path):
+    config_file = tmp_path / "config.yml"
+    config_file.write_text("reload:\n  value: first\n  number: 1\n")
+    bundle = ReloadBundle()
+    kernel = Kernel(
+        environment="TEST",
+        bundles=[bundle],
+        configuration_file=str(config_file),
+        parameters_file=str(tmp_path / "parameters.yml")
+    )
+
+    # Nothing changed
+    kernel.reload_configuration()
+    assert bundle.changes == []
+
+    config_file.write_text("reload:\n  value: second\n  number: 1\n")
+    kernel.reload_configuration()
+    assert len(bundle.changes) == 1
+    event = bundle.changes[0]
+    assert event.changes == {"reload.value": ("first", "second")}
+    assert event.changed("reload")
+    assert not event.changed("reload.number")
+    assert Kernel.config.reload.value == "second"
+
+    # Invalid configurations are not applied
+    config_file.write_text("reload:\n  value: third\n  number: many\n")
+    kernel.reload_configuration()
+    assert len(bundle.changes) == 1
+    assert kernel.config.reload.value == "second"
@@ -0,0 +1,201 @@
+import importlib
+import json
+import os
+import sys
+import textwrap
+
+import pytest
+from dependency_injector import containers, providers
+
+from applauncher import Kernel
+from applauncher.wiring import PLAN_FILE, Wiring, WiringPlan, plan_module
+
+SERVICES_MODULE = """
+from dependency_injector.wiring import Provide, inject
+from pydantic import BaseModel
+
+
+def greeting(name=Provide["name"]):
+    return f"hello {name}"
+
+
+@inject
+def decorated(name=Provide["name"]):
+    return name
+
+
+def plain(name="nobody"):
+    return name
+
+
+class Greeter:
+    def greet(self, name=Provide["name"]):
+        return name
+
+
+class Model(BaseModel):
+    value: int = 0
+"""
+
+ATTRIBUTES_MODULE = """
+from dependency_injector.wiring import Provide
+
+value = Provide["name"]
+
+
+class Holder:
+    attribute = Provide["name"]
+"""
+
+
+@pytest.fixture
+def container():
+    container = containers.DynamicContainer()
+    container.name = providers.Object("world")
+    return container
+
+
+@pytest.fixture
+def services_module(tmp_path):
+    def load(name, source=SERVICES_MODULE):
+        (tmp_path / f"{name}.py").write_text(textwrap.dedent(source))
+        sys.modules.pop(name, None)
+        importlib.invalidate_caches()
+        return importlib.import_module(name)
+
+    sys.path.insert(0, str(tmp_path))
+    names = []
+    yield lambda name, source=SERVICES_MODULE: names.append(name) or load(name, source)
+    sys.path.remove(str(tmp_path))
+    for name in names:
+        sys.modules.pop(name, None)
+
+
+class TestWiringPlan:
+    def test_plan_module(self, services_module):
+        plan = plan_module(services_module("wiring_plan_members"))
+        assert plan == {"functions": ["greeting", "decorated"], "attributes": [], "classes": ["Greeter"]}
+
+    def test_cold_wiring_records_the_plan(self, tmp_path, container, services_module):
+        module = services_module("wiring_cold")
+        wiring = Wiring(container, WiringPlan(str(tmp_path / "cache")))
+        assert wiring.wire(module)[0] == "cold"
+        wiring.plan.save()
+        assert module.greeting() == "hello world"
+        assert module.Greeter().greet() == "world"
+        with open(tmp_path / "cache" / PLAN_FILE, encoding="utf-8") as plan_file:
+            entry = json.load(plan_file)["wiring_cold"]
+        assert entry["functions"] == ["greeting", "decorated"]
+        assert entry["wire_seconds"] > 0
+
+    def test_warm_wiring_uses_the_plan(self, tmp_path, container, services_module):
+        cache_dir = str(tmp_path / "cache")
+        cold = Wiring(container, WiringPlan(cache_dir))
+        cold.wire(services_module("wiring_warm"))
+        cold.plan.save()
+
+        # A new boot, the module is imported again
+        sys.modules.pop("wiring_warm")
+        module = importlib.import_module("wiring_warm")
+        warm = Wiring(container, WiringPlan(cache_dir))
+        assert warm.wire(module)[0] == "planned"
+        assert module.greeting() == "hello world"
+        assert module.decorated() == "world"
+        assert module.Greeter().greet() == "world"
+        assert module.plain() == "nobody"
+        name, mode, _, _, saved = warm.report[0]
+        assert (name, mode) == ("wiring_warm", "planned")
+        assert saved == pytest.approx(cold.report[0][3] - warm.report[0][3])
+
+    def test_warm_wiring_of_marker_attributes(self, tmp_path, container, services_module):
+        cache_dir = str(tmp_path / "cache")
+        cold = Wiring(container, WiringPlan(cache_dir))
+        module = services_module("wiring_attributes", ATTRIBUTES_MODULE)
+        cold.wire(module)
+        cold.plan.save()
+        assert (module.value, module.Holder.attribute) == ("world", "world")
+        assert cold.plan.entries["wiring_attributes"]["attributes"] == ["value"]
+        assert cold.plan.entries["wiring_attributes"]["classes"] == ["Holder"]
+
+        sys.modules.pop("wiring_attributes")
+        module = importlib.import_module("wiring_attributes")
+        warm = Wiring(container, WiringPlan(cache_dir))
+        assert warm.wire(module)[0] == "planned"
+        assert (module.value, module.Holder.attribute) == ("world", "world")
+
+    def test_changed_module_is_wired_again(self, tmp_path, container, services_module):
+        cache_dir = str(tmp_path / "cache")
+        cold = Wiring(container, WiringPlan(cache_dir))
+        cold.wire(services_module("wiring_changed"))
+        cold.plan.save()
+
+        module = services_module("wiring_changed", SERVICES_MODULE + "\n\ndef added(name=Provide['name']):\n"
+                                                                     "    return name\n")
+        stat = os.stat(module.__file__)
+        os.utime(module.__file__, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+        wiring = Wiring(container, WiringPlan(cache_dir))
+        assert wiring.wire(module)[0] == "cold"
+        assert module.added() == "world"
+
+    def test_unreadable_plan(self, tmp_path):
+        (tmp_path / PLAN_FILE).write_text("{")
+        assert WiringPlan(str(tmp_path)).entries == {}
+
+
+class TestLazyWiring:
+    def test_deferred_module_is_wired_on_import(self, tmp_path, container, services_module):
+        services_module("wiring_lazy")
+        sys.modules.pop("wiring_lazy")
+        wiring = Wiring(container, WiringPlan(str(tmp_path / "cache")))
+        assert wiring.defer("wiring_lazy") is None
+        wiring.install()
+        try:
+            assert "wiring_lazy" not in sys.modules
+            module = importlib.import_module("wiring_lazy")
+            assert module.greeting() == "hello world"
+            assert wiring.report[0][:2] == ("wiring_lazy", "cold")
+            assert wiring.deferred == set()
+            assert "wiring_lazy" in WiringPlan(str(tmp_path / "cache")).entries
+        finally:
+            wiring.uninstall()
+        assert wiring not in sys.meta_path
+
+    def test_imported_module_is_wired_on_install(self, container, services_module):
+        module = services_module("wiring_imported")
+        wiring = Wiring(container)
+        assert wiring.defer("wiring_imported") is module
+        wiring.deferred.add("wiring_imported")
+        wiring.install()
+        wiring.uninstall()
+        assert module.greeting() == "hello world"
+
+
+class WiredBundle:
+    wire_modules = ["wiring_kernel"]
+    injection_bindings = {"name": lambda _container: providers.Object("kernel")}
+
+
+@pytest.mark.usefixtures("restore_signals")
+class TestKernelWiring:
+    @pytest.mark.parametrize("lazy_wiring", [False, True])
+    def test_kernel_wiring(self, tmp_path, services_module, lazy_wiring):
+        services_module("wiring_kernel")
+        sys.modules.pop("wiring_kernel")
+        cache_dir = str(tmp_path / "cache")
+        options = dict(configuration_file="test/config_assets/config.yml",
+                       parameters_file="test/config_assets/parameters_2.yml", cache_dir=cache_dir,
+                       lazy_wiring=lazy_wiring)
+        kernel = Kernel("test", [WiredBundle()], **options)
+        assert ("wiring_kernel" in sys.modules) is not lazy_wiring
+        assert importlib.import_module("wiring_kernel").greeting() == "hello kernel"
+        kernel.shutdown()
+
+        sys.modules.pop("wiring_kernel")
+        kernel = Kernel("test", [WiredBundle()], **options)
+        if lazy_wiring:
+            assert set(kernel.wiring.deferred_savings()) == {"wiring_kernel"}
+            assert kernel.wiring.deferred_savings()["wiring_kernel"] > 0
+        else:
+            assert [row[:2] for row in kernel.wiring.report] == [("wiring_kernel", "planned")]
+        assert importlib.import_module("wiring_kernel").greeting() == "hello kernel"
+        kernel.shutdown()